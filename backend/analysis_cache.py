@@ -0,0 +1,168 @@
+"""Content-addressed cache for consolidated AI analysis results.
+
+Entries are keyed by a hash of the decoded image bytes plus the model id, prompt
+version and analysis engine, so a resubmitted photo returns the stored
+consolidate_analysis output without calling the model again. A bounded in-process
+LRU sits in front of the Mongo collection, which expires entries via a TTL index
+on `expires_at` (see create_database_indexes.py). Memory entries keep the same
+expiry and are dropped when read after it.
+"""
+import copy
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+
+class LRUCache:
+    """Small size-bounded LRU mapping used for in-process caches."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data = OrderedDict()
+
+    def get(self, key):
+        if key not in self._data:
+            return None
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def pop(self, key):
+        return self._data.pop(key, None)
+
+    def set(self, key, value):
+        if self.max_size <= 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class AnalysisCache:
+    """Two-level (memory + Mongo) cache of consolidated analysis results."""
+
+    def __init__(self, collection, max_entries: int = 256, ttl_days: int = 30, enabled: bool = True):
+        self.collection = collection
+        self.memory = LRUCache(max_entries)
+        self.ttl = timedelta(days=ttl_days)
+        self.enabled = enabled
+        self.memory_hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+        self.model_calls_saved = 0
+
+    @staticmethod
+    def make_key(image_sha256: str, model_id: str, prompt_version: str, engine: str) -> str:
+        """Builds the cache key from the image digest and everything that affects the answer."""
+        return f"{image_sha256}:{model_id}:{prompt_version}:{engine}"
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the cached entry ({"analysis", "engine", "model_calls"}) or None."""
+        if not self.enabled:
+            return None
+
+        now = datetime.utcnow()
+        entry = None
+        cached = self.memory.get(key)
+        if cached is not None:
+            expires_at, entry = cached
+            if expires_at <= now:
+                self.memory.pop(key)
+                entry = None
+        if entry is not None:
+            self.memory_hits += 1
+        else:
+            try:
+                doc = await self.collection.find_one(
+                    {"key": key, "expires_at": {"$gt": now}},
+                    {"_id": 0, "analysis": 1, "engine": 1, "model_calls": 1, "expires_at": 1}
+                )
+            except Exception as e:
+                print(f"⚠️ Analysis cache lookup failed: {e}")
+                doc = None
+            if doc is None:
+                self.misses += 1
+                return None
+            expires_at = doc.pop("expires_at")
+            entry = doc
+            self.memory.set(key, (expires_at, entry))
+            self.mongo_hits += 1
+
+        self.model_calls_saved += entry.get("model_calls", 0)
+        return copy.deepcopy(entry)
+
+    async def set(self, key: str, analysis: Dict[str, Any], engine: str, model_calls: int):
+        """Stores an analysis result in memory and in Mongo (with TTL expiry)."""
+        if not self.enabled:
+            return
+
+        entry = {"analysis": copy.deepcopy(analysis), "engine": engine, "model_calls": model_calls}
+        now = datetime.utcnow()
+        self.memory.set(key, (now + self.ttl, entry))
+        try:
+            await self.collection.update_one(
+                {"key": key},
+                {"$set": {**entry, "key": key, "created_at": now, "expires_at": now + self.ttl}},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"⚠️ Analysis cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.mongo_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "memory_entries": len(self.memory),
+            "memory_hits": self.memory_hits,
+            "mongo_hits": self.mongo_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "model_calls_saved": self.model_calls_saved
+        }
+
+
+class LayerCache:
+    """In-process memoization of individual analyze_image_layer answers.
+
+    Keys combine the model, the layer id, a digest of the rendered prompt (which
+    covers both the template and the raw_text interpolated into it) and the image
+    digest, so changing one layer's prompt only invalidates that layer.
+    """
+
+    def __init__(self, max_entries: int = 2048, enabled: bool = True):
+        self.memory = LRUCache(max_entries)
+        self.enabled = enabled
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    @staticmethod
+    def make_key(model_id: str, layer: str, prompt: str, image_digest: str) -> str:
+        prompt_digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{model_id}:{layer}:{prompt_digest}:{image_digest}"
+
+    def get(self, layer: str, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        result = self.memory.get(key)
+        counter = self.hits if result is not None else self.misses
+        counter[layer] = counter.get(layer, 0) + 1
+        return result
+
+    def set(self, key: str, result: str):
+        if self.enabled:
+            self.memory.set(key, result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self.memory),
+            "hits": sum(self.hits.values()),
+            "misses": sum(self.misses.values()),
+            "hits_by_layer": dict(self.hits),
+            "misses_by_layer": dict(self.misses)
+        }
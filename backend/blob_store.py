@@ -0,0 +1,274 @@
+"""Content-addressed storage for inspection images.
+
+Images are written once as raw bytes under their SHA-256 digest; inspection
+documents only keep the digest, size and content type. `put_stream` accepts
+uploads chunk by chunk, hashing on the fly, so large photos are never held in
+memory whole. The backend is selected with BLOB_STORE:
+
+- "gridfs" (default): GridFS bucket in the application database
+- "local": files under BLOB_STORE_PATH (useful for development and tests)
+- "s3": any S3-compatible bucket (S3_BUCKET, optional S3_ENDPOINT_URL)
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+import uuid
+from typing import AsyncIterable, AsyncIterator, Optional
+
+import gridfs
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+CHUNK_SIZE = 256 * 1024
+
+
+class BlobTooLarge(Exception):
+    """Raised by put_stream when an upload exceeds max_bytes."""
+
+
+async def _spool_to_file(chunks: AsyncIterable[bytes], f, max_bytes: Optional[int]):
+    """Writes chunks to an open file, returning (sha256, size, first_chunk)."""
+    hasher = hashlib.sha256()
+    size = 0
+    head = b""
+    async for chunk in chunks:
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            raise BlobTooLarge(f"Upload exceeds {max_bytes} bytes")
+        if not head:
+            head = chunk[:64]
+        hasher.update(chunk)
+        await asyncio.to_thread(f.write, chunk)
+    return hasher.hexdigest(), size, head
+
+
+def detect_content_type(data: bytes) -> str:
+    """Sniffs the image type from its magic bytes (defaults to JPEG)."""
+    if data.startswith(b'\x89PNG'):
+        return "image/png"
+    if data.startswith(b'GIF'):
+        return "image/gif"
+    if data.startswith(b'RIFF') and b'WEBP' in data[:20]:
+        return "image/webp"
+    return "image/jpeg"
+
+
+class LocalBlobStore:
+    """Stores blobs as files on the local filesystem, sharded by digest prefix."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _write(self, digest: str, data: bytes):
+        path = self._path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique per writer, so concurrent puts of the same image don't share a temp file
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    async def put(self, data: bytes, content_type: Optional[str] = None) -> dict:
+        digest = hashlib.sha256(data).hexdigest()
+        await asyncio.to_thread(self._write, digest, data)
+        return {"sha256": digest, "size": len(data), "content_type": content_type or detect_content_type(data)}
+
+    def _read(self, digest: str) -> Optional[bytes]:
+        path = self._path(digest)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    async def put_stream(self, chunks: AsyncIterable[bytes], content_type: Optional[str] = None,
+                         max_bytes: Optional[int] = None) -> dict:
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+        try:
+            with open(tmp_path, "wb") as f:
+                digest, size, head = await _spool_to_file(chunks, f, max_bytes)
+            path = self._path(digest)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return {"sha256": digest, "size": size, "content_type": content_type or detect_content_type(head)}
+
+    async def get(self, digest: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._read, digest)
+
+    async def iter_chunks(self, digest: str) -> AsyncIterator[bytes]:
+        with open(self._path(digest), "rb") as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+
+class GridFSBlobStore:
+    """Stores blobs in a GridFS bucket, using the digest as the file name.
+
+    Two concurrent puts of the same image can both pass the existence check and
+    upload it. Every write removes all but the oldest copy afterwards, and reads
+    always use the oldest revision, so the copies (identical by construction)
+    never make a read fail.
+    """
+
+    def __init__(self, db, bucket_name: str = "images"):
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name=bucket_name)
+        self.files = db[f"{bucket_name}.files"]
+
+    async def put(self, data: bytes, content_type: Optional[str] = None) -> dict:
+        digest = hashlib.sha256(data).hexdigest()
+        content_type = content_type or detect_content_type(data)
+        if not await self.files.find_one({"filename": digest}, {"_id": 1}):
+            await self.bucket.upload_from_stream(digest, data, metadata={"content_type": content_type})
+            await self._dedupe(digest)
+        return {"sha256": digest, "size": len(data), "content_type": content_type}
+
+    async def _dedupe(self, digest: str):
+        """Deletes all but the oldest file stored under `digest`."""
+        copies = await self.files.find({"filename": digest}, {"_id": 1}).sort(
+            [("uploadDate", 1), ("_id", 1)]
+        ).to_list(length=None)
+        for copy in copies[1:]:
+            try:
+                await self.bucket.delete(copy["_id"])
+            except gridfs.errors.NoFile:
+                pass  # the other writer removed it first
+
+    async def put_stream(self, chunks: AsyncIterable[bytes], content_type: Optional[str] = None,
+                         max_bytes: Optional[int] = None) -> dict:
+        # The digest is only known at the end, so upload under a temporary name and rename
+        grid_in = self.bucket.open_upload_stream(f"upload-{uuid.uuid4().hex}")
+        hasher = hashlib.sha256()
+        size = 0
+        head = b""
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise BlobTooLarge(f"Upload exceeds {max_bytes} bytes")
+                if not head:
+                    head = chunk[:64]
+                hasher.update(chunk)
+                await grid_in.write(chunk)
+            await grid_in.close()
+        except BaseException:
+            await grid_in.abort()
+            raise
+
+        digest = hasher.hexdigest()
+        content_type = content_type or detect_content_type(head)
+        if await self.files.find_one({"filename": digest}, {"_id": 1}):
+            await self.bucket.delete(grid_in._id)
+        else:
+            await self.bucket.rename(grid_in._id, digest)
+            await self.files.update_one({"_id": grid_in._id}, {"$set": {"metadata": {"content_type": content_type}}})
+            await self._dedupe(digest)
+        return {"sha256": digest, "size": size, "content_type": content_type}
+
+    async def get(self, digest: str) -> Optional[bytes]:
+        try:
+            grid_out = await self.bucket.open_download_stream_by_name(digest, revision=0)
+        except gridfs.errors.NoFile:
+            return None
+        return await grid_out.read()
+
+    async def iter_chunks(self, digest: str) -> AsyncIterator[bytes]:
+        grid_out = await self.bucket.open_download_stream_by_name(digest, revision=0)
+        while True:
+            chunk = await grid_out.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+class S3BlobStore:
+    """Stores blobs in an S3-compatible bucket under `<prefix><digest>`."""
+
+    def __init__(self, bucket: str, prefix: str = "images/", endpoint_url: Optional[str] = None):
+        import boto3
+        from botocore.exceptions import ClientError
+
+        self.client_error = ClientError
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except self.client_error:
+            return False
+
+    async def put(self, data: bytes, content_type: Optional[str] = None) -> dict:
+        digest = hashlib.sha256(data).hexdigest()
+        content_type = content_type or detect_content_type(data)
+        key = self.prefix + digest
+        if not await asyncio.to_thread(self._exists, key):
+            await asyncio.to_thread(
+                self.client.put_object, Bucket=self.bucket, Key=key, Body=data, ContentType=content_type
+            )
+        return {"sha256": digest, "size": len(data), "content_type": content_type}
+
+    async def put_stream(self, chunks: AsyncIterable[bytes], content_type: Optional[str] = None,
+                         max_bytes: Optional[int] = None) -> dict:
+        # Spool to disk while hashing; upload_file then handles multipart transfer
+        with tempfile.NamedTemporaryFile() as f:
+            digest, size, head = await _spool_to_file(chunks, f, max_bytes)
+            await asyncio.to_thread(f.flush)
+            content_type = content_type or detect_content_type(head)
+            key = self.prefix + digest
+            if not await asyncio.to_thread(self._exists, key):
+                await asyncio.to_thread(
+                    self.client.upload_file, f.name, self.bucket, key, ExtraArgs={"ContentType": content_type}
+                )
+        return {"sha256": digest, "size": size, "content_type": content_type}
+
+    async def get(self, digest: str) -> Optional[bytes]:
+        try:
+            response = await asyncio.to_thread(
+                self.client.get_object, Bucket=self.bucket, Key=self.prefix + digest
+            )
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return await asyncio.to_thread(response["Body"].read)
+
+    async def iter_chunks(self, digest: str) -> AsyncIterator[bytes]:
+        response = await asyncio.to_thread(
+            self.client.get_object, Bucket=self.bucket, Key=self.prefix + digest
+        )
+        body = response["Body"]
+        while True:
+            chunk = await asyncio.to_thread(body.read, CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def create_blob_store(db):
+    """Builds the blob store selected by the BLOB_STORE environment variable."""
+    backend = os.getenv("BLOB_STORE", "gridfs").lower()
+    if backend == "local":
+        return LocalBlobStore(os.getenv("BLOB_STORE_PATH", "./blob_store"))
+    if backend == "s3":
+        return S3BlobStore(
+            os.getenv("S3_BUCKET"),
+            prefix=os.getenv("S3_PREFIX", "images/"),
+            endpoint_url=os.getenv("S3_ENDPOINT_URL")
+        )
+    return GridFSBlobStore(db, bucket_name=os.getenv("GRIDFS_BUCKET", "images"))
@@ -0,0 +1,126 @@
+"""Small geospatial helpers: geohash encoding and great-circle distance.
+
+Geohash cells are used as cache and index buckets for GPS lookups: nearby
+points share a prefix, and a cell plus its eight neighbours covers every point
+within one cell width of a query.
+"""
+import math
+from typing import List, Optional, Tuple
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_M = 6371008.8
+
+# Approximate cell size in metres (height, width at the equator) per geohash precision
+CELL_SIZE_M = {
+    1: (4992600, 5009400), 2: (624100, 1252300), 3: (156000, 156500), 4: (19500, 39100),
+    5: (4900, 4900), 6: (609.4, 1200), 7: (152.4, 152.9), 8: (19, 38.2), 9: (4.8, 4.8)
+}
+
+
+def encode(lat: float, lng: float, precision: int = 7) -> str:
+    """Geohash of a point at the given precision (number of characters)."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def decode_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """Returns (min_lat, min_lng, max_lat, max_lng) of a geohash cell."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def decode(geohash: str) -> Tuple[float, float]:
+    """Centre (lat, lng) of a geohash cell."""
+    min_lat, min_lng, max_lat, max_lng = decode_bounds(geohash)
+    return (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+
+
+def neighbors(geohash: str) -> List[str]:
+    """The cell itself and its eight neighbours."""
+    min_lat, min_lng, max_lat, max_lng = decode_bounds(geohash)
+    lat_step = max_lat - min_lat
+    lng_step = max_lng - min_lng
+    center_lat, center_lng = (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+    cells = []
+    for dlat in (-1, 0, 1):
+        for dlng in (-1, 0, 1):
+            lat = max(-89.999999, min(89.999999, center_lat + dlat * lat_step))
+            lng = (center_lng + dlng * lng_step + 180) % 360 - 180
+            cell = encode(lat, lng, len(geohash))
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def precision_for_radius(radius_m: float, lat: float = 0.0) -> int:
+    """Largest precision whose cells are at least `radius_m` across at `lat`.
+
+    A point's cell plus its eight neighbours then covers every point within `radius_m`.
+    """
+    shrink = math.cos(math.radians(lat))
+    for precision in range(9, 0, -1):
+        height, width = CELL_SIZE_M[precision]
+        if min(height, width * shrink) >= radius_m:
+            return precision
+    return 1
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in metres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def parse_point(gps_data) -> Tuple[float, float]:
+    """Returns (lat, lng) from a gps_data dict ({"latitude", "longitude"}), raising ValueError if invalid."""
+    if not isinstance(gps_data, dict):
+        raise ValueError("gps_data must be an object")
+    lat = float(gps_data["latitude"])
+    lng = float(gps_data["longitude"])
+    if not -90 <= lat <= 90 or not -180 <= lng <= 180 or (lat == 0 and lng == 0):
+        raise ValueError(f"Invalid coordinates: {lat}, {lng}")
+    return lat, lng
+
+
+def geojson_point(gps_data) -> Optional[dict]:
+    """GeoJSON Point ([lng, lat]) for a gps_data dict, or None when it has no valid coordinates."""
+    try:
+        lat, lng = parse_point(gps_data)
+    except (KeyError, TypeError, ValueError):
+        return None
+    return {"type": "Point", "coordinates": [lng, lat]}
@@ -0,0 +1,152 @@
+"""Server-side image normalization before model calls.
+
+Browser captures arrive at full camera resolution. Tags stay legible at a far
+smaller size, so every image is decoded once, auto-oriented from its EXIF data,
+downscaled to a maximum dimension and re-encoded under a byte budget before it
+is turned into the data URL that every analysis layer uploads.
+
+Both entry points take the image as bytes or as a seekable binary file (such as
+an upload's spool file), so a streamed upload is decoded straight from disk.
+"""
+import io
+import os
+import time
+from typing import Any, BinaryIO, Dict, Optional, Tuple, Union
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it images are sent as-is
+    Image = None
+    ImageOps = None
+
+IMAGE_NORMALIZE_ENABLED = os.getenv("IMAGE_NORMALIZE_ENABLED", "true").lower() == "true"
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "1600"))
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", "500000"))
+IMAGE_NORMALIZE_FORMAT = os.getenv("IMAGE_NORMALIZE_FORMAT", "jpeg").lower()
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+MIN_QUALITY = 50
+# dHash grid: 9x8 grayscale pixels give 8x8 = 64 left/right brightness comparisons
+DHASH_SIZE = 8
+
+ImageSource = Union[bytes, BinaryIO]
+
+
+def _open(source: ImageSource):
+    if isinstance(source, bytes):
+        return Image.open(io.BytesIO(source))
+    source.seek(0)
+    return Image.open(source)
+
+
+def _read(source: ImageSource) -> bytes:
+    if isinstance(source, bytes):
+        return source
+    source.seek(0)
+    return source.read()
+
+
+def _size(source: ImageSource) -> int:
+    if isinstance(source, bytes):
+        return len(source)
+    return source.seek(0, io.SEEK_END)
+
+
+def settings_key() -> str:
+    """Identifies the normalization settings, since they change what the model sees."""
+    if not IMAGE_NORMALIZE_ENABLED or Image is None:
+        return "original"
+    return f"{IMAGE_NORMALIZE_FORMAT}-{IMAGE_MAX_DIMENSION}px-{IMAGE_MAX_BYTES}b-q{IMAGE_QUALITY}"
+
+
+def _encode(image, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    if IMAGE_NORMALIZE_FORMAT == "webp":
+        image.save(buffer, format="WEBP", quality=quality, method=4)
+    else:
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def normalize_image(source: ImageSource) -> Tuple[bytes, Dict[str, Any]]:
+    """Returns (image_bytes_for_model, stats).
+
+    Falls back to the original bytes when normalization is disabled, Pillow is
+    missing, the image cannot be decoded, or re-encoding would not make it smaller.
+    JPEGs are decoded at a reduced DCT scale (twice the target size at most), so
+    a large photo is never expanded to full resolution in memory.
+    """
+    size = _size(source)
+    stats: Dict[str, Any] = {"original_bytes": size, "normalized_bytes": size, "normalized": False}
+    if not IMAGE_NORMALIZE_ENABLED:
+        stats["reason"] = "disabled"
+        return _read(source), stats
+    if Image is None:
+        stats["reason"] = "Pillow not installed"
+        return _read(source), stats
+
+    start = time.perf_counter()
+    try:
+        image = _open(source)
+        stats["original_size"] = list(image.size)
+        image.draft("RGB", (IMAGE_MAX_DIMENSION * 2, IMAGE_MAX_DIMENSION * 2))
+        image = ImageOps.exif_transpose(image)
+
+        if image.mode in ("RGBA", "LA", "P"):
+            # Flatten transparency onto white; JPEG has no alpha channel
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.split()[-1])
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        image.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION), Image.LANCZOS)
+
+        quality = IMAGE_QUALITY
+        encoded = _encode(image, quality)
+        while len(encoded) > IMAGE_MAX_BYTES and quality > MIN_QUALITY:
+            quality -= 10
+            encoded = _encode(image, quality)
+    except Exception as e:
+        stats["reason"] = f"decode failed: {e}"
+        return _read(source), stats
+
+    stats["duration_ms"] = int((time.perf_counter() - start) * 1000)
+    if len(encoded) >= size:
+        stats["reason"] = "original already smaller"
+        return _read(source), stats
+
+    stats.update({
+        "normalized": True,
+        "normalized_bytes": len(encoded),
+        "normalized_size": list(image.size),
+        "format": IMAGE_NORMALIZE_FORMAT,
+        "quality": quality
+    })
+    return encoded, stats
+
+
+def dhash(source: ImageSource) -> Optional[int]:
+    """64-bit difference hash of an image, or None if Pillow is missing or decoding fails.
+
+    Each bit says whether a pixel of a 9x8 grayscale thumbnail is brighter than its
+    right neighbour, so re-encoding, small crops and exposure changes flip few bits.
+    """
+    if Image is None:
+        return None
+    try:
+        image = _open(source)
+        # JPEG can decode straight to a small grayscale draft, skipping most of the work
+        image.draft("L", (DHASH_SIZE * 8, DHASH_SIZE * 8))
+        image = ImageOps.exif_transpose(image).convert("L")
+        image = image.resize((DHASH_SIZE + 1, DHASH_SIZE), Image.LANCZOS)
+    except Exception:
+        return None
+    pixels = list(image.getdata())
+    value = 0
+    for row in range(DHASH_SIZE):
+        for col in range(DHASH_SIZE):
+            left = pixels[row * (DHASH_SIZE + 1) + col]
+            right = pixels[row * (DHASH_SIZE + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
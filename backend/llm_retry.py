@@ -0,0 +1,197 @@
+"""Retries, deadlines and hedging for model calls.
+
+`RetryPolicy.run` wraps a single provider request (given as a zero-argument
+coroutine factory) so that:
+
+- transient failures (429, 5xx, timeouts, connection errors) are retried with
+  full-jitter exponential backoff, while permanent ones (auth, bad request)
+  fail immediately;
+- all attempts for a layer share one deadline, well below LLM_TIMEOUT, so a
+  single slow call cannot stretch the whole layer fan-out;
+- optionally, if a request has not answered after the layer's observed p95
+  latency, a second identical request is fired and whichever finishes first
+  wins (hedging).
+
+When given a scheduler, every attempt (hedges included) holds its own
+scheduler slot and rate-limit token for just the duration of the request, so
+backoff sleeps don't occupy a slot and a hedge is counted like any other call.
+The layer deadline starts when the first attempt is granted its slot; time
+spent queued behind other calls does not use it up.
+"""
+import asyncio
+import random
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+RETRYABLE_ERROR_NAMES = {
+    "RateLimitError", "Timeout", "APITimeoutError", "APIConnectionError",
+    "ServiceUnavailableError", "InternalServerError", "TimeoutError"
+}
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Classifies a provider error as transient (worth retrying) or permanent."""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code in RETRYABLE_STATUS_CODES
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+class RetryPolicy:
+    """Per-layer retry/deadline/hedging policy with latency tracking."""
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 20.0,
+        layer_timeout: float = 90.0,
+        hedge_enabled: bool = False,
+        hedge_min_delay: float = 5.0,
+        hedge_default_delay: float = 30.0,
+        hedge_min_samples: int = 20,
+        scheduler=None
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.layer_timeout = layer_timeout
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.scheduler = scheduler
+        self._latencies: Dict[str, deque] = {}
+        self.counters = {
+            "calls": 0, "retries": 0, "failures": 0, "deadline_exceeded": 0,
+            "hedges_fired": 0, "hedge_wins": 0
+        }
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff in seconds for the given retry number."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def record_latency(self, layer: str, seconds: float):
+        self._latencies.setdefault(layer, deque(maxlen=200)).append(seconds)
+
+    def p95(self, layer: str) -> Optional[float]:
+        samples = self._latencies.get(layer)
+        if not samples or len(samples) < self.hedge_min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def hedge_delay(self, layer: str) -> float:
+        p95 = self.p95(layer)
+        if p95 is None:
+            return self.hedge_default_delay
+        return max(self.hedge_min_delay, p95)
+
+    @asynccontextmanager
+    async def _slot(self, model: Optional[str]):
+        if self.scheduler is None or model is None:
+            yield
+            return
+        async with self.scheduler.slot(model):
+            yield
+
+    async def _attempt(
+        self, layer: str, call: Callable[[], Awaitable[Any]], model: Optional[str],
+        clock: Dict[str, Optional[float]], started: Optional[asyncio.Event] = None
+    ):
+        """One provider request, holding a scheduler slot and bounded by the layer deadline."""
+        async with self._slot(model):
+            loop = asyncio.get_running_loop()
+            if clock["deadline"] is None:
+                clock["deadline"] = loop.time() + self.layer_timeout
+            remaining = clock["deadline"] - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            if started is not None:
+                started.set()
+            start = loop.time()
+            result = await asyncio.wait_for(call(), timeout=remaining)
+            self.record_latency(layer, loop.time() - start)
+            return result
+
+    async def _hedged(
+        self, layer: str, call: Callable[[], Awaitable[Any]], model: Optional[str],
+        clock: Dict[str, Optional[float]]
+    ):
+        started = asyncio.Event()
+        primary = asyncio.create_task(self._attempt(layer, call, model, clock, started))
+        if not self.hedge_enabled:
+            return await primary
+
+        tasks = {primary}
+        # The hedge delay counts from when the primary is sent, not while it is queued
+        running = asyncio.create_task(started.wait())
+        try:
+            await asyncio.wait({primary, running}, return_when=asyncio.FIRST_COMPLETED)
+            running.cancel()
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay(layer))
+            if not done:
+                self.counters["hedges_fired"] += 1
+                hedge = asyncio.create_task(self._attempt(layer, call, model, clock))
+                tasks.add(hedge)
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.counters["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            running.cancel()
+            for task in tasks:
+                task.cancel()
+
+    async def run(self, layer: str, call: Callable[[], Awaitable[Any]], model: Optional[str] = None):
+        """Runs `call` under the layer deadline, retrying transient errors. Raises the last error.
+
+        `model` selects the scheduler slot each attempt waits for.
+        """
+        self.counters["calls"] += 1
+        loop = asyncio.get_running_loop()
+        clock: Dict[str, Optional[float]] = {"deadline": None}
+        attempt = 0
+        while True:
+            try:
+                if clock["deadline"] is None:
+                    return await self._hedged(layer, call, model, clock)
+                # Retries don't wait in the scheduler queue past the deadline either
+                remaining = clock["deadline"] - loop.time()
+                return await asyncio.wait_for(self._hedged(layer, call, model, clock), timeout=remaining)
+            except Exception as e:
+                deadline = clock["deadline"]
+                if deadline is not None and loop.time() >= deadline:
+                    self.counters["deadline_exceeded"] += 1
+                    self.counters["failures"] += 1
+                    raise
+                delay = self.backoff(attempt)
+                out_of_time = deadline is not None and loop.time() + delay >= deadline
+                if not is_retryable(e) or attempt >= self.max_retries or out_of_time:
+                    self.counters["failures"] += 1
+                    raise
+                attempt += 1
+                self.counters["retries"] += 1
+                print(f"🔁 Retrying {layer} in {delay:.1f}s after {type(e).__name__} (attempt {attempt}/{self.max_retries})")
+                await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "layer_timeout_s": self.layer_timeout,
+            "hedge_enabled": self.hedge_enabled,
+            "p95_ms_by_layer": {
+                layer: int(sorted(samples)[int(0.95 * (len(samples) - 1))] * 1000)
+                for layer, samples in self._latencies.items() if samples
+            }
+        }
@@ -0,0 +1,198 @@
+"""Process-wide scheduler for outbound model calls.
+
+Every analysis fans out into several concurrent `litellm.acompletion` calls, so a
+handful of simultaneous uploads can put dozens of requests in flight and trip the
+provider's rate limits. All calls go through one `LLMScheduler`, which caps the
+number of in-flight requests, applies a token bucket per model id, and grants
+free slots by priority: interactive (Technician mode, synchronous requests)
+before background (Submit & Go jobs and batches), FIFO within a class.
+Waiters are queued per model, so a model whose bucket is empty does not hold
+up calls to other models.
+
+The priority of a call comes from the `request_priority` context variable, so
+code that starts background work sets it once and every model call made from
+that task (including tasks it spawns with `asyncio.gather`) inherits it.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BACKGROUND: "background"}
+
+request_priority = contextvars.ContextVar("llm_request_priority", default=PRIORITY_INTERACTIVE)
+
+
+class TokenBucket:
+    """Requests-per-minute token bucket allowing bursts of up to `burst` calls."""
+
+    def __init__(self, rate_per_minute: float, burst: Optional[int] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst or max(1, int(rate_per_minute // 6)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available (0 when one can be taken now)."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+
+class LLMScheduler:
+    """Bounded, rate-limited, priority-ordered admission for model calls."""
+
+    def __init__(
+        self,
+        max_in_flight: int = 16,
+        rate_per_minute: float = 0,
+        burst: Optional[int] = None,
+        model_rates: Optional[Dict[str, float]] = None,
+        enabled: bool = True
+    ):
+        self.max_in_flight = max(1, max_in_flight)
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.model_rates = model_rates or {}
+        self.enabled = enabled
+        self.in_flight = 0
+        self._buckets: Dict[str, TokenBucket] = {}
+        # model -> heap of (priority, sequence, enqueued_at, future)
+        self._queues: Dict[str, list] = {}
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.max_queue_depth = 0
+        self.rate_limited = 0
+        self._waits = {name: deque(maxlen=500) for name in PRIORITY_NAMES.values()}
+        self._granted = {name: 0 for name in PRIORITY_NAMES.values()}
+
+    def _bucket(self, model: str) -> Optional[TokenBucket]:
+        rate = self.model_rates.get(model, self.rate_per_minute)
+        if not rate:
+            return None
+        if model not in self._buckets:
+            self._buckets[model] = TokenBucket(rate, self.burst)
+        return self._buckets[model]
+
+    def _record_wait(self, priority: int, enqueued_at: float):
+        name = PRIORITY_NAMES.get(priority, str(priority))
+        self._waits[name].append(time.monotonic() - enqueued_at)
+        self._granted[name] += 1
+
+    def _next_model(self):
+        """Returns (model whose head waiter goes next, shortest rate-limit delay among the rest).
+
+        Only models with a token available compete; among them the head with the best
+        (priority, sequence) wins.
+        """
+        best = None
+        wait = None
+        for model in list(self._queues):
+            queue = self._queues[model]
+            while queue and queue[0][3].done():  # waiter was cancelled
+                heapq.heappop(queue)
+            if not queue:
+                del self._queues[model]
+                continue
+            bucket = self._bucket(model)
+            delay = bucket.delay() if bucket else 0.0
+            if delay > 0:
+                wait = delay if wait is None else min(wait, delay)
+            elif best is None or queue[0][:2] < self._queues[best][0][:2]:
+                best = model
+        return best, wait
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self.in_flight < self.max_in_flight:
+            model, wait = self._next_model()
+            if model is None:
+                if wait is not None:
+                    self.rate_limited += 1
+                    self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            priority, _, enqueued_at, future = heapq.heappop(self._queues[model])
+            bucket = self._bucket(model)
+            if bucket:
+                bucket.take()
+            self.in_flight += 1
+            self._record_wait(priority, enqueued_at)
+            future.set_result(None)
+
+    def _queue_depth(self) -> int:
+        return sum(1 for queue in self._queues.values() for entry in queue if not entry[3].done())
+
+    async def acquire(self, model: str, priority: Optional[int] = None):
+        """Waits for an in-flight slot (and a rate-limit token) for `model`."""
+        if priority is None:
+            priority = request_priority.get()
+        enqueued_at = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queues.setdefault(model, []), (priority, next(self._sequence), enqueued_at, future))
+        self.max_queue_depth = max(self.max_queue_depth, self._queue_depth())
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was granted just as the caller was cancelled
+                self.release()
+            else:
+                future.cancel()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, model: str, priority: Optional[int] = None):
+        """`async with scheduler.slot(model):` around a single provider request."""
+        if not self.enabled:
+            yield
+            return
+        await self.acquire(model, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        waits = {}
+        for name, samples in self._waits.items():
+            ordered = sorted(samples)
+            waits[name] = {
+                "granted": self._granted[name],
+                "avg_wait_ms": int(sum(ordered) / len(ordered) * 1000) if ordered else 0,
+                "p95_wait_ms": int(ordered[int(0.95 * (len(ordered) - 1))] * 1000) if ordered else 0,
+                "max_wait_ms": int(ordered[-1] * 1000) if ordered else 0
+            }
+        return {
+            "enabled": self.enabled,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "queue_depth": self._queue_depth(),
+            "max_queue_depth": self.max_queue_depth,
+            "rate_per_minute": self.rate_per_minute,
+            "model_rates": self.model_rates,
+            "rate_limited": self.rate_limited,
+            "waits": waits
+        }
@@ -0,0 +1,121 @@
+"""Per-layer model routing with fast-model-first escalation.
+
+Most field layers expect a one-token answer (a day, a month, "Good") and do not
+need the pro model. With routing enabled each layer has an ordered list of
+models (tiers); the first, cheaper tier is asked first and the next tier is
+only called when the answer fails that layer's validator, e.g. a non-numeric
+year, a month outside 1-12 or unparseable company JSON. Per-layer counters
+record which tier answered and how long each tier took.
+"""
+import hashlib
+import json
+import re
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+FAST_TIER_LAYERS = [
+    "year", "month", "day", "extinguisher_type", "condition",
+    "company_info", "equipment_numbers", "service_details"
+]
+
+
+def _number_validator(low: int, high_fn: Callable[[], int]):
+    def validate(value: str) -> bool:
+        # An 'unknown' date part blocks the due-date calculation, so let the pro model try
+        value = value.strip()
+        return value.isdigit() and low <= int(value) <= high_fn()
+    return validate
+
+
+def _json_validator(value: str) -> bool:
+    value = value.strip()
+    if value.lower() == "unknown":
+        return True
+    match = re.search(r'\{.*\}', value, re.DOTALL)
+    if not match:
+        return False
+    try:
+        json.loads(match.group(0))
+        return True
+    except json.JSONDecodeError:
+        return False
+
+
+def _short_text_validator(max_words: int):
+    def validate(value: str) -> bool:
+        value = value.strip()
+        return bool(value) and len(value.split()) <= max_words
+    return validate
+
+
+LAYER_VALIDATORS: Dict[str, Callable[[str], bool]] = {
+    "year": _number_validator(1900, lambda: datetime.utcnow().year + 1),
+    "month": _number_validator(1, lambda: 12),
+    "day": _number_validator(1, lambda: 31),
+    "extinguisher_type": _short_text_validator(4),
+    "condition": lambda value: value.strip().lower() in ("good", "fair", "poor", "unknown"),
+    "company_info": _json_validator,
+    "equipment_numbers": _json_validator,
+    "service_details": _json_validator,
+}
+
+
+class ModelRouter:
+    """Maps analysis layers to ordered model tiers and tracks which tier answered."""
+
+    def __init__(
+        self,
+        default_model: str,
+        fast_model: Optional[str] = None,
+        routes: Optional[Dict[str, List[str]]] = None,
+        enabled: bool = False
+    ):
+        self.default_model = default_model
+        self.enabled = enabled
+        self.routes: Dict[str, List[str]] = {}
+        if enabled and fast_model:
+            self.routes = {layer: [fast_model, default_model] for layer in FAST_TIER_LAYERS}
+        if enabled and routes:
+            self.routes.update(routes)
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def tiers(self, layer: Optional[str]) -> List[str]:
+        return self.routes.get(layer) or [self.default_model]
+
+    def validate(self, layer: str, value: str) -> bool:
+        validator = LAYER_VALIDATORS.get(layer)
+        return validator(value) if validator else True
+
+    def settings_key(self) -> str:
+        """Identifies the routing table, since it changes which model produced each field."""
+        if not self.routes:
+            return "single"
+        encoded = json.dumps(self.routes, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()[:12]
+
+    def record(self, layer: str, tier: int, model: str, seconds: float, accepted: bool):
+        layer_stats = self._stats.setdefault(layer, {"answered_by_tier": {}, "escalations": 0, "tiers": {}})
+        tier_stats = layer_stats["tiers"].setdefault(str(tier), {"model": model, "calls": 0, "total_ms": 0})
+        tier_stats["calls"] += 1
+        tier_stats["total_ms"] += int(seconds * 1000)
+        if accepted:
+            layer_stats["answered_by_tier"][str(tier)] = layer_stats["answered_by_tier"].get(str(tier), 0) + 1
+        else:
+            layer_stats["escalations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        layers = {}
+        for layer, layer_stats in self._stats.items():
+            layers[layer] = {
+                "answered_by_tier": layer_stats["answered_by_tier"],
+                "escalations": layer_stats["escalations"],
+                "tiers": {
+                    tier: {
+                        "model": tier_stats["model"],
+                        "calls": tier_stats["calls"],
+                        "avg_ms": tier_stats["total_ms"] // tier_stats["calls"] if tier_stats["calls"] else 0
+                    }
+                    for tier, tier_stats in layer_stats["tiers"].items()
+                }
+            }
+        return {"enabled": self.enabled, "routes": self.routes, "layers": layers}
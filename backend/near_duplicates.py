@@ -0,0 +1,136 @@
+"""Near-duplicate photo detection with perceptual hashes.
+
+The analysis cache only helps when the exact same bytes are resubmitted. The
+same tag photographed twice a few seconds apart produces different bytes but
+nearly the same 64-bit dHash (see image_processing.dhash). The hash is stored
+on the inspection at ingest, together with its eight 8-bit chunks
+("0:ab", "1:..."). Lookups use multi-index hashing: two hashes within
+Hamming distance 7 must agree exactly on at least one of the eight chunks, so
+an indexed `$in` over the chunks finds every candidate. Exact distances are
+then checked in Python. Only inspections of the same user from the last few
+minutes with a usable analysis are considered, and only at the same place: GPS
+within `max_distance_m` and no conflicting business name. Different tags of
+the same service company can look alike, so the distance threshold and time
+window are deliberately tight.
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import geo
+from site_index import normalize_business_name
+
+CHUNKS = 8
+CHUNK_BITS = 8
+# Multi-index hashing with 8 chunks only guarantees recall up to 7 differing bits
+MAX_HAMMING = CHUNKS - 1
+CANDIDATE_LIMIT = 20
+
+
+def phash_hex(value: int) -> str:
+    return f"{value:016x}"
+
+
+def phash_chunks(value: int) -> List[str]:
+    """Position-tagged 8-bit chunks of a 64-bit hash, most significant first."""
+    mask = (1 << CHUNK_BITS) - 1
+    return [
+        f"{index}:{(value >> (CHUNK_BITS * (CHUNKS - 1 - index))) & mask:02x}"
+        for index in range(CHUNKS)
+    ]
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class NearDuplicateFinder:
+    """Finds a recent analyzed inspection whose photo is perceptually the same."""
+
+    def __init__(
+        self,
+        collection,
+        max_hamming: int = 4,
+        window_minutes: float = 10,
+        max_distance_m: float = 150,
+        enabled: bool = True
+    ):
+        self.collection = collection
+        self.max_hamming = max(0, min(max_hamming, MAX_HAMMING))
+        self.window = timedelta(minutes=window_minutes)
+        self.max_distance_m = max_distance_m
+        self.enabled = enabled
+        self.lookups = 0
+        self.hits = 0
+        self.hit_distances: Dict[str, int] = {}
+
+    @staticmethod
+    def fields(value: Optional[int]) -> Dict[str, Any]:
+        """Inspection fields storing a perceptual hash (empty when there is none)."""
+        if value is None:
+            return {}
+        return {"phash": phash_hex(value), "phash_chunks": phash_chunks(value)}
+
+    def _same_place(self, inspection: Dict[str, Any], candidate: Dict[str, Any]) -> bool:
+        point, other = inspection.get("location_point"), candidate.get("location_point")
+        if point and other:
+            lng, lat = point["coordinates"]
+            other_lng, other_lat = other["coordinates"]
+            if geo.haversine_m(lat, lng, other_lat, other_lng) > self.max_distance_m:
+                return False
+        name = normalize_business_name(inspection.get("business_name"))
+        other_name = normalize_business_name(candidate.get("business_name"))
+        return not (name and other_name and name != other_name)
+
+    async def find(self, inspection: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], int]]:
+        """Returns (duplicate inspection, Hamming distance) for the closest match, or None.
+
+        The duplicate carries `id`, `analysis` (parsed), `analysis_engine` and `prompt_versions`.
+        """
+        if not self.enabled or not inspection.get("phash"):
+            return None
+        self.lookups += 1
+        value = int(inspection["phash"], 16)
+        cursor = self.collection.find(
+            {
+                "user_id": inspection["user_id"],
+                "phash_chunks": {"$in": phash_chunks(value)},
+                "status": "analyzed",
+                "id": {"$ne": inspection.get("id")},
+                "created_at": {"$gte": datetime.utcnow() - self.window}
+            },
+            {
+                "_id": 0, "id": 1, "phash": 1, "location_point": 1, "business_name": 1,
+                "gemini_response": 1, "analysis_engine": 1, "prompt_versions": 1
+            }
+        ).sort([("created_at", -1)]).limit(CANDIDATE_LIMIT)
+
+        best = None
+        async for candidate in cursor:
+            distance = hamming(value, int(candidate["phash"], 16))
+            if distance > self.max_hamming or not self._same_place(inspection, candidate):
+                continue
+            try:
+                candidate["analysis"] = json.loads(candidate.pop("gemini_response", None) or "{}")
+            except (json.JSONDecodeError, TypeError):
+                continue
+            # Like the analysis cache, never reuse a result whose model calls failed
+            if candidate["analysis"].get("raw_text_analysis") in (None, "", "unknown"):
+                continue
+            if best is None or distance < best[1]:
+                best = (candidate, distance)
+        if best:
+            self.hits += 1
+            self.hit_distances[str(best[1])] = self.hit_distances.get(str(best[1]), 0) + 1
+        return best
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_hamming": self.max_hamming,
+            "window_minutes": self.window.total_seconds() / 60,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+            "hit_distances": self.hit_distances
+        }
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Side-by-side Layer 1 OCR comparison: vision model vs local Tesseract.
+
+Runs both engines over every image in a folder and reports latency and
+accuracy per engine. Accuracy is measured against `<image stem>.txt` ground
+truth when present (otherwise the model output is the reference):
+
+- text similarity: difflib ratio on whitespace/case-normalized text
+- date: whether parse_tag_date() on the engine's text finds the same date as on the reference
+
+Usage (from backend/, with the usual .env for the model):
+    python ocr_benchmark.py ../samples/tags --engines llm,tesseract --json results.json
+"""
+
+import argparse
+import asyncio
+import difflib
+import json
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+import image_processing
+import ocr_engine
+import tag_dates
+from server import build_data_url, extract_raw_text_llm
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def normalize_text(text: str) -> str:
+    return " ".join((text or "").upper().split())
+
+
+def similarity(a: str, b: str) -> float:
+    return difflib.SequenceMatcher(None, normalize_text(a), normalize_text(b)).ratio()
+
+
+def date_of(text: str):
+    parsed = tag_dates.parse_tag_date(text)
+    if not parsed:
+        return None
+    return parsed["year"], parsed["month"], parsed.get("day")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_engine(engine: str, image_bytes: bytes):
+    """Returns (text, seconds) for one engine, using the same normalized image as the pipeline."""
+    model_image, _ = await asyncio.to_thread(image_processing.normalize_image, image_bytes)
+    start = time.perf_counter()
+    if engine == "tesseract":
+        text = await ocr_engine.local_ocr(model_image)
+    else:
+        text = await extract_raw_text_llm(build_data_url(model_image))
+    return text, time.perf_counter() - start
+
+
+async def benchmark(folder: str, engines, concurrency: int):
+    names = sorted(name for name in os.listdir(folder) if name.lower().endswith(IMAGE_EXTENSIONS))
+    if not names:
+        print(f"❌ No images found in {folder}")
+        return []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(name):
+        async with semaphore:
+            with open(os.path.join(folder, name), "rb") as f:
+                image_bytes = f.read()
+            truth_path = os.path.join(folder, os.path.splitext(name)[0] + ".txt")
+            truth = None
+            if os.path.exists(truth_path):
+                with open(truth_path) as f:
+                    truth = f.read()
+            row = {"image": name, "ground_truth": truth is not None, "engines": {}}
+            for engine in engines:
+                try:
+                    text, seconds = await run_engine(engine, image_bytes)
+                    row["engines"][engine] = {"text": text, "latency_ms": int(seconds * 1000)}
+                except Exception as e:
+                    row["engines"][engine] = {"text": "", "latency_ms": None, "error": f"{type(e).__name__}: {e}"}
+            reference = truth if truth is not None else row["engines"].get("llm", {}).get("text")
+            for result in row["engines"].values():
+                if reference is not None:
+                    result["similarity"] = round(similarity(result["text"], reference), 3)
+                    result["date"] = date_of(result["text"])
+                    result["date_match"] = result["date"] is not None and result["date"] == date_of(reference)
+            print(f"🏷️ {name}: " + ", ".join(
+                f"{engine} {r['latency_ms']}ms sim={r.get('similarity', '-')}" for engine, r in row["engines"].items()
+            ))
+            return row
+
+    return await asyncio.gather(*(one(name) for name in names))
+
+
+def summarize(rows, engines):
+    print(f"\n📊 {len(rows)} images")
+    summary = {}
+    for engine in engines:
+        results = [row["engines"][engine] for row in rows if engine in row["engines"]]
+        latencies = [r["latency_ms"] for r in results if r["latency_ms"] is not None]
+        similarities = [r["similarity"] for r in results if "similarity" in r]
+        date_matches = [r["date_match"] for r in results if "date_match" in r]
+        summary[engine] = {
+            "errors": sum(1 for r in results if "error" in r),
+            "p50_ms": int(statistics.median(latencies)) if latencies else None,
+            "p95_ms": percentile(latencies, 95) if latencies else None,
+            "mean_similarity": round(statistics.mean(similarities), 3) if similarities else None,
+            "date_match_rate": round(sum(date_matches) / len(date_matches), 3) if date_matches else None
+        }
+        s = summary[engine]
+        print(
+            f"  - {engine}: p50={s['p50_ms']}ms p95={s['p95_ms']}ms "
+            f"similarity={s['mean_similarity']} date_match={s['date_match_rate']} errors={s['errors']}"
+        )
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare model vs local OCR on a folder of tag photos")
+    parser.add_argument("folder")
+    parser.add_argument("--engines", default="llm,tesseract")
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--json", help="Write per-image results and the summary to this file")
+    args = parser.parse_args()
+
+    engines = [engine.strip() for engine in args.engines.split(",") if engine.strip()]
+    if "tesseract" in engines and not ocr_engine.available():
+        print("❌ pytesseract is not installed; install it (and the tesseract binary) or use --engines llm")
+        sys.exit(1)
+
+    rows = asyncio.run(benchmark(args.folder, engines, args.concurrency))
+    if not rows:
+        sys.exit(1)
+    summary = summarize(rows, engines)
+    ocr_engine.shutdown()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"summary": summary, "images": rows}, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Local OCR backend for Layer 1 (raw text extraction).
+
+With OCR_ENGINE=tesseract the tag text is read on the CPU with Tesseract
+instead of a remote vision call, and the field layers start as soon as it
+finishes. Recognition runs in a process pool so it never blocks the event loop.
+pytesseract (and the `tesseract` binary) are optional: when they are missing,
+or the local result is too short to be useful, callers fall back to the model.
+"""
+import asyncio
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+try:
+    import pytesseract
+    from PIL import Image, ImageOps
+except ImportError:  # optional dependency
+    pytesseract = None
+    Image = None
+    ImageOps = None
+
+OCR_ENGINE = os.getenv("OCR_ENGINE", "llm").lower()
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))
+OCR_MIN_CHARS = int(os.getenv("OCR_MIN_CHARS", "12"))
+OCR_FALLBACK_TO_LLM = os.getenv("OCR_FALLBACK_TO_LLM", "true").lower() == "true"
+TESSERACT_CONFIG = os.getenv("TESSERACT_CONFIG", "--oem 1 --psm 6")
+# Tags photographed at a distance are small; upscale so glyphs are ~30px high
+MIN_OCR_WIDTH = 1200
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def available() -> bool:
+    return pytesseract is not None
+
+
+def use_local_ocr() -> bool:
+    return OCR_ENGINE == "tesseract" and available()
+
+
+def _tesseract_ocr(image_bytes: bytes) -> str:
+    """Runs in a worker process: grayscale, autocontrast, upscale, then Tesseract."""
+    image = Image.open(io.BytesIO(image_bytes))
+    image = ImageOps.exif_transpose(image).convert("L")
+    image = ImageOps.autocontrast(image)
+    if image.width < MIN_OCR_WIDTH:
+        scale = MIN_OCR_WIDTH / image.width
+        image = image.resize((MIN_OCR_WIDTH, int(image.height * scale)), Image.LANCZOS)
+    text = pytesseract.image_to_string(image, config=TESSERACT_CONFIG)
+    # Collapse blank lines; keep line structure for the date parser
+    return "\n".join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=OCR_WORKERS)
+    return _executor
+
+
+async def local_ocr(image_bytes: bytes) -> str:
+    """Reads the text of an image with Tesseract in the OCR process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool(), _tesseract_ocr, image_bytes)
+
+
+def usable(text: str) -> bool:
+    """Whether a local OCR result has enough text to feed the field layers."""
+    return len((text or "").strip()) >= OCR_MIN_CHARS
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,223 @@
+"""Cached, pooled client for nearby-business lookups (/api/places/nearby).
+
+Technicians at the same site ask for the same neighbourhood over and over, so
+responses are cached per geohash cell and radius. A miss searches around the
+caller's own point; later queries inside the cell are answered with that result
+until the entry expires (`ttl_seconds`), and the cache is LRU-bounded by
+`max_entries`. A cached answer can therefore be centred up to one cell diagonal
+away from the caller: ~43 m at the default precision 8, a small fraction of the
+500 m search radius the app uses (precision 7 would allow ~216 m). Concurrent
+identical lookups share one in-flight provider call instead of each calling
+Google. The Google provider reuses one pooled httpx.AsyncClient; the stub
+provider returns fixed sample businesses for local development and tests.
+"""
+import asyncio
+import copy
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+import geo
+from analysis_cache import LRUCache
+
+NEARBY_SEARCH_URL = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+MAX_RESULTS = 10
+
+
+class PlacesError(Exception):
+    """Raised when the places provider fails; the message is safe to return to clients."""
+
+
+class StubPlacesProvider:
+    """Fixed sample businesses, used when no API key is configured or PLACES_PROVIDER=stub."""
+
+    name = "stub"
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def search(self, lat: float, lng: float, radius: int) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": "ABC Fire Safety Services",
+                "address": "123 Safety St, Business District",
+                "rating": 4.5,
+                "place_id": "mock_place_1",
+                "types": ["fire_safety", "business"]
+            },
+            {
+                "name": "Professional Fire Protection",
+                "address": "456 Protection Ave, Industrial Area",
+                "rating": 4.2,
+                "place_id": "mock_place_2",
+                "types": ["fire_safety", "business"]
+            },
+            {
+                "name": "Metro Business Center",
+                "address": "789 Commerce Blvd, Downtown",
+                "rating": 4.0,
+                "place_id": "mock_place_3",
+                "types": ["business", "office_building"]
+            }
+        ]
+
+
+class GooglePlacesProvider:
+    """Google Places Nearby Search over a pooled async HTTP client."""
+
+    name = "google"
+
+    def __init__(self, api_key: str, timeout: float = 10.0, max_connections: int = 10):
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+
+    async def stop(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def search(self, lat: float, lng: float, radius: int) -> List[Dict[str, Any]]:
+        await self.start()
+        params = {
+            "location": f"{lat},{lng}",
+            "radius": radius,
+            "type": "establishment",  # General business establishments
+            "key": self.api_key
+        }
+        try:
+            response = await self.client.get(NEARBY_SEARCH_URL, params=params)
+        except httpx.HTTPError as e:
+            print(f"❌ Network error calling Google Places API: {str(e)}")
+            raise PlacesError("Network error accessing Google Places API")
+
+        if response.status_code != 200:
+            print(f"❌ Google Places API error: {response.status_code}")
+            raise PlacesError("Google Places API error")
+
+        data = response.json()
+        status = data.get("status")
+        if status == "ZERO_RESULTS":
+            return []
+        if status != "OK":
+            print(f"❌ Google Places API status: {status}")
+            raise PlacesError(f"Google Places API: {status}")
+
+        places = []
+        for place in data.get("results", []):
+            if place.get("business_status") == "OPERATIONAL":
+                places.append({
+                    "name": place.get("name", "Unknown Business"),
+                    "address": place.get("vicinity", "Address not available"),
+                    "rating": place.get("rating", 0),
+                    "place_id": place.get("place_id"),
+                    "types": place.get("types", [])
+                })
+        return places
+
+
+class PlacesClient:
+    """Geohash-bucketed TTL/LRU cache with request coalescing in front of a places provider."""
+
+    def __init__(self, provider, ttl_seconds: float = 3600, max_entries: int = 1024, precision: int = 8):
+        self.provider = provider
+        self.ttl_seconds = ttl_seconds
+        self.precision = precision
+        self.cache = LRUCache(max_entries)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.coalesced = 0
+        self.provider_calls = 0
+        self.provider_errors = 0
+        self.provider_ms_total = 0
+
+    async def start(self):
+        await self.provider.start()
+
+    async def stop(self):
+        await self.provider.stop()
+
+    async def _fetch(self, key: str, lat: float, lng: float, radius: int) -> List[Dict[str, Any]]:
+        start = time.perf_counter()
+        self.provider_calls += 1
+        try:
+            places = await self.provider.search(lat, lng, radius)
+        except Exception:
+            self.provider_errors += 1
+            raise
+        finally:
+            self.provider_ms_total += int((time.perf_counter() - start) * 1000)
+
+        # Sort by rating (highest first) and limit to the top results
+        places.sort(key=lambda x: x["rating"], reverse=True)
+        places = places[:MAX_RESULTS]
+        if self.ttl_seconds > 0:
+            self.cache.set(key, (time.monotonic() + self.ttl_seconds, places))
+        return places
+
+    async def nearby(self, lat: float, lng: float, radius: int) -> List[Dict[str, Any]]:
+        """Nearby businesses for a point, from the cache when the cell was looked up recently."""
+        cell = geo.encode(lat, lng, self.precision)
+        key = f"{cell}:{radius}"
+
+        entry = self.cache.get(key)
+        if entry is not None:
+            expires_at, places = entry
+            if expires_at > time.monotonic():
+                self.hits += 1
+                return copy.deepcopy(places)
+            self.expired += 1
+        self.misses += 1
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.create_task(self._fetch(key, lat, lng, radius))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one caller disconnecting does not cancel the lookup for the others
+        places = await asyncio.shield(task)
+        return copy.deepcopy(places)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "provider": self.provider.name,
+            "entries": len(self.cache),
+            "ttl_seconds": self.ttl_seconds,
+            "geohash_precision": self.precision,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "coalesced": self.coalesced,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "provider_calls": self.provider_calls,
+            "provider_errors": self.provider_errors,
+            "provider_avg_ms": self.provider_ms_total // self.provider_calls if self.provider_calls else 0,
+            "in_flight": len(self._inflight)
+        }
+
+
+def create_places_provider(provider: str, api_key: Optional[str], timeout: float = 10.0):
+    """Google when selected and an API key is configured, otherwise the stub provider."""
+    if provider == "google" and api_key:
+        return GooglePlacesProvider(api_key, timeout=timeout)
+    return StubPlacesProvider()
@@ -0,0 +1,198 @@
+"""Versioned prompt templates for every analysis layer.
+
+Each layer's prompt lives here under a stable id (`<layer>@<version>`) with a
+content hash, instead of being rebuilt inline by its `analyze_*` helper. The
+active version of each layer can be switched with PROMPT_VERSIONS (JSON,
+e.g. {"year": "1"}) for A/B evaluation, and the ids/hashes in use are recorded
+on every inspection.
+
+Version 2 of the field layers no longer interpolates the OCR text into each
+question. Instead `analyze_image_layer` sends a shared prefix - system prompt,
+image, then the OCR text block (`ocr_context`) - followed by the short layer
+question, so the eight field calls for an image share an identical, cacheable
+prefix.
+"""
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+
+class PromptTemplate:
+    """A versioned `str.format` template; `{raw_text}` is the only placeholder."""
+
+    def __init__(self, layer: str, version: str, template: str, shared_context: bool = False):
+        self.layer = layer
+        self.version = version
+        self.template = template
+        # True: the OCR text is sent in the shared prefix rather than inside this prompt
+        self.shared_context = shared_context
+        self.hash = hashlib.sha256(template.encode("utf-8")).hexdigest()[:12]
+
+    @property
+    def id(self) -> str:
+        return f"{self.layer}@{self.version}"
+
+    def render(self, raw_text: Optional[str] = None) -> str:
+        return self.template.format(raw_text=raw_text or "")
+
+
+_REGISTRY: Dict[str, Dict[str, PromptTemplate]] = {}
+
+
+def register(layer: str, version: str, template: str, shared_context: bool = False) -> PromptTemplate:
+    prompt = PromptTemplate(layer, version, template, shared_context)
+    _REGISTRY.setdefault(layer, {})[version] = prompt
+    return prompt
+
+
+register("system", "1", (
+    "You are an NFPA-10–savvy fire safety expert analyzing images. If this is a fire extinguisher tag, "
+    "analyze hole-punched dates, preferring the newest complete combo. If multiple days are punched, "
+    "choose the lowest. If this is NOT a fire extinguisher tag, provide helpful observations about what "
+    "you see instead. For non-extinguisher images, describe what it is (e.g., 'Safety notice', 'Equipment "
+    "label', 'Not fire equipment'). Always respond with only the exact value requested (no prose). Use "
+    "'unknown' only if truly unreadable."
+))
+register("ocr_context", "1", "OCR text extracted from this tag:\n\"\"\"\n{raw_text}\n\"\"\"")
+register("raw_text", "1", (
+    "Look at this fire extinguisher inspection tag and extract ALL visible text exactly as it appears. "
+    "Include numbers, dates, punched holes, and any written text. Return only the raw text with no "
+    "commentary."
+))
+register("fused", "1", (
+    "This is a fire extinguisher inspection tag. In ONE pass, read the tag and return a single JSON object with exactly these keys:\n"
+    "- 'raw_text': ALL visible text exactly as it appears (numbers, dates, punched holes, written text)\n"
+    "- 'year': the most recent inspection year as a 4-digit number, or 'unknown'\n"
+    "- 'month': the most recent inspection month (1-12), or 'unknown'\n"
+    "- 'day': the most recent inspection day (1-31), or 'unknown'\n"
+    "- 'extinguisher_type': the type classification (e.g. 'ABC', 'CO2', 'Dry Chemical'), or 'unknown'\n"
+    "- 'condition': one of 'Good', 'Fair', 'Poor', 'unknown'\n"
+    "- 'service_company': {{'name': ..., 'address': ..., 'phone': ..., 'website': ...}} or 'unknown'\n"
+    "- 'equipment_numbers': {{'ae_number': ..., 'he_number': ..., 'ee_number': ..., 'fe_number': ...}} or 'unknown'\n"
+    "- 'service_details': {{'service_type': ..., 'additional_services': [...]}} or 'unknown'\n"
+    "Dates may be punched holes, handwritten numbers, or printed dates. Respond with ONLY the JSON object, no markdown and no commentary."
+))
+
+# Version 1: OCR text interpolated into every question (original prompts)
+register("year", "1", (
+    "This is a fire extinguisher inspection tag. Look for the most recent inspection year - this could be "
+    "punched holes, handwritten numbers, or printed dates. The year should be between 2020-2025. From "
+    "this text: '{raw_text}' and the image, what is the inspection YEAR? Respond with only the 4-digit "
+    "year (e.g., 2024) or 'unknown' if not found."
+))
+register("month", "1", (
+    "This is a fire extinguisher inspection tag. Look for the most recent inspection month - this could "
+    "be punched holes, handwritten numbers, or printed dates. From this text: '{raw_text}' and the image, "
+    "what is the inspection MONTH? Respond with only the month number (1-12) or 'unknown' if not found."
+))
+register("day", "1", (
+    "This is a fire extinguisher inspection tag. Look for the most recent inspection day - this could be "
+    "punched holes, handwritten numbers, or printed dates. From this text: '{raw_text}' and the image, "
+    "what is the inspection DAY? Respond with only the day number (1-31) or 'unknown' if not found."
+))
+register("extinguisher_type", "1", (
+    "This is a fire extinguisher inspection tag. Look for the extinguisher type classification (like ABC, "
+    "BC, CO2, Class A, Class B, Class C, Class K, Water, Foam, Dry Chemical, etc.). From this text: "
+    "'{raw_text}' and the image, what is the extinguisher TYPE? IMPORTANT: Respond with ONLY the type "
+    "classification (e.g., 'ABC', 'CO2', 'Dry Chemical') or 'unknown' if not found. Do not include "
+    "explanations or reasoning - just the final answer."
+))
+register("condition", "1", (
+    "This is a fire extinguisher inspection tag. Based on the inspection information, assess the overall "
+    "condition. Look for any indicators of problems, maintenance needs, or good condition. From this "
+    "text: '{raw_text}' and the image, what is the overall CONDITION? IMPORTANT: Respond with ONLY one "
+    "word: 'Good', 'Fair', 'Poor', or 'unknown'. No explanations."
+))
+register("company_info", "1", (
+    "This is a fire extinguisher inspection tag. Look for the service company information including "
+    "company name, address, phone number, and website. From this text: '{raw_text}' and the image, "
+    "extract the COMPANY INFO. Respond with a JSON object like {{'name': 'Company Name', 'address': 'Full "
+    "Address', 'phone': 'Phone Number', 'website': 'Website'}} or 'unknown' if not found."
+))
+register("equipment_numbers", "1", (
+    "This is a fire extinguisher inspection tag. Look for equipment identification numbers like AE#, HE#, "
+    "EE#, FE# or similar asset/equipment numbers. From this text: '{raw_text}' and the image, extract the "
+    "EQUIPMENT NUMBERS. Respond with a JSON object like {{'ae_number': 'value', 'he_number': 'value', "
+    "'ee_number': 'value', 'fe_number': 'value'}} or 'unknown' if not found."
+))
+register("service_details", "1", (
+    "This is a fire extinguisher inspection tag. Look for service type checkboxes or markings like ANNUAL "
+    "INSP, SEMI ANNUAL INSP, QUARTERLY INSP, REPAIR, RECHARGE, NEW INSTALL, HYDRO, F/A, P/A, C/A, etc. "
+    "From this text: '{raw_text}' and the image, extract the SERVICE DETAILS. Respond with a JSON object "
+    "like {{'service_type': 'Annual Inspection', 'additional_services': ['Recharge', 'Repair']}} or "
+    "'unknown' if not found."
+))
+
+# Version 2: OCR text moved to the shared, cacheable prefix
+register("year", "2", (
+    "This is a fire extinguisher inspection tag. Look for the most recent inspection year - this could be "
+    "punched holes, handwritten numbers, or printed dates. The year should be between 2020-2025. From "
+    "the OCR text above and the image, what is the inspection YEAR? Respond with only the 4-digit year "
+    "(e.g., 2024) or 'unknown' if not found."
+), shared_context=True)
+register("month", "2", (
+    "This is a fire extinguisher inspection tag. Look for the most recent inspection month - this could "
+    "be punched holes, handwritten numbers, or printed dates. From the OCR text above and the image, what "
+    "is the inspection MONTH? Respond with only the month number (1-12) or 'unknown' if not found."
+), shared_context=True)
+register("day", "2", (
+    "This is a fire extinguisher inspection tag. Look for the most recent inspection day - this could be "
+    "punched holes, handwritten numbers, or printed dates. From the OCR text above and the image, what is "
+    "the inspection DAY? Respond with only the day number (1-31) or 'unknown' if not found."
+), shared_context=True)
+register("extinguisher_type", "2", (
+    "This is a fire extinguisher inspection tag. Look for the extinguisher type classification (like ABC, "
+    "BC, CO2, Class A, Class B, Class C, Class K, Water, Foam, Dry Chemical, etc.). From the OCR text "
+    "above and the image, what is the extinguisher TYPE? IMPORTANT: Respond with ONLY the type "
+    "classification (e.g., 'ABC', 'CO2', 'Dry Chemical') or 'unknown' if not found. Do not include "
+    "explanations or reasoning - just the final answer."
+), shared_context=True)
+register("condition", "2", (
+    "This is a fire extinguisher inspection tag. Based on the inspection information, assess the overall "
+    "condition. Look for any indicators of problems, maintenance needs, or good condition. From the OCR "
+    "text above and the image, what is the overall CONDITION? IMPORTANT: Respond with ONLY one word: "
+    "'Good', 'Fair', 'Poor', or 'unknown'. No explanations."
+), shared_context=True)
+register("company_info", "2", (
+    "This is a fire extinguisher inspection tag. Look for the service company information including "
+    "company name, address, phone number, and website. From the OCR text above and the image, extract the "
+    "COMPANY INFO. Respond with a JSON object like {{'name': 'Company Name', 'address': 'Full Address', "
+    "'phone': 'Phone Number', 'website': 'Website'}} or 'unknown' if not found."
+), shared_context=True)
+register("equipment_numbers", "2", (
+    "This is a fire extinguisher inspection tag. Look for equipment identification numbers like AE#, HE#, "
+    "EE#, FE# or similar asset/equipment numbers. From the OCR text above and the image, extract the "
+    "EQUIPMENT NUMBERS. Respond with a JSON object like {{'ae_number': 'value', 'he_number': 'value', "
+    "'ee_number': 'value', 'fe_number': 'value'}} or 'unknown' if not found."
+), shared_context=True)
+register("service_details", "2", (
+    "This is a fire extinguisher inspection tag. Look for service type checkboxes or markings like ANNUAL "
+    "INSP, SEMI ANNUAL INSP, QUARTERLY INSP, REPAIR, RECHARGE, NEW INSTALL, HYDRO, F/A, P/A, C/A, etc. "
+    "From the OCR text above and the image, extract the SERVICE DETAILS. Respond with a JSON object like "
+    "{{'service_type': 'Annual Inspection', 'additional_services': ['Recharge', 'Repair']}} or 'unknown' "
+    "if not found."
+), shared_context=True)
+
+# Per-layer version overrides, e.g. PROMPT_VERSIONS='{"year": "1"}'; otherwise the newest version is used
+ACTIVE_VERSIONS: Dict[str, str] = json.loads(os.getenv("PROMPT_VERSIONS", "{}"))
+
+
+def get(layer: str) -> PromptTemplate:
+    """Returns the active template for a layer."""
+    versions = _REGISTRY[layer]
+    version = ACTIVE_VERSIONS.get(layer)
+    if version in versions:
+        return versions[version]
+    return versions[max(versions, key=int)]
+
+
+def manifest() -> Dict[str, str]:
+    """Active prompt id -> hash for every layer, recorded on each inspection."""
+    return {get(layer).id: get(layer).hash for layer in sorted(_REGISTRY)}
+
+
+def registry_hash() -> str:
+    """Identifies the full set of active prompts (part of the analysis cache key)."""
+    encoded = json.dumps(manifest(), sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:12]
@@ -1,21 +1,43 @@
-from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Request, Depends, Header
+from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Request, Depends, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pymongo import MongoClient
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from bson import ObjectId
+from bson.errors import InvalidId
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import os
 import json
 import base64
 import uuid
-import requests
 import asyncio
 import re
+import hashlib
+import hmac
+import secrets
+import time
+import contextvars
 from datetime import datetime, timedelta
 import litellm
 # Commented out emergentintegrations imports for deployment
 # from emergentintegrations.llm.chat import LlmChat, UserMessage, ImageContent
 from dotenv import load_dotenv
+from analysis_cache import AnalysisCache, LayerCache
+from blob_store import create_blob_store, detect_content_type, BlobTooLarge, CHUNK_SIZE
+from webhook_outbox import WebhookOutbox
+from llm_scheduler import LLMScheduler, PRIORITY_BACKGROUND, request_priority
+from llm_retry import RetryPolicy
+from model_routing import ModelRouter
+import image_processing
+import tag_dates
+import ocr_engine
+import prompts
+import geo
+from places_client import PlacesClient, PlacesError, create_places_provider
+from site_index import SiteIndex, normalize_business_name
+from site_clusters import SiteClusterer
+from near_duplicates import NearDuplicateFinder
 
 load_dotenv()
 
@@ -28,23 +50,202 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Link"],
 )
 
-# MongoDB connection
+# MongoDB connection (async driver so queries never block the event loop)
 mongo_url = os.getenv("MONGO_URL")
 db_name = os.getenv("DB_NAME")
-client = MongoClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+    minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", "5")),
+    maxIdleTimeMS=int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000")),
+    waitQueueTimeoutMS=int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000")),
+    serverSelectionTimeoutMS=int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "10000"))
+)
 db = client[db_name]
 
 # Collections
 users_collection = db["users"]
 sessions_collection = db["sessions"]
 inspections_collection = db["inspections"]
+analysis_cache_collection = db["analysis_cache"]
+webhook_outbox_collection = db["webhook_outbox"]
+inspection_batches_collection = db["inspection_batches"]
+sites_collection = db["sites"]
+
+# Image blobs (content-addressed; inspections only store the digest)
+blob_store = create_blob_store(db)
 
 # Environment variables
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 N8N_WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL")
 GOOGLE_PLACES_API_KEY = os.getenv("GOOGLE_PLACES_API_KEY")
+# "google" or "stub" (fixed sample businesses); defaults to stub when no API key is configured
+PLACES_PROVIDER = os.getenv("PLACES_PROVIDER", "google" if GOOGLE_PLACES_API_KEY else "stub").lower()
+# Answer /api/places/nearby from previously inspected sites first; "merge" adds Google results,
+# "replace" only calls Google when no known site is in range
+SITE_INDEX_ENABLED = os.getenv("SITE_INDEX_ENABLED", "true").lower() == "true"
+SITE_INDEX_MODE = os.getenv("SITE_INDEX_MODE", "merge").lower()
+# Site clustering: group inspections of one building/customer (see site_clusters.py).
+# With SITE_WEBHOOK_MODE=site only a site's first inspection is notified immediately; later ones
+# are collected into one digest per site, sent SITE_DIGEST_DELAY_MINUTES after the first of them
+SITE_CLUSTERING_ENABLED = os.getenv("SITE_CLUSTERING_ENABLED", "true").lower() == "true"
+SITE_WEBHOOK_MODE = os.getenv("SITE_WEBHOOK_MODE", "site").lower()
+SITE_DIGEST_DELAY = timedelta(minutes=float(os.getenv("SITE_DIGEST_DELAY_MINUTES", "15")))
+SITE_DIGEST_POLL_SECONDS = 30
+# "layered" (OCR + 8 parallel field calls) or "fused" (single structured-output call)
+ANALYSIS_ENGINES = ("layered", "fused")
+ANALYSIS_ENGINE = os.getenv("ANALYSIS_ENGINE", "layered").lower()
+if ANALYSIS_ENGINE not in ANALYSIS_ENGINES:
+    print(f"⚠️ Unknown ANALYSIS_ENGINE {ANALYSIS_ENGINE!r}, using the layered engine")
+    ANALYSIS_ENGINE = "layered"
+# Structured output for the fused engine: "json_schema" (enforced schema) or "none" (JSON asked in the prompt only)
+FUSED_RESPONSE_FORMAT = os.getenv("FUSED_RESPONSE_FORMAT", "json_schema").lower()
+# Bump when the pipeline or consolidated output changes so cached results are not reused;
+# prompt text changes are covered by the prompt registry hash (see prompts.py)
+ANALYSIS_PROMPT_VERSION = "2025-08-v2"
+# Mark the shared prompt prefix (system + image + OCR text) cacheable for providers that support it
+PROMPT_CACHE_CONTROL = os.getenv("PROMPT_CACHE_CONTROL", "true").lower() == "true"
+
+# Model calls made by each engine, used to report the spend saved by cache hits
+ENGINE_MODEL_CALLS = {"layered": 9, "fused": 1, "layered_fallback": 10}
+
+# Skip the eight field layers when the OCR text shows the photo is not an inspection tag
+TAG_GATE_ENABLED = os.getenv("TAG_GATE_ENABLED", "true").lower() == "true"
+# Matched on word boundaries; a trailing \w* also accepts longer forms ("inspected", "punched")
+TAG_KEYWORD_PATTERN = re.compile(
+    r"\b(?:extinguisher\w*|inspect\w*|insp|recharge\w*|hydro\w*|annual|semi|monthly|quarterly|service\w*|"
+    r"maint\w*|nfpa|fire|tags?|abc|co2|dry chem\w*|class|punch\w*)\b"
+)
+# Negated mentions ("not a fire extinguisher tag", "no inspection tag") describe something else
+NON_TAG_PATTERN = re.compile(r"\b(?:not|no)\s+(?:an?\s+)?(?:[a-z]+\s+){0,2}(?:tag|extinguisher|equipment)s?\b")
+# What the OCR system prompt asks the model to answer for a photo that is not a tag (see prompts.py)
+NON_TAG_DESCRIPTIONS = ["safety notice", "equipment label", "not fire equipment"]
+tag_gate_stats = {"checked": 0, "skipped": 0, "model_calls_saved": 0}
+
+# Read printed dates from the OCR text locally before asking the model for year/month/day
+TAG_DATE_PARSER_ENABLED = os.getenv("TAG_DATE_PARSER_ENABLED", "true").lower() == "true"
+tag_date_stats = {"full_date": 0, "month_year": 0, "fallback": 0, "model_calls_saved": 0}
+
+# Layer 1 OCR backend ("llm" or "tesseract"); see ocr_engine.py
+ocr_stats = {"local_runs": 0, "local_errors": 0, "llm_fallbacks": 0, "local_total_ms": 0}
+if ocr_engine.OCR_ENGINE == "tesseract" and not ocr_engine.available():
+    print("⚠️ OCR_ENGINE=tesseract but pytesseract is not installed, using the model for OCR")
+
+def resolve_webhook_format(requested: str, public_base_url: str) -> str:
+    """Compact payloads link the image, which needs an absolute URL; without one, send full payloads."""
+    if requested == "compact" and not public_base_url:
+        print("⚠️ WEBHOOK_FORMAT=compact requires PUBLIC_BASE_URL for image links, sending full payloads")
+        return "full"
+    return requested
+
+# Webhook payload format: "full" (inline base64 image) or "compact" (signed image URL, no duplicated fields)
+WEBHOOK_IMAGE_URL_TTL_HOURS = int(os.getenv("WEBHOOK_IMAGE_URL_TTL_HOURS", "72"))
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "").rstrip("/")
+WEBHOOK_FORMAT = resolve_webhook_format(os.getenv("WEBHOOK_FORMAT", "full").lower(), PUBLIC_BASE_URL)
+if N8N_WEBHOOK_URL and not PUBLIC_BASE_URL:
+    # Batch and site digest notifications always link their images
+    print("⚠️ PUBLIC_BASE_URL not configured, image links in batch and site notifications will be relative")
+IMAGE_URL_SECRET = os.getenv("IMAGE_URL_SECRET")
+if not IMAGE_URL_SECRET:
+    # Signed URLs stop validating after a restart; set IMAGE_URL_SECRET in production
+    IMAGE_URL_SECRET = secrets.token_hex(32)
+    print("⚠️ IMAGE_URL_SECRET not configured, using a per-process secret for signed image URLs")
+
+# Largest accepted multipart upload (bytes)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+
+# Batch submissions: max images per request and inspections analyzed at once across all batches
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "3"))
+
+# GET /api/inspections page sizes
+INSPECTIONS_PAGE_SIZE = int(os.getenv("INSPECTIONS_PAGE_SIZE", "100"))
+INSPECTIONS_MAX_PAGE_SIZE = 500
+# GET /api/inspections/near: largest accepted radius in metres
+NEAR_MAX_RADIUS_M = float(os.getenv("NEAR_MAX_RADIUS_M", "50000"))
+
+analysis_cache = AnalysisCache(
+    analysis_cache_collection,
+    max_entries=int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "256")),
+    ttl_days=int(os.getenv("ANALYSIS_CACHE_TTL_DAYS", "30")),
+    enabled=os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() == "true"
+)
+webhook_outbox = WebhookOutbox(
+    webhook_outbox_collection,
+    N8N_WEBHOOK_URL,
+    max_attempts=int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8")),
+    batch_size=int(os.getenv("WEBHOOK_BATCH_SIZE", "1")),
+    timeout=float(os.getenv("WEBHOOK_TIMEOUT", "15")),
+    # Images are attached from the blob store at delivery, not stored in the outbox
+    blob_store=blob_store
+)
+places_client = PlacesClient(
+    create_places_provider(PLACES_PROVIDER, GOOGLE_PLACES_API_KEY, timeout=float(os.getenv("PLACES_TIMEOUT", "10"))),
+    ttl_seconds=float(os.getenv("PLACES_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("PLACES_CACHE_MAX_ENTRIES", "1024")),
+    precision=int(os.getenv("PLACES_GEOHASH_PRECISION", "8"))
+)
+site_index = SiteIndex(
+    precision=int(os.getenv("SITE_INDEX_PRECISION", "7")),
+    merge_distance_m=float(os.getenv("SITE_MERGE_DISTANCE_M", "150"))
+)
+site_clusterer = SiteClusterer(
+    sites_collection,
+    max_distance_m=float(os.getenv("SITE_MAX_DISTANCE_M", "150")),
+    gps_only_distance_m=float(os.getenv("SITE_GPS_ONLY_DISTANCE_M", "40"))
+)
+# Near-duplicate photos (perceptual hash within NEAR_DUPLICATE_MAX_HAMMING bits, same user and place)
+# reuse the earlier analysis instead of calling the model
+near_duplicate_finder = NearDuplicateFinder(
+    inspections_collection,
+    max_hamming=int(os.getenv("NEAR_DUPLICATE_MAX_HAMMING", "4")),
+    window_minutes=float(os.getenv("NEAR_DUPLICATE_WINDOW_MINUTES", "10")),
+    max_distance_m=float(os.getenv("NEAR_DUPLICATE_MAX_DISTANCE_M", "150")),
+    enabled=os.getenv("NEAR_DUPLICATE_ENABLED", "true").lower() == "true"
+)
+layer_cache = LayerCache(
+    max_entries=int(os.getenv("LAYER_CACHE_MAX_ENTRIES", "2048")),
+    enabled=os.getenv("LAYER_CACHE_ENABLED", "true").lower() == "true"
+)
+
+def parse_model_rates(value: Optional[str]) -> Dict[str, float]:
+    """Parses LLM_MODEL_RATE_LIMITS ("model=rpm,model=rpm") into a dict."""
+    rates = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            model, rate = item.rsplit("=", 1)
+            rates[model.strip()] = float(rate)
+    return rates
+
+# Every outbound model call waits here for a slot; see llm_scheduler.py
+llm_scheduler = LLMScheduler(
+    max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "16")),
+    rate_per_minute=float(os.getenv("LLM_RATE_LIMIT_PER_MINUTE", "0")),
+    burst=int(os.getenv("LLM_RATE_BURST", "0")) or None,
+    model_rates=parse_model_rates(os.getenv("LLM_MODEL_RATE_LIMITS")),
+    enabled=os.getenv("LLM_SCHEDULER_ENABLED", "true").lower() == "true"
+)
+# Fast-model-first routing for the field layers (off unless MODEL_ROUTING_ENABLED=true)
+model_router = ModelRouter(
+    default_model=os.getenv("MODEL_ID", "openrouter/google/gemini-2.5-pro"),
+    fast_model=os.getenv("FAST_MODEL_ID", "openrouter/google/gemini-2.5-flash"),
+    routes=json.loads(os.getenv("MODEL_ROUTES", "{}")),
+    enabled=os.getenv("MODEL_ROUTING_ENABLED", "false").lower() == "true"
+)
+# Retries with backoff, per-layer deadline and optional hedging; see llm_retry.py
+llm_retry_policy = RetryPolicy(
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+    base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0")),
+    max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", "20")),
+    layer_timeout=float(os.getenv("LLM_LAYER_TIMEOUT", "90")),
+    hedge_enabled=os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true",
+    hedge_min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY", "5")),
+    hedge_default_delay=float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "30")),
+    scheduler=llm_scheduler
+)
 
 # Models
 class User(BaseModel):
@@ -59,12 +260,18 @@ class Session(BaseModel):
     session_token: str
     expires_at: datetime
 
-class InspectionRequest(BaseModel):
-    image_base64: str
+class InspectionMetadata(BaseModel):
     location: str
     notes: Optional[str] = None
     gps_data: Optional[Dict[str, Any]] = None
     business_name: Optional[str] = None
+    analysis_engine: Optional[str] = None  # "layered" or "fused"; defaults to ANALYSIS_ENGINE
+
+class InspectionRequest(InspectionMetadata):
+    image_base64: str
+
+class BatchInspectionRequest(InspectionMetadata):
+    images_base64: List[str]
 
 class InspectionResult(BaseModel):
     id: str
@@ -177,47 +384,83 @@ def extract_final_answer_from_reasoning(reasoning: str) -> str:
         print(f"Error extracting final answer from reasoning: {e}")
         return "unknown"
 
-async def analyze_image_layer(prompt: str, data_url: str) -> str:
-    """Generic helper to call the AI model with a specific prompt and image."""
+# (data URL, image SHA-256) of the image the current pipeline run is analyzing, set once per
+# run so the layers don't each hash a multi-MB data URL
+current_image = contextvars.ContextVar("current_image", default=None)
+
+def image_digest(data_url: str) -> str:
+    """SHA-256 identifying the image in a data URL, for layer cache keys."""
+    current = current_image.get()
+    if current is not None and current[0] is data_url:
+        return current[1]
+    return hashlib.sha256(data_url.encode("utf-8")).hexdigest()
+
+async def analyze_image_layer(
+    prompt: str, data_url: str, max_tokens: int = 1000, layer: Optional[str] = None,
+    model_id: Optional[str] = None, context: Optional[str] = None, response_format: Optional[dict] = None
+) -> str:
+    """Generic helper to call the AI model with a specific prompt and image.
+
+    Messages are ordered system prompt, image, optional shared `context` (the OCR text
+    block), then the layer `prompt`, so every layer for an image shares the same prefix.
+    When `layer` is given, answers are memoized in the layer cache so re-running the
+    pipeline only calls the model for layers whose prompt or input changed.
+    `model_id` defaults to MODEL_ID. `response_format` is passed to the provider for
+    structured output.
+    """
+    # Use OpenRouter Gemini 2.5 Pro by default; can be overridden via MODEL_ID
+    model_id = model_id or os.getenv("MODEL_ID", "openrouter/google/gemini-2.5-pro")
+    system_prompt = prompts.get("system")
+    cache_key = None
+    if layer:
+        schema = json.dumps(response_format, sort_keys=True) if response_format else ""
+        cache_key = LayerCache.make_key(
+            model_id, layer, f"{system_prompt.hash}\n{context or ''}\n{prompt}\n{schema}", image_digest(data_url)
+        )
+        cached = layer_cache.get(layer, cache_key)
+        if cached is not None:
+            print(f"⚡ Layer cache hit: {layer}")
+            return cached
+
     try:
         print(f"🔍 AI Analysis Starting...")
         print(f"🔑 API Key: {OPENROUTER_API_KEY[:20]}...")
         print(f"📝 Prompt: {prompt[:100]}...")
         print(f"🖼️ Image URL length: {len(data_url)}")
         
-        # Use OpenRouter Gemini 2.5 Pro by default; can be overridden via MODEL_ID
-        model_id = os.getenv("MODEL_ID", "openrouter/google/gemini-2.5-pro")
         request_timeout = int(os.getenv("LLM_TIMEOUT", "240"))
-        response = await litellm.acompletion(
-            model=model_id,
-            api_key=OPENROUTER_API_KEY,
-            api_base="https://openrouter.ai/api/v1",
-            timeout=request_timeout,
-            max_tokens=1000,  # Increased from default to avoid truncation
-            temperature=0.1,  # Low temperature for consistent analysis
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are an NFPA-10–savvy fire safety expert analyzing images. If this is a fire extinguisher tag, "
-                        "analyze hole-punched dates, preferring the newest complete combo. If multiple days are punched, choose the lowest. "
-                        "If this is NOT a fire extinguisher tag, provide helpful observations about what you see instead. "
-                        "For non-extinguisher images, describe what it is (e.g., 'Safety notice', 'Equipment label', 'Not fire equipment'). "
-                        "Always respond with only the exact value requested (no prose). Use 'unknown' only if truly unreadable."
-                    )
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": { "url": data_url }
-                        }
-                    ]
-                }
-            ]
-        )
+
+        content = [{"type": "image_url", "image_url": {"url": data_url}}]
+        if context:
+            context_part = {"type": "text", "text": context}
+            if PROMPT_CACHE_CONTROL:
+                context_part["cache_control"] = {"type": "ephemeral"}
+            content.append(context_part)
+        content.append({"type": "text", "text": prompt})
+        messages = [
+            {"role": "system", "content": system_prompt.render()},
+            {"role": "user", "content": content}
+        ]
+
+        completion_args = {}
+        if response_format:
+            completion_args["response_format"] = response_format
+
+        async def request_completion():
+            return await litellm.acompletion(
+                model=model_id,
+                api_key=OPENROUTER_API_KEY,
+                api_base="https://openrouter.ai/api/v1",
+                timeout=request_timeout,
+                max_tokens=max_tokens,  # Increased from default to avoid truncation
+                temperature=0.1,  # Low temperature for consistent analysis
+                messages=messages,
+                **completion_args
+            )
+
+        # Each attempt and hedge waits for its own scheduler slot
+        response = await llm_retry_policy.run(layer or "unlabeled", request_completion, model=model_id)
+
         # Handle response - check content first, then reasoning_content if content is empty
         message = response.choices[0].message
         result = message.content.strip() if message.content else ""
@@ -230,68 +473,284 @@ async def analyze_image_layer(prompt: str, data_url: str) -> str:
             print(f"📝 Using reasoning_content field, extracted: {result[:50]}...")
             
         print(f"✅ AI Response Success: {result}")
+        # An empty answer is a failed call, not a result worth replaying
+        if cache_key and result:
+            layer_cache.set(cache_key, result)
         return result
     except Exception as e:
         # Enhanced error logging for debugging
-        print(f"❌ AI Analysis Error - Model: {os.getenv('MODEL_ID', 'openrouter/google/gemini-2.5-pro')}")
+        print(f"❌ AI Analysis Error - Model: {model_id}")
         print(f"❌ AI Analysis Error - API Key: {OPENROUTER_API_KEY[:20]}...")
         print(f"❌ AI Analysis Error - Error Type: {type(e).__name__}")
         print(f"❌ AI Analysis Error - Full Error: {str(e)}")
         print(f"❌ AI Analysis Error - Prompt: {prompt[:100]}...")
         return "unknown"
 
+async def analyze_routed_layer(prompt: str, data_url: str, layer: str, context: Optional[str] = None) -> str:
+    """Runs a field layer through its model tiers, escalating while the answer fails validation."""
+    tiers = model_router.tiers(layer)
+    for tier, model_id in enumerate(tiers):
+        start = time.perf_counter()
+        value = await analyze_image_layer(prompt, data_url, layer=layer, model_id=model_id, context=context)
+        accepted = tier == len(tiers) - 1 or model_router.validate(layer, value)
+        if len(tiers) > 1:
+            model_router.record(layer, tier, model_id, time.perf_counter() - start, accepted)
+        if accepted:
+            return value
+        print(f"⤴️ Escalating {layer} from {model_id}: {value[:50]!r} failed validation")
+    return value
+
+def layer_prompt(layer: str, raw_text: str):
+    """Returns (prompt, context) for a field layer from the prompt registry.
+
+    Templates with a shared context leave the OCR text out of the question and send it
+    once in the common prefix instead.
+    """
+    template = prompts.get(layer)
+    if template.shared_context:
+        return template.render(), prompts.get("ocr_context").render(raw_text)
+    return template.render(raw_text), None
+
 async def extract_raw_text(data_url: str) -> str:
-    """Layer 1: Performs OCR to get all visible text."""
-    prompt = "Look at this fire extinguisher inspection tag and extract ALL visible text exactly as it appears. Include numbers, dates, punched holes, and any written text. Return only the raw text with no commentary."
-    return await analyze_image_layer(prompt, data_url)
+    """Layer 1: Performs OCR to get all visible text.
+
+    With OCR_ENGINE=tesseract the text is read locally; the model is only used when the
+    local result is too short (unless OCR_FALLBACK_TO_LLM is off).
+    """
+    if ocr_engine.use_local_ocr():
+        start = time.perf_counter()
+        try:
+            text = await ocr_engine.local_ocr(base64.b64decode(data_url.split(",", 1)[1]))
+        except Exception as e:
+            print(f"⚠️ Local OCR failed: {type(e).__name__}: {e}")
+            ocr_stats["local_errors"] += 1
+            text = ""
+        ocr_stats["local_runs"] += 1
+        ocr_stats["local_total_ms"] += int((time.perf_counter() - start) * 1000)
+        if ocr_engine.usable(text) or not ocr_engine.OCR_FALLBACK_TO_LLM:
+            print(f"🔡 Local OCR: {text[:80]!r}")
+            return text.strip() or "unknown"
+        ocr_stats["llm_fallbacks"] += 1
+        print(f"⚠️ Local OCR returned too little text ({len(text.strip())} chars), using the model")
+    return await extract_raw_text_llm(data_url)
+
+async def extract_raw_text_llm(data_url: str) -> str:
+    """Layer 1 on the vision model."""
+    return await analyze_image_layer(prompts.get("raw_text").render(), data_url, layer="raw_text")
 
 async def analyze_year(raw_text: str, data_url: str) -> str:
     """Layer 2a: Analyzes and extracts the inspection year."""
-    prompt = f"This is a fire extinguisher inspection tag. Look for the most recent inspection year - this could be punched holes, handwritten numbers, or printed dates. The year should be between 2020-2025. From this text: '{raw_text}' and the image, what is the inspection YEAR? Respond with only the 4-digit year (e.g., 2024) or 'unknown' if not found."
-    return await analyze_image_layer(prompt, data_url)
+    prompt, context = layer_prompt("year", raw_text)
+    return await analyze_routed_layer(prompt, data_url, "year", context)
 
 async def analyze_month(raw_text: str, data_url: str) -> str:
     """Layer 2b: Analyzes and extracts the inspection month."""
-    prompt = f"This is a fire extinguisher inspection tag. Look for the most recent inspection month - this could be punched holes, handwritten numbers, or printed dates. From this text: '{raw_text}' and the image, what is the inspection MONTH? Respond with only the month number (1-12) or 'unknown' if not found."
-    return await analyze_image_layer(prompt, data_url)
+    prompt, context = layer_prompt("month", raw_text)
+    return await analyze_routed_layer(prompt, data_url, "month", context)
 
 async def analyze_day(raw_text: str, data_url: str) -> str:
     """Layer 2c: Analyzes and extracts the inspection day."""
-    prompt = f"This is a fire extinguisher inspection tag. Look for the most recent inspection day - this could be punched holes, handwritten numbers, or printed dates. From this text: '{raw_text}' and the image, what is the inspection DAY? Respond with only the day number (1-31) or 'unknown' if not found."
-    return await analyze_image_layer(prompt, data_url)
+    prompt, context = layer_prompt("day", raw_text)
+    return await analyze_routed_layer(prompt, data_url, "day", context)
 
 async def analyze_extinguisher_type(raw_text: str, data_url: str) -> str:
     """Layer 3a: Analyzes and extracts the extinguisher type."""
-    prompt = f"This is a fire extinguisher inspection tag. Look for the extinguisher type classification (like ABC, BC, CO2, Class A, Class B, Class C, Class K, Water, Foam, Dry Chemical, etc.). From this text: '{raw_text}' and the image, what is the extinguisher TYPE? IMPORTANT: Respond with ONLY the type classification (e.g., 'ABC', 'CO2', 'Dry Chemical') or 'unknown' if not found. Do not include explanations or reasoning - just the final answer."
-    return await analyze_image_layer(prompt, data_url)
+    prompt, context = layer_prompt("extinguisher_type", raw_text)
+    return await analyze_routed_layer(prompt, data_url, "extinguisher_type", context)
 
 async def analyze_condition(raw_text: str, data_url: str) -> str:
     """Layer 3b: Analyzes and assesses the extinguisher condition."""
-    prompt = f"This is a fire extinguisher inspection tag. Based on the inspection information, assess the overall condition. Look for any indicators of problems, maintenance needs, or good condition. From this text: '{raw_text}' and the image, what is the overall CONDITION? IMPORTANT: Respond with ONLY one word: 'Good', 'Fair', 'Poor', or 'unknown'. No explanations."
-    return await analyze_image_layer(prompt, data_url)
+    prompt, context = layer_prompt("condition", raw_text)
+    return await analyze_routed_layer(prompt, data_url, "condition", context)
 
 async def analyze_company_info(raw_text: str, data_url: str) -> str:
     """Layer 3c: Extracts service company information."""
-    prompt = f"This is a fire extinguisher inspection tag. Look for the service company information including company name, address, phone number, and website. From this text: '{raw_text}' and the image, extract the COMPANY INFO. Respond with a JSON object like {{'name': 'Company Name', 'address': 'Full Address', 'phone': 'Phone Number', 'website': 'Website'}} or 'unknown' if not found."
-    return await analyze_image_layer(prompt, data_url)
+    prompt, context = layer_prompt("company_info", raw_text)
+    return await analyze_routed_layer(prompt, data_url, "company_info", context)
 
 async def analyze_equipment_numbers(raw_text: str, data_url: str) -> str:
     """Layer 3d: Extracts equipment identification numbers."""
-    prompt = f"This is a fire extinguisher inspection tag. Look for equipment identification numbers like AE#, HE#, EE#, FE# or similar asset/equipment numbers. From this text: '{raw_text}' and the image, extract the EQUIPMENT NUMBERS. Respond with a JSON object like {{'ae_number': 'value', 'he_number': 'value', 'ee_number': 'value', 'fe_number': 'value'}} or 'unknown' if not found."
-    return await analyze_image_layer(prompt, data_url)
+    prompt, context = layer_prompt("equipment_numbers", raw_text)
+    return await analyze_routed_layer(prompt, data_url, "equipment_numbers", context)
 
 async def analyze_service_details(raw_text: str, data_url: str) -> str:
     """Layer 3e: Extracts service type and details performed."""
-    prompt = f"This is a fire extinguisher inspection tag. Look for service type checkboxes or markings like ANNUAL INSP, SEMI ANNUAL INSP, QUARTERLY INSP, REPAIR, RECHARGE, NEW INSTALL, HYDRO, F/A, P/A, C/A, etc. From this text: '{raw_text}' and the image, extract the SERVICE DETAILS. Respond with a JSON object like {{'service_type': 'Annual Inspection', 'additional_services': ['Recharge', 'Repair']}} or 'unknown' if not found."
-    return await analyze_image_layer(prompt, data_url)
+    prompt, context = layer_prompt("service_details", raw_text)
+    return await analyze_routed_layer(prompt, data_url, "service_details", context)
+
+def _unknown_or(schema: dict) -> dict:
+    return {"anyOf": [schema, {"type": "string", "enum": ["unknown"]}]}
+
+def _string_object(*keys: str) -> dict:
+    return {
+        "type": "object",
+        "properties": {key: {"type": "string"} for key in keys},
+        "required": list(keys),
+        "additionalProperties": False
+    }
+
+# Structured-output schema of the fused engine; mirrors the keys validate_fused_result checks
+FUSED_RESPONSE_SCHEMA = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "fire_extinguisher_tag",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "raw_text": {"type": "string"},
+                "year": {"type": "string"},
+                "month": {"type": "string"},
+                "day": {"type": "string"},
+                "extinguisher_type": {"type": "string"},
+                "condition": {"type": "string", "enum": ["Good", "Fair", "Poor", "unknown"]},
+                "service_company": _unknown_or(_string_object("name", "address", "phone", "website")),
+                "equipment_numbers": _unknown_or(_string_object("ae_number", "he_number", "ee_number", "fe_number")),
+                "service_details": _unknown_or({
+                    "type": "object",
+                    "properties": {
+                        "service_type": {"type": "string"},
+                        "additional_services": {"type": "array", "items": {"type": "string"}}
+                    },
+                    "required": ["service_type", "additional_services"],
+                    "additionalProperties": False
+                })
+            },
+            "required": [
+                "raw_text", "year", "month", "day", "extinguisher_type", "condition",
+                "service_company", "equipment_numbers", "service_details"
+            ],
+            "additionalProperties": False
+        }
+    }
+}
+
+async def analyze_fused(data_url: str) -> str:
+    """Fused engine: extracts every consolidation field in a single structured-output call.
+
+    The JSON schema is enforced by the provider unless FUSED_RESPONSE_FORMAT=none; the
+    prompt still describes the object for models without structured output.
+    """
+    response_format = FUSED_RESPONSE_SCHEMA if FUSED_RESPONSE_FORMAT == "json_schema" else None
+    return await analyze_image_layer(
+        prompts.get("fused").render(), data_url, max_tokens=2000, layer="fused", response_format=response_format
+    )
+
+def validate_fused_result(text: str) -> Optional[dict]:
+    """Validates the fused engine output and normalizes it into consolidate_analysis arguments.
+
+    Returns None when the response is not usable, so the caller can fall back to the layered pipeline.
+    """
+    data = parse_json_response(text, None)
+    if not isinstance(data, dict):
+        return None
+
+    required = [
+        "raw_text", "year", "month", "day", "extinguisher_type", "condition",
+        "service_company", "equipment_numbers", "service_details"
+    ]
+    if any(key not in data for key in required):
+        return None
+
+    raw_text = data["raw_text"]
+    if not isinstance(raw_text, str) or not raw_text.strip():
+        return None
+
+    def normalize_number(value, low, high):
+        value = str(value).strip()
+        if value.lower() == "unknown":
+            return "unknown"
+        if not value.isdigit() or not low <= int(value) <= high:
+            raise ValueError(value)
+        return str(int(value))
+
+    try:
+        year = normalize_number(data["year"], 1900, datetime.utcnow().year + 1)
+        month = normalize_number(data["month"], 1, 12)
+        day = normalize_number(data["day"], 1, 31)
+    except ValueError:
+        return None
+
+    condition = str(data["condition"]).strip()
+    if condition.lower() not in ("good", "fair", "poor", "unknown"):
+        return None
+
+    def normalize_object(value):
+        if isinstance(value, dict):
+            return json.dumps(value)
+        if isinstance(value, str) and value.strip().lower() == "unknown":
+            return "unknown"
+        raise ValueError(value)
+
+    try:
+        company_info = normalize_object(data["service_company"])
+        equipment_numbers = normalize_object(data["equipment_numbers"])
+        service_details = normalize_object(data["service_details"])
+    except ValueError:
+        return None
+
+    return {
+        "year": year,
+        "month": month,
+        "day": day,
+        "extinguisher_type": str(data["extinguisher_type"]).strip() or "unknown",
+        "condition": condition,
+        "company_info": company_info,
+        "equipment_numbers": equipment_numbers,
+        "service_details": service_details,
+        "raw_text": raw_text.strip()
+    }
+
+def parse_json_response(text, fallback):
+    """Safely parses a JSON model response, including markdown code blocks."""
+    if text == "unknown" or not text:
+        return fallback
+    try:
+        # Handle markdown code blocks
+        if text.startswith("```json") or text.startswith("```"):
+            # Extract JSON from markdown code block
+            json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', text, re.DOTALL)
+            if json_match:
+                text = json_match.group(1)
+            else:
+                # Fallback for malformed markdown
+                text = text.replace("```json", "").replace("```", "").strip()
+
+        # Try to parse the cleaned text
+        return json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        return fallback
+
+def looks_like_inspection_tag(raw_text: str) -> bool:
+    """Heuristic tag gate on the OCR layer output.
+
+    The gate fails open: the field layers are skipped only on positive evidence that
+    the photo is something else, i.e. a negated mention ("not a fire extinguisher tag")
+    or one of the model's non-tag descriptions ("Safety notice"). Even then, tag
+    vocabulary or a date outside the negated mention keeps the layers running. Text
+    without either, such as a company name, a phone number or OCR noise, passes.
+    """
+    text = (raw_text or "").strip().lower()
+    affirmed = NON_TAG_PATTERN.sub(" ", text)
+    if affirmed == text and not any(description in text for description in NON_TAG_DESCRIPTIONS):
+        return True
+    return bool(
+        TAG_KEYWORD_PATTERN.search(affirmed)
+        or tag_dates.YEAR_WORD.search(affirmed)
+        or tag_dates.MONTH_WORD.search(affirmed)
+    )
 
 def consolidate_analysis(
     year: str, month: str, day: str,
     extinguisher_type: str, condition: str,
     company_info: str, equipment_numbers: str, service_details: str,
-    raw_text: str
+    raw_text: str, tag_detected: bool = True
 ) -> dict:
-    """Layer 4: Consolidates results into the final JSON object."""
+    """Layer 4: Consolidates results into the final JSON object.
+
+    With `tag_detected=False` the image was not an inspection tag: the field values are
+    all "unknown" and the OCR description is reported as the maintenance note.
+    """
     # Basic date parsing
     try:
         year_int = int(year) if year.isdigit() else None
@@ -325,39 +784,20 @@ def consolidate_analysis(
             next_due_date_obj = None
 
     # Determine `requires_attention`
-    requires_attention = (
+    requires_attention = tag_detected and (
         condition.lower() == "poor" or
         any(keyword in raw_text.lower() for keyword in ["recharge", "service", "replace", "fail"])
     )
 
     # Parse enhanced data (safely handle JSON responses with markdown support)
-    def safe_parse_json(text, fallback):
-        if text == "unknown" or not text:
-            return fallback
-        try:
-            # Handle markdown code blocks
-            if text.startswith("```json") or text.startswith("```"):
-                # Extract JSON from markdown code block
-                json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', text, re.DOTALL)
-                if json_match:
-                    text = json_match.group(1)
-                else:
-                    # Fallback for malformed markdown
-                    text = text.replace("```json", "").replace("```", "").strip()
-            
-            # Try to parse the cleaned text
-            return json.loads(text)
-        except (json.JSONDecodeError, TypeError):
-            return fallback
-
-    company_data = safe_parse_json(company_info, {"name": "unknown", "address": "unknown", "phone": "unknown", "website": "unknown"})
-    equipment_data = safe_parse_json(equipment_numbers, {"ae_number": "unknown", "he_number": "unknown", "ee_number": "unknown", "fe_number": "unknown"})
-    service_data = safe_parse_json(service_details, {"service_type": "unknown", "additional_services": []})
+    company_data = parse_json_response(company_info, {"name": "unknown", "address": "unknown", "phone": "unknown", "website": "unknown"})
+    equipment_data = parse_json_response(equipment_numbers, {"ae_number": "unknown", "he_number": "unknown", "ee_number": "unknown", "fe_number": "unknown"})
+    service_data = parse_json_response(service_details, {"service_type": "unknown", "additional_services": []})
 
     # Calculate confidence score (simple heuristic)
     fields = [year, month, day, extinguisher_type, condition]
     valid_fields = sum(1 for f in fields if f and f != "error" and f.lower() != 'null' and f.lower() != 'n/a')
-    confidence_score = valid_fields / len(fields)
+    confidence_score = valid_fields / len(fields) if tag_detected else 0.0
 
     # Assemble final JSON with enhanced data
     final_json = {
@@ -371,16 +811,205 @@ def consolidate_analysis(
         "extinguisher_type": extinguisher_type,
         "condition": condition,
         "requires_attention": requires_attention,
-        "maintenance_notes": "", # Placeholder, can be a separate analysis layer if needed
+        "maintenance_notes": "" if tag_detected else f"Not a fire extinguisher tag: {raw_text[:200]}",
         "confidence_score": round(confidence_score, 2),
         "raw_text_analysis": raw_text,
+        "tag_detected": tag_detected,
         # Enhanced data fields
         "service_company": company_data,
         "equipment_numbers": equipment_data,
         "service_details": service_data
     }
     return final_json
-    
+
+async def run_layered_analysis(data_url: str, on_layer=None) -> dict:
+    """Runs the layered pipeline: OCR first, then the eight field layers in parallel.
+
+    `on_layer`, if given, is awaited as on_layer(layer_name, value) as each layer finishes.
+    """
+    # Layer 1: OCR
+    raw_text = await extract_raw_text(data_url)
+    if on_layer:
+        await on_layer("raw_text", raw_text)
+
+    if TAG_GATE_ENABLED:
+        tag_gate_stats["checked"] += 1
+        if not looks_like_inspection_tag(raw_text):
+            tag_gate_stats["skipped"] += 1
+            tag_gate_stats["model_calls_saved"] += 8
+            print(f"🚫 Not an inspection tag, skipping field layers: {raw_text[:80]}")
+            unknown = "unknown"
+            return consolidate_analysis(
+                year=unknown, month=unknown, day=unknown,
+                extinguisher_type=unknown, condition=unknown,
+                company_info=unknown, equipment_numbers=unknown, service_details=unknown,
+                raw_text=raw_text, tag_detected=False
+            )
+
+    async def tracked(layer, task):
+        value = await task
+        if on_layer:
+            await on_layer(layer, value)
+        return value
+
+    async def parsed(value):
+        return value
+
+    # Fast path: dates printed in the OCR text don't need the three date layers
+    parsed_date = tag_dates.parse_tag_date(raw_text) if TAG_DATE_PARSER_ENABLED else None
+    if parsed_date and "day" in parsed_date:
+        tag_date_stats["full_date"] += 1
+        tag_date_stats["model_calls_saved"] += 3
+    elif parsed_date:
+        tag_date_stats["month_year"] += 1
+        tag_date_stats["model_calls_saved"] += 2
+    elif TAG_DATE_PARSER_ENABLED:
+        tag_date_stats["fallback"] += 1
+    if parsed_date:
+        print(f"📅 Date parsed from OCR text ({parsed_date['pattern']}): {parsed_date}")
+
+    # Layer 2 & 3: Parallel Analysis (Enhanced)
+    year_task = parsed(parsed_date["year"]) if parsed_date else analyze_year(raw_text, data_url)
+    month_task = parsed(parsed_date["month"]) if parsed_date else analyze_month(raw_text, data_url)
+    day_task = parsed(parsed_date["day"]) if parsed_date and "day" in parsed_date else analyze_day(raw_text, data_url)
+    type_task = analyze_extinguisher_type(raw_text, data_url)
+    condition_task = analyze_condition(raw_text, data_url)
+    company_task = analyze_company_info(raw_text, data_url)
+    equipment_task = analyze_equipment_numbers(raw_text, data_url)
+    service_task = analyze_service_details(raw_text, data_url)
+
+    results = await asyncio.gather(
+        tracked("year", year_task), tracked("month", month_task), tracked("day", day_task),
+        tracked("extinguisher_type", type_task), tracked("condition", condition_task),
+        tracked("company_info", company_task), tracked("equipment_numbers", equipment_task),
+        tracked("service_details", service_task)
+    )
+    year, month, day, extinguisher_type, condition, company_info, equipment_numbers, service_details = results
+
+    # Layer 4: Consolidation (Enhanced)
+    return consolidate_analysis(
+        year=year,
+        month=month,
+        day=day,
+        extinguisher_type=extinguisher_type,
+        condition=condition,
+        company_info=company_info,
+        equipment_numbers=equipment_numbers,
+        service_details=service_details,
+        raw_text=raw_text
+    )
+
+async def run_analysis_pipeline(data_url: str, engine: Optional[str] = None, on_layer=None):
+    """Runs the selected analysis engine and returns (analysis_json, engine_used).
+
+    The fused engine answers every field in one request; if its output fails validation
+    the layered pipeline is used instead.
+    """
+    engine = (engine or ANALYSIS_ENGINE).lower()
+    if engine not in ANALYSIS_ENGINES:
+        raise ValueError(f"Unknown analysis engine: {engine}")
+    if engine == "fused":
+        fields = validate_fused_result(await analyze_fused(data_url))
+        if fields:
+            if on_layer:
+                for layer, value in fields.items():
+                    await on_layer(layer, value)
+            return consolidate_analysis(**fields, tag_detected=looks_like_inspection_tag(fields["raw_text"])), "fused"
+        print("⚠️ Fused analysis did not match the schema, falling back to layered pipeline")
+        return await run_layered_analysis(data_url, on_layer), "layered_fallback"
+
+    return await run_layered_analysis(data_url, on_layer), "layered"
+
+async def run_cached_analysis(image_source: image_processing.ImageSource, engine: Optional[str] = None,
+                              on_layer=None, image_sha256: Optional[str] = None):
+    """Runs the analysis pipeline behind the content-addressed analysis cache.
+
+    `image_source` is the image bytes or a seekable file holding them; a file must
+    come with the image's `image_sha256`, so it is never read whole just to be hashed.
+    On a cache miss the image is normalized (oriented, resized, re-encoded) once and
+    that smaller copy is what every model layer receives.
+
+    Returns (analysis_json, meta) where meta holds the inspection fields describing
+    how the analysis was produced.
+    """
+    engine = (engine or ANALYSIS_ENGINE).lower()
+    model_id = os.getenv("MODEL_ID", "openrouter/google/gemini-2.5-pro")
+    analysis_version = ":".join([
+        ANALYSIS_PROMPT_VERSION,
+        f"prompts-{prompts.registry_hash()}",
+        image_processing.settings_key(),
+        model_router.settings_key(),
+        f"dates-{tag_dates.PARSER_VERSION if TAG_DATE_PARSER_ENABLED else 'off'}",
+        f"ocr-{'tesseract' if ocr_engine.use_local_ocr() else 'llm'}"
+    ])
+    if image_sha256 is None:
+        image_sha256 = hashlib.sha256(image_source).hexdigest()
+    cache_key = AnalysisCache.make_key(image_sha256, model_id, analysis_version, engine)
+
+    cached = await analysis_cache.get(cache_key)
+    if cached:
+        print(f"⚡ Analysis cache hit ({cached['engine']})")
+        return cached["analysis"], {
+            "analysis_engine": cached["engine"],
+            "analysis_cache_hit": True,
+            "prompt_versions": prompts.manifest()
+        }
+
+    model_image, image_stats = await asyncio.to_thread(image_processing.normalize_image, image_source)
+    if image_stats["normalized"]:
+        print(f"🗜️ Image normalized: {image_stats['original_bytes']} -> {image_stats['normalized_bytes']} bytes")
+    data_url = build_data_url(model_image)
+
+    token = current_image.set((data_url, hashlib.sha256(model_image).hexdigest()))
+    try:
+        final_analysis_json, engine_used = await run_analysis_pipeline(data_url, engine, on_layer)
+    finally:
+        current_image.reset(token)
+
+    # Don't pin failed model calls in the cache
+    if final_analysis_json.get("raw_text_analysis") not in ("", "unknown"):
+        await analysis_cache.set(
+            cache_key, final_analysis_json, engine_used, ENGINE_MODEL_CALLS.get(engine_used, 0)
+        )
+    return final_analysis_json, {
+        "analysis_engine": engine_used,
+        "analysis_cache_hit": False,
+        "image_processing": image_stats,
+        "prompt_versions": prompts.manifest()
+    }
+
+async def perceptual_hash_fields(image_source: Optional[image_processing.ImageSource]) -> dict:
+    """Perceptual hash fields stored on an inspection at ingest (empty if disabled or undecodable)."""
+    if not near_duplicate_finder.enabled or image_source is None:
+        return {}
+    value = await asyncio.to_thread(image_processing.dhash, image_source)
+    return NearDuplicateFinder.fields(value)
+
+async def analyze_or_reuse(inspection: dict, image_source: image_processing.ImageSource,
+                           engine: Optional[str] = None, on_layer=None):
+    """Reuses the analysis of a recent near-duplicate photo, otherwise runs run_cached_analysis.
+
+    Returns (analysis_json, meta) like run_cached_analysis; reused results record
+    `near_duplicate_of` and the Hamming distance between the two hashes.
+    """
+    try:
+        duplicate = await near_duplicate_finder.find(inspection)
+    except Exception as e:
+        print(f"⚠️ Near-duplicate lookup failed: {str(e)}")
+        duplicate = None
+    if duplicate:
+        original, distance = duplicate
+        print(f"♻️ Near-duplicate of {original['id']} (distance {distance}), reusing its analysis")
+        return original["analysis"], {
+            "analysis_engine": original.get("analysis_engine"),
+            "analysis_cache_hit": True,
+            "near_duplicate_of": original["id"],
+            "phash_distance": distance,
+            "prompt_versions": original.get("prompt_versions")
+        }
+    image_sha256 = (inspection.get("image") or {}).get("sha256")
+    return await run_cached_analysis(image_source, engine, on_layer, image_sha256)
+
 # Authentication helper
 async def get_current_user(session_token: str = Header(None, alias="Session-Token")):
     # Bypass authentication entirely for production demo
@@ -415,7 +1044,7 @@ async def create_session(session_id: str = Form(...)):
         # user_data = response.json()  # Commented out for deployment
         
         # Check if user already exists
-        existing_user = users_collection.find_one({"email": user_data["email"]})
+        existing_user = await users_collection.find_one({"email": user_data["email"]})
         if not existing_user:
             # Create new user
             user_id = str(uuid.uuid4())
@@ -426,7 +1055,7 @@ async def create_session(session_id: str = Form(...)):
                 "picture": user_data["picture"],
                 "created_at": datetime.utcnow()
             }
-            users_collection.insert_one(user)
+            await users_collection.insert_one(user)
             
             # Return user data without ObjectId
             user_response = {
@@ -453,7 +1082,7 @@ async def create_session(session_id: str = Form(...)):
             "expires_at": datetime.utcnow() + timedelta(days=7),
             "created_at": datetime.utcnow()
         }
-        sessions_collection.insert_one(session)
+        await sessions_collection.insert_one(session)
         
         return {"session_token": session_token, "user": user_response}
         
@@ -482,7 +1111,7 @@ async def demo_login():
         }
         
         # Check if user already exists
-        existing_user = users_collection.find_one({"email": user_data["email"]})
+        existing_user = await users_collection.find_one({"email": user_data["email"]})
         if not existing_user:
             # Create new user
             user_id = str(uuid.uuid4())
@@ -493,7 +1122,7 @@ async def demo_login():
                 "picture": user_data["picture"],
                 "created_at": datetime.utcnow()
             }
-            users_collection.insert_one(user)
+            await users_collection.insert_one(user)
             
             user_response = {
                 "id": user_id,
@@ -518,7 +1147,7 @@ async def demo_login():
             "expires_at": datetime.utcnow() + timedelta(days=30),
             "created_at": datetime.utcnow()
         }
-        sessions_collection.insert_one(session)
+        await sessions_collection.insert_one(session)
         
         return {
             "session_token": session_token,
@@ -528,259 +1157,1005 @@ async def demo_login():
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# Inspection routes
-@app.post("/api/inspections")
-async def create_inspection(
-    inspection_request: InspectionRequest
-):
-    # Bypass authentication for demo - use demo user
-    user = {
-        "id": "demo-user",
-        "email": "admin@firesafety.com",
-        "name": "Fire Safety Admin",
-        "picture": "https://via.placeholder.com/150"
-    }
-    
+# Inspection helpers
+def build_data_url(image_bytes: bytes, image_base64: Optional[str] = None) -> str:
+    """Builds the data URL sent to the model, detecting the image format from its content."""
+    if image_base64 is None:
+        image_base64 = base64.b64encode(image_bytes).decode("ascii")
+    return f"data:{detect_content_type(image_bytes)};base64,{image_base64}"
+
+def decode_image_base64(image_base64: str) -> bytes:
+    """Decodes a base64 image from a request body."""
     try:
-        start_time = datetime.utcnow()
-        # Detect image format from base64 content and create proper data URL
-        image_base64 = inspection_request.image_base64
-        
-        image_format = "jpeg"  # default
-        try:
-            decoded = base64.b64decode(image_base64[:50])
-            if decoded.startswith(b'\x89PNG'):
-                image_format = "png"
-            elif decoded.startswith(b'GIF'):
-                image_format = "gif"
-            elif decoded.startswith(b'\xff\xd8\xff'):
-                image_format = "jpeg"
-            elif decoded.startswith(b'RIFF') and b'WEBP' in decoded[:20]:
-                image_format = "webp"
-        except Exception:
-            pass
-        
-        data_url = f"data:image/{image_format};base64,{image_base64}"
-
-        # --- START REFACTORED AI ANALYSIS ---
-        # Layer 1: OCR
-        raw_text = await extract_raw_text(data_url)
-
-        # Layer 2 & 3: Parallel Analysis (Enhanced)
-        year_task = analyze_year(raw_text, data_url)
-        month_task = analyze_month(raw_text, data_url)
-        day_task = analyze_day(raw_text, data_url)
-        type_task = analyze_extinguisher_type(raw_text, data_url)
-        condition_task = analyze_condition(raw_text, data_url)
-        company_task = analyze_company_info(raw_text, data_url)
-        equipment_task = analyze_equipment_numbers(raw_text, data_url)
-        service_task = analyze_service_details(raw_text, data_url)
-
-        results = await asyncio.gather(
-            year_task, month_task, day_task, type_task, condition_task,
-            company_task, equipment_task, service_task
-        )
-        year, month, day, extinguisher_type, condition, company_info, equipment_numbers, service_details = results
-
-        # Layer 4: Consolidation (Enhanced)
-        final_analysis_json = consolidate_analysis(
-            year=year,
-            month=month,
-            day=day,
-            extinguisher_type=extinguisher_type,
-            condition=condition,
-            company_info=company_info,
-            equipment_numbers=equipment_numbers,
-            service_details=service_details,
-            raw_text=raw_text
+        return base64.b64decode(image_base64)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid base64 image data")
+
+def check_analysis_engine(inspection_request: InspectionMetadata):
+    """Normalizes the requested analysis engine, rejecting unknown names with a 400."""
+    engine = inspection_request.analysis_engine
+    if engine is None:
+        return
+    if engine.lower() not in ANALYSIS_ENGINES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown analysis_engine '{engine}'; expected one of: {', '.join(ANALYSIS_ENGINES)}"
         )
-        
-        gemini_response = json.dumps(final_analysis_json, indent=2)
-        # --- END REFACTORED AI ANALYSIS ---
+    inspection_request.analysis_engine = engine.lower()
 
-        print(f"🔍 Creating inspection record...")
-        print(f"📊 Analysis result: {final_analysis_json}")
+async def load_inspection_image(inspection: dict) -> Optional[bytes]:
+    """Returns the raw image bytes of an inspection from the blob store (or legacy inline base64)."""
+    if inspection.get("image"):
+        return await blob_store.get(inspection["image"]["sha256"])
+    if inspection.get("image_base64"):
+        return base64.b64decode(inspection["image_base64"])
+    return None
 
-        # Create inspection record
-        inspection_id = str(uuid.uuid4())
-        inspection = {
-            "id": inspection_id,
-            "user_id": user["id"],
-            "location": inspection_request.location,
-            "image_base64": image_base64, # Storing original base64
-            "inspection_date": datetime.utcnow(),
-            "status": "analyzed",
-            "gemini_response": gemini_response,
-            "notes": inspection_request.notes,
-            "created_at": datetime.utcnow()
-        }
-        
-        # Add GPS data if provided (Quick Shot mode)
-        if inspection_request.gps_data:
-            inspection["gps_data"] = inspection_request.gps_data
-            print(f"📍 GPS data saved: {inspection_request.gps_data}")
-            
-        # Add business name if provided (Quick Shot mode)
-        if inspection_request.business_name:
-            inspection["business_name"] = inspection_request.business_name
-            print(f"🏢 Business name saved: {inspection_request.business_name}")
-        
-        print(f"💾 Attempting to save to database...")
+def build_inspection_record(inspection_id: str, user: dict, inspection_request: InspectionMetadata, image: dict, status: str) -> dict:
+    """Builds the base inspection document (without analysis results).
+
+    `image` is the blob store reference ({"sha256", "size", "content_type"}); the image
+    bytes themselves are not stored on the inspection.
+    """
+    inspection = {
+        "id": inspection_id,
+        "user_id": user["id"],
+        "location": inspection_request.location,
+        "image": image,
+        "inspection_date": datetime.utcnow(),
+        "status": status,
+        "notes": inspection_request.notes,
+        "created_at": datetime.utcnow()
+    }
+    if inspection_request.analysis_engine:
+        inspection["requested_engine"] = inspection_request.analysis_engine
+
+    # Add GPS data if provided (Quick Shot mode)
+    if inspection_request.gps_data:
+        inspection["gps_data"] = inspection_request.gps_data
+        print(f"📍 GPS data saved: {inspection_request.gps_data}")
+        # Normalized copy for the 2dsphere index (see /api/inspections/near and /bbox)
+        location_point = geo.geojson_point(inspection_request.gps_data)
+        if location_point:
+            inspection["location_point"] = location_point
         
-        # Extract due date from the structured JSON for alerts
-        try:
-            if final_analysis_json.get("next_due_date"):
-                due_date_info = final_analysis_json["next_due_date"]
-                if all(due_date_info.get(k) for k in ["year", "month", "day"]):
-                    inspection["due_date"] = datetime(
-                        due_date_info["year"],
-                        due_date_info["month"],
-                        due_date_info["day"]
-                    )
-        except (ValueError, TypeError):
-            pass
+    # Add business name if provided (Quick Shot mode)
+    if inspection_request.business_name:
+        inspection["business_name"] = inspection_request.business_name
+        print(f"🏢 Business name saved: {inspection_request.business_name}")
+    return inspection
+
+def analysis_fields(final_analysis_json: dict, analysis_meta: dict) -> dict:
+    """Inspection document fields derived from a completed analysis."""
+    fields = {
+        "status": "analyzed",
+        "gemini_response": json.dumps(final_analysis_json, indent=2),
+        **analysis_meta
+    }
+
+    # Extract due date from the structured JSON for alerts
+    try:
+        if final_analysis_json.get("next_due_date"):
+            due_date_info = final_analysis_json["next_due_date"]
+            if all(due_date_info.get(k) for k in ["year", "month", "day"]):
+                fields["due_date"] = datetime(
+                    due_date_info["year"],
+                    due_date_info["month"],
+                    due_date_info["day"]
+                )
+    except (ValueError, TypeError):
+        pass
+    return fields
+
+def image_url_signature(inspection_id: str, expires: int) -> str:
+    message = f"{inspection_id}:{expires}".encode("utf-8")
+    return hmac.new(IMAGE_URL_SECRET.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+def signed_image_url(inspection_id: str, ttl_hours: int = WEBHOOK_IMAGE_URL_TTL_HOURS):
+    """Returns (url, expires_unix) for an expiring, HMAC-signed link to the inspection image."""
+    expires = int(time.time()) + ttl_hours * 3600
+    signature = image_url_signature(inspection_id, expires)
+    return f"{PUBLIC_BASE_URL}/api/inspections/{inspection_id}/image?expires={expires}&signature={signature}", expires
+
+def verify_image_signature(inspection_id: str, expires: int, signature: str) -> bool:
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(image_url_signature(inspection_id, expires), signature)
+
+def compact_webhook_payload(webhook_data: dict) -> dict:
+    """Slims a full webhook payload: signed image URL instead of base64, no duplicated analysis fields."""
+    compact = dict(webhook_data)
+    image_url, expires = signed_image_url(webhook_data["inspection_id"])
+    compact["image_url"] = image_url
+    compact["image_url_expires_at"] = datetime.utcfromtimestamp(expires).isoformat()
+    compact["payload_format"] = "compact"
+
+    # These are verbatim copies of values already under "analysis"
+    email_summary = dict(webhook_data["email_summary"])
+    for field in ["condition", "extinguisher_type", "last_inspection", "next_due",
+                  "equipment_numbers", "service_company", "maintenance_notes"]:
+        email_summary.pop(field, None)
+    email_summary["image_included"] = False
+    compact["email_summary"] = email_summary
+    return compact
+
+async def send_new_tag_notification(inspection_id: str, user: dict, inspection_request: InspectionMetadata, final_analysis_json: dict, image: dict, site: Optional[dict] = None):
+    """Queues comprehensive inspection data for the N8N webhook (email notifications).
+
+    Only the outbox insert happens here; delivery and retries run in the outbox worker,
+    which also inlines the image (`image` is its blob store reference) as `image_base64`.
+    `site` is the inspection's site cluster, if it was assigned one.
+    """
+    webhook_data = {
+        "inspection_id": inspection_id,
+        "user_id": user["id"],
+        "location": inspection_request.location,
+        "notes": getattr(inspection_request, 'notes', ''),
+        "submitted_by": getattr(inspection_request, 'submitted_by', 'Anonymous'),
+        "business_name": getattr(inspection_request, 'business_name', ''),
+        "mode": getattr(inspection_request, 'mode', 'standard'),
+        "timestamp": datetime.utcnow().isoformat(),
+        "analysis": final_analysis_json,
+        "gps_data": getattr(inspection_request, 'gps_data', None),
+        "site_id": site["id"] if site else None,
         
-        # Insert into database
-        try:
-            print(f"💾 Inserting into collection: {inspections_collection.name}")
-            result = inspections_collection.insert_one(inspection)
-            print(f"✅ Database insert successful! ID: {result.inserted_id}")
-        except Exception as e:
-            print(f"❌ Database insert failed: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        # New tag submission notification
+        "notification_type": "new_tag_submitted",
+        "alert_message": "🆕 NEW FIRE EXTINGUISHER TAG SUBMITTED",
+        "priority": "high" if final_analysis_json.get("requires_attention", False) else "normal",
         
-        # Send comprehensive data to N8n webhook for email notifications
-        webhook_data = {
-            "inspection_id": inspection_id,
-            "user_id": user["id"],
+        # Email-friendly formatted data with optimized AI results
+        "email_subject": f"🆕 NEW TAG: Fire Safety Inspection - {inspection_request.location}",
+        "email_summary": {
+            "alert_header": "🆕 NEW FIRE EXTINGUISHER TAG SUBMITTED",
             "location": inspection_request.location,
-            "notes": getattr(inspection_request, 'notes', ''),
-            "submitted_by": getattr(inspection_request, 'submitted_by', 'Anonymous'),
-            "business_name": getattr(inspection_request, 'business_name', ''),
-            "mode": getattr(inspection_request, 'mode', 'standard'),
-            "timestamp": datetime.utcnow().isoformat(),
-            "analysis": final_analysis_json,
-            "image_base64": inspection_request.image_base64,
-            "gps_data": getattr(inspection_request, 'gps_data', None),
+            "inspector": getattr(inspection_request, 'submitted_by', 'Anonymous'),
+            "business": getattr(inspection_request, 'business_name', 'N/A'),
+            "date": datetime.utcnow().strftime("%B %d, %Y at %I:%M %p"),
+            "submission_mode": "⚡ Quick Shot" if getattr(inspection_request, 'mode', 'standard') == 'quick_shot' else "🔧 Technician",
             
-            # New tag submission notification
-            "notification_type": "new_tag_submitted",
-            "alert_message": "🆕 NEW FIRE EXTINGUISHER TAG SUBMITTED",
-            "priority": "high" if final_analysis_json.get("requires_attention", False) else "normal",
+            # Optimized AI Analysis Results
+            "condition": final_analysis_json.get("condition", "Unknown"),
+            "requires_attention": "🚨 YES - NEEDS ATTENTION" if final_analysis_json.get("requires_attention", False) else "✅ No Action Required",
+            "extinguisher_type": final_analysis_json.get("extinguisher_type", "Unknown"),
+            "last_inspection": final_analysis_json.get("last_inspection_date", "Unknown"),
+            "next_due": final_analysis_json.get("next_due_date", "Unknown"),
             
-            # Email-friendly formatted data with optimized AI results
-            "email_subject": f"🆕 NEW TAG: Fire Safety Inspection - {inspection_request.location}",
-            "email_summary": {
-                "alert_header": "🆕 NEW FIRE EXTINGUISHER TAG SUBMITTED",
-                "location": inspection_request.location,
-                "inspector": getattr(inspection_request, 'submitted_by', 'Anonymous'),
-                "business": getattr(inspection_request, 'business_name', 'N/A'),
-                "date": datetime.utcnow().strftime("%B %d, %Y at %I:%M %p"),
-                "submission_mode": "⚡ Quick Shot" if getattr(inspection_request, 'mode', 'standard') == 'quick_shot' else "🔧 Technician",
-                
-                # Optimized AI Analysis Results
-                "condition": final_analysis_json.get("condition", "Unknown"),
-                "requires_attention": "🚨 YES - NEEDS ATTENTION" if final_analysis_json.get("requires_attention", False) else "✅ No Action Required",
-                "extinguisher_type": final_analysis_json.get("extinguisher_type", "Unknown"),
-                "last_inspection": final_analysis_json.get("last_inspection_date", "Unknown"),
-                "next_due": final_analysis_json.get("next_due_date", "Unknown"),
-                
-                # Equipment Information
-                "equipment_numbers": final_analysis_json.get("equipment_numbers", {}),
-                "equipment_summary": format_equipment_summary(final_analysis_json.get("equipment_numbers", {})),
-                
-                # Service Company Information
-                "service_company": final_analysis_json.get("service_company", {}),
-                "service_summary": format_service_company_summary(final_analysis_json.get("service_company", {})),
-                
-                # Additional Details
-                "maintenance_notes": final_analysis_json.get("maintenance_notes", ""),
-                "gps_coordinates": None,
-                "image_included": True,
-                "analysis_confidence": "High (AI-Powered Analysis)"
-            }
+            # Equipment Information
+            "equipment_numbers": final_analysis_json.get("equipment_numbers", {}),
+            "equipment_summary": format_equipment_summary(final_analysis_json.get("equipment_numbers", {})),
+            
+            # Service Company Information
+            "service_company": final_analysis_json.get("service_company", {}),
+            "service_summary": format_service_company_summary(final_analysis_json.get("service_company", {})),
+            
+            # Additional Details
+            "maintenance_notes": final_analysis_json.get("maintenance_notes", ""),
+            "gps_coordinates": None,
+            "image_included": True,
+            "analysis_confidence": "High (AI-Powered Analysis)"
         }
-        
-        # Format GPS data for email
-        if hasattr(inspection_request, 'gps_data') and inspection_request.gps_data:
-            try:
-                gps_data = inspection_request.gps_data
-                if isinstance(gps_data, str):
-                    gps_data = json.loads(gps_data)
-                if gps_data and 'latitude' in gps_data and 'longitude' in gps_data:
-                    webhook_data["email_summary"]["gps_coordinates"] = f"{gps_data['latitude']:.6f}, {gps_data['longitude']:.6f}"
-                    webhook_data["email_summary"]["google_maps_link"] = f"https://maps.google.com?q={gps_data['latitude']},{gps_data['longitude']}"
-            except (json.JSONDecodeError, TypeError, KeyError):
-                pass
-        
-        # Send webhook if URL is configured
-        if N8N_WEBHOOK_URL:
-            try:
-                print(f"📧 Sending NEW TAG notification to N8N webhook...")
-                print(f"🆕 Alert: {webhook_data['alert_message']}")
-                print(f"📍 Location: {inspection_request.location}")
-                print(f"🔥 Type: {final_analysis_json.get('extinguisher_type', 'Unknown')}")
-                print(f"📷 Image included: {len(inspection_request.image_base64)} characters")
-                
-                response = requests.post(N8N_WEBHOOK_URL, json=webhook_data, timeout=15)
-                if response.status_code == 200:
-                    print(f"✅ NEW TAG notification sent successfully to email automation")
-                    print(f"📨 Email will be generated for: {webhook_data['email_subject']}")
-                else:
-                    print(f"⚠️ Webhook response: {response.status_code}")
-                    print(f"Response: {response.text[:200]}...")
-            except requests.exceptions.RequestException as e:
-                print(f"❌ Error sending NEW TAG notification: {e}")
+    }
+    
+    # Format GPS data for email
+    if hasattr(inspection_request, 'gps_data') and inspection_request.gps_data:
+        try:
+            gps_data = inspection_request.gps_data
+            if isinstance(gps_data, str):
+                gps_data = json.loads(gps_data)
+            if gps_data and 'latitude' in gps_data and 'longitude' in gps_data:
+                webhook_data["email_summary"]["gps_coordinates"] = f"{gps_data['latitude']:.6f}, {gps_data['longitude']:.6f}"
+                webhook_data["email_summary"]["google_maps_link"] = f"https://maps.google.com?q={gps_data['latitude']},{gps_data['longitude']}"
+        except (json.JSONDecodeError, TypeError, KeyError):
+            pass
+    
+    if WEBHOOK_FORMAT == "compact":
+        webhook_data = compact_webhook_payload(webhook_data)
+
+    # Queue webhook if URL is configured
+    if N8N_WEBHOOK_URL:
+        try:
+            print(f"📧 Queueing NEW TAG notification for N8N webhook...")
+            print(f"🆕 Alert: {webhook_data['alert_message']}")
+            print(f"📍 Location: {inspection_request.location}")
+            print(f"🔥 Type: {final_analysis_json.get('extinguisher_type', 'Unknown')}")
+            if WEBHOOK_FORMAT == "compact":
+                print(f"🔗 Image linked: {webhook_data['image_url']}")
+                await webhook_outbox.enqueue(webhook_data)
+            else:
+                print(f"📷 Image attached at delivery: {image['size']} bytes")
+                await webhook_outbox.enqueue(webhook_data, image_sha256=image["sha256"])
+            print(f"📨 Email will be generated for: {webhook_data['email_subject']}")
+        except Exception as e:
+            print(f"❌ Error queueing NEW TAG notification: {e}")
+    else:
+        print("⚠️ N8N_WEBHOOK_URL not configured, skipping NEW TAG notification")
+
+async def notification_items(inspection_ids: List[str]):
+    """Per-inspection entries for aggregated notifications; returns (items, requires_attention count).
+
+    Items always link their image with a signed URL; inlining N base64 images would
+    make a single payload grow with the number of items.
+    """
+    items = []
+    requires_attention = 0
+    cursor = inspections_collection.find(
+        {"id": {"$in": inspection_ids}},
+        {"_id": 0, "id": 1, "status": 1, "gemini_response": 1, "job.error": 1}
+    )
+    async for inspection in cursor:
+        item = {"inspection_id": inspection["id"], "status": inspection.get("status")}
+        if inspection.get("status") == "analyzed":
+            analysis = json.loads(inspection.get("gemini_response") or "{}")
+            item["analysis"] = analysis
+            if analysis.get("requires_attention", False):
+                requires_attention += 1
         else:
-            print("⚠️ N8N_WEBHOOK_URL not configured, skipping NEW TAG notification")
+            item["error"] = inspection.get("job", {}).get("error")
+        image_url, expires = signed_image_url(inspection["id"])
+        item["image_url"] = image_url
+        item["image_url_expires_at"] = datetime.utcfromtimestamp(expires).isoformat()
+        items.append(item)
+    return items, requires_attention
 
-        duration_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
-        return {
-            "success": True,
-            "inspection_id": inspection_id,
-            "analysis": final_analysis_json,
-            "duration_ms": duration_ms,
-            "model": os.getenv("MODEL_ID", "openrouter/google/gemini-2.5-pro")
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def send_batch_notification(batch: dict):
+    """Queues one aggregated N8N notification for a finished batch."""
+    items, requires_attention = await notification_items(batch["inspection_ids"])
+    analyzed = sum(1 for item in items if item["status"] == "analyzed")
+    webhook_data = {
+        "batch_id": batch["id"],
+        "user_id": batch["user_id"],
+        "location": batch["location"],
+        "business_name": batch.get("business_name"),
+        "notes": batch.get("notes"),
+        "gps_data": batch.get("gps_data"),
+        "timestamp": datetime.utcnow().isoformat(),
+        "notification_type": "batch_submitted",
+        "alert_message": f"🆕 {len(items)} NEW FIRE EXTINGUISHER TAGS SUBMITTED",
+        "priority": "high" if requires_attention else "normal",
+        "email_subject": f"🆕 {len(items)} NEW TAGS: Fire Safety Inspection - {batch['location']}",
+        "summary": {
+            "total": len(items),
+            "analyzed": analyzed,
+            "failed": len(items) - analyzed,
+            "requires_attention": requires_attention
+        },
+        "items": items
+    }
 
-@app.put("/api/inspections/{inspection_id}")
-async def update_inspection(
-    inspection_id: str,
-    inspection_update: InspectionUpdate,
-    user: dict = Depends(get_current_user)
-):
-    inspection = inspections_collection.find_one({
-        "id": inspection_id,
-        "user_id": user["id"]
-    })
-    
-    if not inspection:
-        raise HTTPException(status_code=404, detail="Inspection not found")
-    
-    # Parse current gemini_response; it should always be valid JSON
-    try:
-        current_data = json.loads(inspection.get("gemini_response", "{}"))
-    except json.JSONDecodeError:
-        # Fallback for corrupted data
-        current_data = {}
-    
-    # Create the update object for MongoDB
-    update_data = {}
-    update_payload = inspection_update.dict(exclude_unset=True)
+    if N8N_WEBHOOK_URL:
+        try:
+            print(f"📧 Queueing batch notification for {len(items)} tags at {batch['location']}")
+            await webhook_outbox.enqueue(webhook_data, event_type="batch_submitted")
+        except Exception as e:
+            print(f"❌ Error queueing batch notification: {e}")
+    else:
+        print("⚠️ N8N_WEBHOOK_URL not configured, skipping batch notification")
 
-    # Directly update top-level fields
-    for field in ["extinguisher_type", "maintenance_notes", "condition", "requires_attention"]:
-        if field in update_payload:
-            current_data[field] = update_payload[field]
-            
-    # Handle nested date objects
-    if "last_inspection_date" in update_payload:
-        if "last_inspection_date" not in current_data:
-            current_data["last_inspection_date"] = {}
-        current_data["last_inspection_date"].update(update_payload["last_inspection_date"])
+async def complete_batch_item(batch_id: str, inspection_id: str):
+    """Counts down a batch and sends its aggregated notification once every item is terminal.
+
+    Each inspection is counted once, so a job that runs twice cannot complete the batch early.
+    """
+    await inspection_batches_collection.update_one(
+        {"id": batch_id, "completed_ids": {"$ne": inspection_id}},
+        {"$inc": {"remaining": -1}, "$push": {"completed_ids": inspection_id}}
+    )
+    # Only the update that flips the status sends, so the notification goes out once
+    batch = await inspection_batches_collection.find_one_and_update(
+        {"id": batch_id, "status": "processing", "remaining": {"$lte": 0}},
+        {"$set": {"status": "complete", "completed_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
+    )
+    if batch:
+        print(f"📦 Batch {batch_id} complete ({batch['total']} inspections)")
+        await send_batch_notification(batch)
+
+async def cluster_inspection(inspection: dict, final_analysis_json: dict) -> Optional[dict]:
+    """Assigns an analyzed inspection to its site cluster and records site_id on it.
+
+    Returns the assignment ({"site", "created", "rule"}) or None; clustering errors never fail the inspection.
+    """
+    if not SITE_CLUSTERING_ENABLED:
+        return None
+    try:
+        assignment = await site_clusterer.assign(inspection, final_analysis_json)
+        if assignment:
+            await inspections_collection.update_one(
+                {"id": inspection["id"]}, {"$set": {"site_id": assignment["site"]["id"]}}
+            )
+            print(f"🏢 Inspection {inspection['id']} -> site {assignment['site']['id']} ({assignment['rule']})")
+        return assignment
+    except Exception as e:
+        print(f"⚠️ Site clustering failed for {inspection['id']}: {str(e)}")
+        return None
+
+async def notify_new_inspection(inspection_id: str, user: dict, inspection_request: InspectionMetadata, final_analysis_json: dict, image: dict, site_assignment: Optional[dict]):
+    """Sends the new-tag webhook, or adds repeat inspections of a known site to its digest."""
+    if site_assignment and SITE_WEBHOOK_MODE == "site" and not site_assignment["created"]:
+        try:
+            await site_clusterer.queue_digest(site_assignment["site"]["id"], inspection_id, SITE_DIGEST_DELAY)
+            print(f"🗂️ Inspection {inspection_id} added to site digest {site_assignment['site']['id']}")
+            return
+        except Exception as e:
+            print(f"⚠️ Could not queue site digest, notifying directly: {str(e)}")
+    site = site_assignment["site"] if site_assignment else None
+    await send_new_tag_notification(inspection_id, user, inspection_request, final_analysis_json, image, site)
+
+async def send_site_digest_notification(site: dict):
+    """Queues one N8N notification for the inspections added to a known site since the last one."""
+    items, requires_attention = await notification_items(site.get("pending_inspection_ids", []))
+    if not items:
+        return
+    name = site.get("name") or "Unnamed site"
+    location = None
+    if site.get("location"):
+        lng, lat = site["location"]["coordinates"]
+        location = {"latitude": lat, "longitude": lng}
+    webhook_data = {
+        "site_id": site["id"],
+        "user_id": site["user_id"],
+        "business_name": site.get("name"),
+        "gps_data": location,
+        "timestamp": datetime.utcnow().isoformat(),
+        "notification_type": "site_update",
+        "alert_message": f"🔁 {len(items)} MORE TAGS AT {name.upper()}",
+        "priority": "high" if requires_attention else "normal",
+        "email_subject": f"🔁 {len(items)} more tags: Fire Safety Inspection - {name}",
+        "summary": {
+            "new_inspections": len(items),
+            "site_inspection_count": site.get("inspection_count"),
+            "requires_attention": requires_attention,
+            "first_inspection_id": site.get("first_inspection_id")
+        },
+        "items": items
+    }
+    if N8N_WEBHOOK_URL:
+        try:
+            print(f"📧 Queueing site digest for {len(items)} tags at {name}")
+            await webhook_outbox.enqueue(webhook_data, event_type="site_update")
+        except Exception as e:
+            print(f"❌ Error queueing site digest: {e}")
+    else:
+        print("⚠️ N8N_WEBHOOK_URL not configured, skipping site digest")
+
+async def site_digest_worker():
+    """Sends per-site digests once they are due."""
+    while True:
+        try:
+            while True:
+                site = await site_clusterer.claim_due_digest()
+                if not site:
+                    break
+                await send_site_digest_notification(site)
+        except Exception as e:
+            print(f"❌ Site digest worker error: {str(e)}")
+        await asyncio.sleep(SITE_DIGEST_POLL_SECONDS)
+
+# Background inspection jobs ("Submit & Go")
+TERMINAL_JOB_STATUSES = ("analyzed", "failed")
+LAYERED_JOB_STEPS = 9  # OCR + 8 field layers; the estimate until the job finishes
+inspection_job_queue: Optional[asyncio.Queue] = None
+inspection_job_events: Dict[str, asyncio.Event] = {}
+
+async def process_inspection_job(inspection_id: str, batch_id: Optional[str] = None):
+    """Runs the analysis pipeline for a queued inspection and records progress on the document.
+
+    The inspection's batch (`batch_id`, or the one recorded on the document) is counted down
+    however the job ends, including when the inspection is missing or already finished.
+    """
+    # Background work yields model call slots to interactive requests
+    request_priority.set(PRIORITY_BACKGROUND)
+    inspection = None
+    try:
+        inspection = await inspections_collection.find_one({"id": inspection_id})
+        if inspection and inspection.get("status") not in TERMINAL_JOB_STATUSES:
+            await run_inspection_job(inspection)
+    finally:
+        event = inspection_job_events.pop(inspection_id, None)
+        if event:
+            event.set()
+        batch_id = batch_id or (inspection or {}).get("batch_id")
+        if batch_id:
+            try:
+                await complete_batch_item(batch_id, inspection_id)
+            except Exception as e:
+                print(f"❌ Batch bookkeeping failed for {inspection_id}: {str(e)}")
+
+async def run_inspection_job(inspection: dict):
+    """Analyzes one queued inspection; failures are recorded on the document."""
+    inspection_id = inspection["id"]
+
+    await inspections_collection.update_one(
+        {"id": inspection_id},
+        {"$set": {
+            "status": "processing",
+            "job.stage": "analyzing",
+            "job.started_at": datetime.utcnow(),
+            "job.completed_steps": 0,
+            "job.total_steps": LAYERED_JOB_STEPS
+        }}
+    )
+
+    steps_taken = 0
+
+    async def on_layer(layer, value):
+        nonlocal steps_taken
+        steps_taken += 1
+        await inspections_collection.update_one(
+            {"id": inspection_id},
+            {"$set": {"job.stage": layer}, "$inc": {"job.completed_steps": 1}}
+        )
+
+    try:
+        image_bytes = await load_inspection_image(inspection)
+        if image_bytes is None:
+            raise ValueError("Inspection image not found in blob store")
+        inspection_request = InspectionMetadata(
+            location=inspection["location"],
+            notes=inspection.get("notes"),
+            gps_data=inspection.get("gps_data"),
+            business_name=inspection.get("business_name"),
+            analysis_engine=inspection.get("requested_engine")
+        )
+        final_analysis_json, analysis_meta = await analyze_or_reuse(
+            inspection, image_bytes, inspection_request.analysis_engine, on_layer
+        )
+
+        update = analysis_fields(final_analysis_json, analysis_meta)
+        update["job.stage"] = "complete"
+        update["job.finished_at"] = datetime.utcnow()
+        # The tag gate, cache hits and near-duplicates finish in fewer steps than estimated
+        update["job.completed_steps"] = update["job.total_steps"] = max(1, steps_taken)
+        await inspections_collection.update_one({"id": inspection_id}, {"$set": update})
+        print(f"✅ Background inspection {inspection_id} analyzed")
+
+        site_assignment = await cluster_inspection(inspection, final_analysis_json)
+        # Batch items are reported together once the whole batch is done
+        if not inspection.get("batch_id"):
+            await notify_new_inspection(
+                inspection_id, {"id": inspection["user_id"]}, inspection_request, final_analysis_json,
+                # Legacy inspections kept the image inline; store it so the outbox can attach it
+                inspection.get("image") or await blob_store.put(image_bytes), site_assignment
+            )
+    except Exception as e:
+        print(f"❌ Background inspection {inspection_id} failed: {str(e)}")
+        await inspections_collection.update_one(
+            {"id": inspection_id},
+            {"$set": {
+                "status": "failed",
+                "job.stage": "failed",
+                "job.error": str(e),
+                "job.finished_at": datetime.utcnow()
+            }}
+        )
+
+async def inspection_job_worker(worker_id: int):
+    """Pulls queued inspection ids and processes them one at a time."""
+    while True:
+        inspection_id = await inspection_job_queue.get()
+        try:
+            await process_inspection_job(inspection_id)
+        except Exception as e:
+            print(f"❌ Inspection worker {worker_id} error: {str(e)}")
+        finally:
+            inspection_job_queue.task_done()
+
+@app.on_event("startup")
+async def start_inspection_workers():
+    global inspection_job_queue
+    inspection_job_queue = asyncio.Queue()
+    worker_count = int(os.getenv("INSPECTION_WORKERS", "4"))
+    for worker_id in range(worker_count):
+        asyncio.create_task(inspection_job_worker(worker_id))
+
+    # Re-queue jobs interrupted by a restart
+    try:
+        pending = inspections_collection.find(
+            {"status": {"$in": ["queued", "processing"]}}, {"id": 1}
+        )
+        requeued = 0
+        async for item in pending:
+            inspection_job_queue.put_nowait(item["id"])
+            requeued += 1
+        if requeued:
+            print(f"🔁 Re-queued {requeued} unfinished inspection jobs")
+    except Exception as e:
+        print(f"⚠️ Could not re-queue unfinished inspection jobs: {str(e)}")
+    print(f"👷 Started {worker_count} inspection workers")
+
+# Shared by all batches so one large batch cannot flood the model provider
+batch_semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+# Strong references to fire-and-forget tasks (batches, abandoned streams)
+background_tasks = set()
+
+async def run_inspection_batch(batch_id: str, inspection_ids: List[str]):
+    """Analyzes the inspections of a batch, at most BATCH_CONCURRENCY at a time."""
+    async def run_one(inspection_id):
+        async with batch_semaphore:
+            await process_inspection_job(inspection_id, batch_id)
+
+    results = await asyncio.gather(*(run_one(i) for i in inspection_ids), return_exceptions=True)
+    for inspection_id, result in zip(inspection_ids, results):
+        if isinstance(result, Exception):
+            print(f"❌ Batch inspection {inspection_id} error: {str(result)}")
+
+@app.on_event("startup")
+async def start_webhook_outbox():
+    if N8N_WEBHOOK_URL:
+        await webhook_outbox.start()
+        print("📮 Webhook outbox worker started")
+
+@app.on_event("shutdown")
+async def stop_webhook_outbox():
+    await webhook_outbox.stop()
+
+@app.on_event("shutdown")
+async def stop_ocr_pool():
+    ocr_engine.shutdown()
+
+@app.on_event("startup")
+async def start_site_digest_worker():
+    if SITE_CLUSTERING_ENABLED and SITE_WEBHOOK_MODE == "site":
+        task = asyncio.create_task(site_digest_worker())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+@app.on_event("startup")
+async def build_site_index():
+    if not SITE_INDEX_ENABLED:
+        return
+    try:
+        cursor = inspections_collection.find(
+            {"gps_data": {"$ne": None}, "business_name": {"$nin": [None, ""]}},
+            {"_id": 0, "gps_data": 1, "business_name": 1, "location": 1, "created_at": 1}
+        )
+        async for inspection in cursor:
+            site_index.add(inspection)
+        print(f"🗺️ Site index built with {len(site_index.sites)} known sites")
+    except Exception as e:
+        print(f"⚠️ Could not build site index: {str(e)}")
+
+@app.on_event("startup")
+async def start_places_client():
+    await places_client.start()
+    print(f"📍 Places provider: {places_client.provider.name}")
+
+@app.on_event("shutdown")
+async def stop_places_client():
+    await places_client.stop()
+
+
+async def submit_inspection(
+    user: dict,
+    inspection_request: InspectionMetadata,
+    image: dict,
+    image_source: image_processing.ImageSource,
+    async_mode: bool,
+    on_layer=None
+):
+    """Shared create flow once the image is in the blob store.
+
+    In async mode the inspection is queued and a 202 is returned; otherwise the analysis
+    runs inline. `image_source` is the image bytes, or the seekable file they were
+    spooled to (the blob store copy is never read back). `on_layer` is passed through
+    to the pipeline for inline runs.
+    """
+    start_time = datetime.utcnow()
+    inspection_id = str(uuid.uuid4())
+
+    # The perceptual hash is computed once here, at ingest
+    perceptual_hash = await perceptual_hash_fields(image_source)
+
+    if async_mode:
+        # Submit & Go: persist the image now, analyze in a background worker
+        inspection = build_inspection_record(inspection_id, user, inspection_request, image, "queued")
+        inspection.update(perceptual_hash)
+        inspection["job"] = {"stage": "queued", "queued_at": datetime.utcnow()}
+        try:
+            await inspections_collection.insert_one(inspection)
+        except Exception as e:
+            print(f"❌ Database insert failed: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        site_index.add(inspection)
+        inspection_job_queue.put_nowait(inspection_id)
+        print(f"📥 Inspection {inspection_id} queued for background analysis")
+        return JSONResponse(status_code=202, content={
+            "success": True,
+            "inspection_id": inspection_id,
+            "status": "queued",
+            "status_url": f"/api/inspections/{inspection_id}/status"
+        })
+
+    inspection = build_inspection_record(inspection_id, user, inspection_request, image, "analyzed")
+    inspection.update(perceptual_hash)
+
+    # --- START REFACTORED AI ANALYSIS ---
+    final_analysis_json, analysis_meta = await analyze_or_reuse(
+        inspection, image_source, inspection_request.analysis_engine, on_layer
+    )
+    # --- END REFACTORED AI ANALYSIS ---
+
+    print(f"🔍 Creating inspection record...")
+    print(f"📊 Analysis result: {final_analysis_json}")
+
+    # Create inspection record
+    inspection.update(analysis_fields(final_analysis_json, analysis_meta))
+    
+    print(f"💾 Attempting to save to database...")
+    
+    # Insert into database
+    try:
+        print(f"💾 Inserting into collection: {inspections_collection.name}")
+        result = await inspections_collection.insert_one(inspection)
+        print(f"✅ Database insert successful! ID: {result.inserted_id}")
+    except Exception as e:
+        print(f"❌ Database insert failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    site_index.add(inspection)
+    
+    site_assignment = await cluster_inspection(inspection, final_analysis_json)
+    await notify_new_inspection(inspection_id, user, inspection_request, final_analysis_json, image, site_assignment)
+
+    duration_ms = int((datetime.utcnow() - start_time).total_seconds() * 1000)
+    return {
+        "success": True,
+        "inspection_id": inspection_id,
+        "site_id": site_assignment["site"]["id"] if site_assignment else None,
+        "analysis": final_analysis_json,
+        "duration_ms": duration_ms,
+        "model": os.getenv("MODEL_ID", "openrouter/google/gemini-2.5-pro"),
+        "analysis_engine": analysis_meta["analysis_engine"],
+        "cache_hit": analysis_meta["analysis_cache_hit"],
+        "near_duplicate_of": analysis_meta.get("near_duplicate_of"),
+        "image_processing": analysis_meta.get("image_processing")
+    }
+
+
+# Inspection routes
+@app.post("/api/inspections")
+async def create_inspection(
+    inspection_request: InspectionRequest,
+    async_mode: bool = Query(False, alias="async")
+):
+    # Bypass authentication for demo - use demo user
+    user = {
+        "id": "demo-user",
+        "email": "admin@firesafety.com",
+        "name": "Fire Safety Admin",
+        "picture": "https://via.placeholder.com/150"
+    }
+    
+    try:
+        check_analysis_engine(inspection_request)
+        image_bytes = decode_image_base64(inspection_request.image_base64)
+        image = await blob_store.put(image_bytes)
+        return await submit_inspection(user, inspection_request, image, image_bytes, async_mode)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/inspections/upload")
+async def upload_inspection(
+    image: UploadFile = File(...),
+    location: str = Form(...),
+    notes: Optional[str] = Form(None),
+    gps_data: Optional[str] = Form(None),
+    business_name: Optional[str] = Form(None),
+    analysis_engine: Optional[str] = Form(None),
+    async_mode: bool = Query(False, alias="async")
+):
+    """Multipart variant of POST /api/inspections.
+
+    The file is streamed into the blob store in chunks (hashed on the fly) and is never
+    held in memory whole: the perceptual hash and the analysis decode it from the upload's
+    spool file, JPEGs at a reduced scale. Decoding still needs memory in proportion to
+    IMAGE_MAX_DIMENSION, and an image that can't be shrunk is sent to the model as-is.
+    `gps_data` is a JSON object string.
+    """
+    # Bypass authentication for demo - use demo user
+    user = {
+        "id": "demo-user",
+        "email": "admin@firesafety.com",
+        "name": "Fire Safety Admin",
+        "picture": "https://via.placeholder.com/150"
+    }
+
+    try:
+        try:
+            gps = json.loads(gps_data) if gps_data else None
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="gps_data must be a JSON object")
+        inspection_request = InspectionMetadata(
+            location=location,
+            notes=notes,
+            gps_data=gps,
+            business_name=business_name,
+            analysis_engine=analysis_engine
+        )
+        check_analysis_engine(inspection_request)
+
+        async def chunks():
+            while True:
+                chunk = await image.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+        try:
+            stored_image = await blob_store.put_stream(chunks(), max_bytes=MAX_UPLOAD_BYTES)
+        except BlobTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        if stored_image["size"] == 0:
+            raise HTTPException(status_code=400, detail="Empty image upload")
+        print(f"📤 Streamed upload stored: {stored_image['sha256'][:12]}... ({stored_image['size']} bytes)")
+
+        return await submit_inspection(user, inspection_request, stored_image, image.file, async_mode)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def sse_event(event: str, data: dict) -> str:
+    """Formats one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/api/inspections/stream")
+async def stream_inspection(inspection_request: InspectionRequest):
+    """Streaming variant of POST /api/inspections (Server-Sent Events).
+
+    Emits a `layer` event as each analysis layer finishes, then a `result` event with the
+    same body as the synchronous endpoint (or an `error` event). The inspection is saved
+    even if the client disconnects before the result arrives.
+    """
+    # Bypass authentication for demo - use demo user
+    user = {
+        "id": "demo-user",
+        "email": "admin@firesafety.com",
+        "name": "Fire Safety Admin",
+        "picture": "https://via.placeholder.com/150"
+    }
+
+    check_analysis_engine(inspection_request)
+    image_bytes = decode_image_base64(inspection_request.image_base64)
+    image = await blob_store.put(image_bytes)
+    events: asyncio.Queue = asyncio.Queue()
+    start_time = time.perf_counter()
+
+    async def on_layer(layer, value):
+        events.put_nowait(sse_event("layer", {
+            "layer": layer,
+            "value": value,
+            "elapsed_ms": int((time.perf_counter() - start_time) * 1000)
+        }))
+
+    async def run():
+        try:
+            result = await submit_inspection(user, inspection_request, image, image_bytes, False, on_layer)
+            events.put_nowait(sse_event("result", result))
+        except HTTPException as e:
+            events.put_nowait(sse_event("error", {"status_code": e.status_code, "detail": e.detail}))
+        except Exception as e:
+            events.put_nowait(sse_event("error", {"status_code": 500, "detail": str(e)}))
+        finally:
+            events.put_nowait(None)
+
+    # Kept referenced so the analysis finishes even if the stream is abandoned
+    task = asyncio.create_task(run())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+    async def event_stream():
+        yield sse_event("accepted", {"status": "processing"})
+        while True:
+            message = await events.get()
+            if message is None:
+                break
+            yield message
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/inspections/batch")
+async def create_inspection_batch(batch_request: BatchInspectionRequest):
+    """Submits several tag photos that share location/business metadata.
+
+    Every image becomes its own queued inspection; they are analyzed in the background with
+    bounded concurrency and a single N8N notification is sent when the whole batch is done.
+    """
+    # Bypass authentication for demo - use demo user
+    user = {
+        "id": "demo-user",
+        "email": "admin@firesafety.com",
+        "name": "Fire Safety Admin",
+        "picture": "https://via.placeholder.com/150"
+    }
+
+    try:
+        if not batch_request.images_base64:
+            raise HTTPException(status_code=400, detail="images_base64 must contain at least one image")
+        if len(batch_request.images_base64) > BATCH_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"A batch may contain at most {BATCH_MAX_ITEMS} images")
+        check_analysis_engine(batch_request)
+
+        batch_id = str(uuid.uuid4())
+        inspections = []
+        for image_base64 in batch_request.images_base64:
+            image_bytes = decode_image_base64(image_base64)
+            image = await blob_store.put(image_bytes)
+            inspection = build_inspection_record(str(uuid.uuid4()), user, batch_request, image, "queued")
+            inspection.update(await perceptual_hash_fields(image_bytes))
+            inspection["batch_id"] = batch_id
+            inspection["job"] = {"stage": "queued", "queued_at": datetime.utcnow()}
+            inspections.append(inspection)
+        inspection_ids = [inspection["id"] for inspection in inspections]
+
+        try:
+            await inspection_batches_collection.insert_one({
+                "id": batch_id,
+                "user_id": user["id"],
+                "location": batch_request.location,
+                "business_name": batch_request.business_name,
+                "notes": batch_request.notes,
+                "gps_data": batch_request.gps_data,
+                "inspection_ids": inspection_ids,
+                "total": len(inspection_ids),
+                "remaining": len(inspection_ids),
+                "status": "processing",
+                "created_at": datetime.utcnow()
+            })
+            await inspections_collection.insert_many(inspections)
+        except Exception as e:
+            print(f"❌ Database insert failed: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        for inspection in inspections:
+            site_index.add(inspection)
+
+        task = asyncio.create_task(run_inspection_batch(batch_id, inspection_ids))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+        print(f"📦 Batch {batch_id} queued with {len(inspection_ids)} inspections")
+
+        return JSONResponse(status_code=202, content={
+            "success": True,
+            "batch_id": batch_id,
+            "status": "processing",
+            "status_url": f"/api/inspections/batch/{batch_id}",
+            "items": [
+                {
+                    "inspection_id": inspection_id,
+                    "status": "queued",
+                    "status_url": f"/api/inspections/{inspection_id}/status"
+                }
+                for inspection_id in inspection_ids
+            ]
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/inspections/batch/{batch_id}")
+async def get_inspection_batch(batch_id: str):
+    """Per-item statuses of a batch submission."""
+    try:
+        batch = await inspection_batches_collection.find_one({"id": batch_id}, {"_id": 0})
+        if not batch:
+            raise HTTPException(status_code=404, detail="Batch not found")
+
+        statuses = {}
+        cursor = inspections_collection.find(
+            {"id": {"$in": batch["inspection_ids"]}},
+            {"_id": 0, "id": 1, "status": 1, "job": 1}
+        )
+        async for inspection in cursor:
+            statuses[inspection["id"]] = inspection
+        items = []
+        for inspection_id in batch["inspection_ids"]:
+            inspection = statuses.get(inspection_id, {})
+            job = inspection.get("job", {})
+            items.append({
+                "inspection_id": inspection_id,
+                "status": inspection.get("status", "missing"),
+                "stage": job.get("stage"),
+                "error": job.get("error")
+            })
+
+        return {
+            "batch_id": batch_id,
+            "status": batch["status"],
+            "total": batch["total"],
+            "completed": batch["total"] - max(batch["remaining"], 0),
+            "items": items
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/inspections/{inspection_id}/status")
+async def get_inspection_status(
+    inspection_id: str,
+    wait: int = Query(0, ge=0, le=60),
+    user: dict = Depends(get_current_user)
+):
+    """Reports background job progress. With `wait`, long-polls up to that many seconds for completion."""
+    projection = {"_id": 0, "id": 1, "status": 1, "job": 1, "gemini_response": 1, "created_at": 1, "updated_at": 1}
+    query = {"id": inspection_id, "user_id": user["id"]}
+
+    inspection = await inspections_collection.find_one(query, projection)
+    if not inspection:
+        raise HTTPException(status_code=404, detail="Inspection not found")
+
+    deadline = datetime.utcnow() + timedelta(seconds=wait)
+    while inspection.get("status") not in TERMINAL_JOB_STATUSES and datetime.utcnow() < deadline:
+        event = inspection_job_events.setdefault(inspection_id, asyncio.Event())
+        try:
+            # Wake on local completion; re-check the database at least every second for other workers
+            await asyncio.wait_for(event.wait(), timeout=1.0)
+        except asyncio.TimeoutError:
+            pass
+        inspection = (await inspections_collection.find_one(query, projection)) or inspection
+    if inspection.get("status") in TERMINAL_JOB_STATUSES:
+        inspection_job_events.pop(inspection_id, None)
+
+    job = inspection.get("job", {})
+    response = {
+        "inspection_id": inspection_id,
+        "status": inspection.get("status"),
+        "stage": job.get("stage"),
+        "progress": {
+            "completed_steps": job.get("completed_steps", 0),
+            "total_steps": job.get("total_steps", LAYERED_JOB_STEPS)
+        },
+        "error": job.get("error")
+    }
+    if inspection.get("status") == "analyzed":
+        try:
+            response["analysis"] = json.loads(inspection.get("gemini_response", "{}"))
+        except (json.JSONDecodeError, TypeError):
+            response["analysis"] = {"error": "Could not parse AI analysis JSON."}
+    return response
+
+@app.put("/api/inspections/{inspection_id}")
+async def update_inspection(
+    inspection_id: str,
+    inspection_update: InspectionUpdate,
+    user: dict = Depends(get_current_user)
+):
+    inspection = await inspections_collection.find_one({
+        "id": inspection_id,
+        "user_id": user["id"]
+    })
+    
+    if not inspection:
+        raise HTTPException(status_code=404, detail="Inspection not found")
+    
+    # Parse current gemini_response; it should always be valid JSON
+    try:
+        current_data = json.loads(inspection.get("gemini_response", "{}"))
+    except json.JSONDecodeError:
+        # Fallback for corrupted data
+        current_data = {}
+    
+    # Create the update object for MongoDB
+    update_data = {}
+    update_payload = inspection_update.dict(exclude_unset=True)
+
+    # Directly update top-level fields
+    for field in ["extinguisher_type", "maintenance_notes", "condition", "requires_attention"]:
+        if field in update_payload:
+            current_data[field] = update_payload[field]
+            
+    # Handle nested date objects
+    if "last_inspection_date" in update_payload:
+        if "last_inspection_date" not in current_data:
+            current_data["last_inspection_date"] = {}
+        current_data["last_inspection_date"].update(update_payload["last_inspection_date"])
 
     if "next_due_date" in update_payload:
         if "next_due_date" not in current_data:
@@ -810,7 +2185,7 @@ async def update_inspection(
     update_data["updated_at"] = datetime.utcnow()
     
     # Update in database
-    result = inspections_collection.update_one(
+    result = await inspections_collection.update_one(
         {"id": inspection_id, "user_id": user["id"]},
         {"$set": update_data}
     )
@@ -832,7 +2207,7 @@ async def delete_inspection(
     """Deletes an inspection record."""
     try:
         # Find the inspection to delete
-        inspection = inspections_collection.find_one({
+        inspection = await inspections_collection.find_one({
             "id": inspection_id,
             "user_id": user["id"]
         })
@@ -841,13 +2216,19 @@ async def delete_inspection(
             raise HTTPException(status_code=404, detail="Inspection not found")
         
         # Delete the inspection
-        result = inspections_collection.delete_one({
+        result = await inspections_collection.delete_one({
             "id": inspection_id,
             "user_id": user["id"]
         })
         
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Inspection not found")
+        site_index.remove(inspection)
+        if inspection.get("site_id"):
+            await sites_collection.update_one(
+                {"id": inspection["site_id"]},
+                {"$inc": {"inspection_count": -1}, "$pull": {"pending_inspection_ids": inspection_id}}
+            )
         
         return {"message": "Inspection deleted successfully"}
         
@@ -857,31 +2238,168 @@ async def delete_inspection(
         print(f"Error deleting inspection {inspection_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-async def _get_mongo_inspections(query: dict):
-    """Helper to fetch and process inspections from MongoDB."""
+def encode_inspection_cursor(item: dict) -> str:
+    """Encodes the (created_at, _id) sort key of the last returned item as an opaque cursor."""
+    created_at = item.get("created_at")
+    payload = {
+        "c": created_at.isoformat() if isinstance(created_at, datetime) else None,
+        "i": str(item["_id"])
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+def decode_inspection_cursor(cursor: str) -> dict:
+    """Turns a cursor back into a query matching the items that sort after it."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        created_at = datetime.fromisoformat(payload["c"]) if payload["c"] else None
+        last_id = ObjectId(payload["i"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if created_at is None:
+        # Records without created_at sort last, ordered by _id only
+        return {"created_at": None, "_id": {"$lt": last_id}}
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": last_id}},
+        {"created_at": None}
+    ]}
+
+# Inspection fields clients may select with `fields` (dotted sub-fields of these are allowed too)
+INSPECTION_FIELDS = {
+    "id", "user_id", "location", "notes", "status", "image", "image_base64", "inspection_date",
+    "due_date", "created_at", "updated_at", "gemini_response", "gps_data", "location_point",
+    "business_name", "site_id", "batch_id", "job", "requested_engine", "analysis_engine",
+    "analysis_cache_hit", "near_duplicate_of", "phash_distance", "image_processing", "prompt_versions"
+}
+FIELD_PATH_PATTERN = re.compile(r"^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*$")
+
+def inspection_projection(fields: Optional[str]) -> dict:
+    """Builds the Mongo projection for list endpoints; images are excluded unless requested.
+
+    Unknown or malformed field names are rejected with a 400.
+    """
+    if not fields:
+        return {"image_base64": 0}
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    invalid = [
+        name for name in names
+        if not FIELD_PATH_PATTERN.match(name) or name.split(".", 1)[0] not in INSPECTION_FIELDS
+    ]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(invalid)}")
+    # Needed for ids, image URLs and the pagination cursor
+    paths = set(names) | {"id", "created_at", "_id", "image"}
+    # Mongo rejects a projection holding both a field and one of its subpaths ("image", "image.sha256")
+    return {path: 1 for path in paths if not any(path.startswith(f"{other}.") for other in paths)}
+
+async def _get_mongo_inspections(query: dict, limit: Optional[int] = None, after: Optional[str] = None, fields: Optional[str] = None):
+    """Helper to fetch and process inspections from MongoDB.
+
+    Returns (inspections, next_cursor); next_cursor is None when there are no more pages.
+    """
+    if after:
+        query = {"$and": [query, decode_inspection_cursor(after)]}
+
     # Sort by created_at descending (newest first), fallback to _id descending for older records
-    inspections = list(inspections_collection.find(query).sort([("created_at", -1), ("_id", -1)]))
+    cursor = inspections_collection.find(query, inspection_projection(fields)).sort([("created_at", -1), ("_id", -1)])
+    if limit:
+        cursor = cursor.limit(limit + 1)
+    inspections = await cursor.to_list(length=None)
+
+    next_cursor = None
+    if limit and len(inspections) > limit:
+        inspections = inspections[:limit]
+        next_cursor = encode_inspection_cursor(inspections[-1])
     
     for item in inspections:
-        item["_id"] = str(item["_id"]) # Convert ObjectId
-        # Format datetime objects to ISO strings
-        for date_field in ["inspection_date", "due_date", "created_at", "updated_at"]:
-            if date_field in item and isinstance(item[date_field], datetime):
-                item[date_field] = item[date_field].isoformat()
-        
-        # Parse the gemini_response from a JSON string into a dictionary
-        if "gemini_response" in item:
-            try:
-                item["gemini_response"] = json.loads(item["gemini_response"])
-            except (json.JSONDecodeError, TypeError):
-                 # If parsing fails, return the raw string or a default error structure
-                item["gemini_response"] = {"error": "Could not parse AI analysis JSON."}
+        format_inspection_item(item)
+
+    return inspections, next_cursor
 
-    return inspections
+def format_inspection_item(item: dict) -> dict:
+    """Makes a raw inspection document JSON-friendly for list endpoints (in place)."""
+    item["_id"] = str(item["_id"]) # Convert ObjectId
+    if item.get("id"):
+        item["image_url"] = f"/api/inspections/{item['id']}/image"
+    # Format datetime objects to ISO strings
+    for date_field in ["inspection_date", "due_date", "created_at", "updated_at"]:
+        if date_field in item and isinstance(item[date_field], datetime):
+            item[date_field] = item[date_field].isoformat()
+    
+    # Parse the gemini_response from a JSON string into a dictionary
+    if "gemini_response" in item:
+        try:
+            item["gemini_response"] = json.loads(item["gemini_response"])
+        except (json.JSONDecodeError, TypeError):
+             # If parsing fails, return the raw string or a default error structure
+            item["gemini_response"] = {"error": "Could not parse AI analysis JSON."}
+    return item
+
+@app.get("/api/inspections/{inspection_id}/image")
+async def get_inspection_image(
+    inspection_id: str,
+    expires: Optional[int] = None,
+    signature: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    user: dict = Depends(get_current_user)
+):
+    """Streams the original inspection image with immutable caching headers.
+
+    `expires` + `signature` (from signed_image_url) grant access without a session, e.g. from N8N emails.
+    """
+    if signature is not None or expires is not None:
+        if expires is None or not signature or not verify_image_signature(inspection_id, expires, signature):
+            raise HTTPException(status_code=403, detail="Invalid or expired image link")
+        query = {"id": inspection_id}
+    else:
+        query = {"id": inspection_id, "user_id": user["id"]}
+
+    inspection = await inspections_collection.find_one(query, {"_id": 0, "image": 1, "image_base64": 1})
+    if not inspection:
+        raise HTTPException(status_code=404, detail="Inspection not found")
+
+    image = inspection.get("image")
+    if not image:
+        # Legacy record with the image stored inline
+        image_bytes = await load_inspection_image(inspection)
+        if image_bytes is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+        image = {
+            "sha256": hashlib.sha256(image_bytes).hexdigest(),
+            "size": len(image_bytes),
+            "content_type": detect_content_type(image_bytes)
+        }
+
+    etag = f'"{image["sha256"]}"'
+    headers = {
+        "ETag": etag,
+        # Content-addressed, so the bytes behind this URL never change
+        "Cache-Control": "private, max-age=31536000, immutable"
+    }
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    if inspection.get("image"):
+        headers["Content-Length"] = str(image["size"])
+        return StreamingResponse(
+            blob_store.iter_chunks(image["sha256"]), media_type=image["content_type"], headers=headers
+        )
+    return Response(content=image_bytes, media_type=image["content_type"], headers=headers)
 
 @app.get("/api/inspections")
-async def get_inspections():
-    """Fetches all inspections for the current user."""
+async def get_inspections(
+    request: Request,
+    response: Response,
+    limit: int = Query(INSPECTIONS_PAGE_SIZE, ge=1, le=INSPECTIONS_MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """Fetches a page of inspections for the current user, newest first.
+
+    Pass the X-Next-Cursor response header back as `after` to get the next page.
+    `fields` is a comma-separated projection; images are only included if listed.
+    """
     try:
         # Bypass authentication for demo - use demo user
         demo_user = {
@@ -891,9 +2409,17 @@ async def get_inspections():
             "picture": "https://via.placeholder.com/150"
         }
         print(f"Attempting to get inspections for user: {demo_user['id']}")
-        result = await _get_mongo_inspections({"user_id": demo_user["id"]})
+        result, next_cursor = await _get_mongo_inspections(
+            {"user_id": demo_user["id"]}, limit=limit, after=after, fields=fields
+        )
         print(f"Successfully retrieved {len(result)} inspections")
+        if next_cursor:
+            next_url = request.url.include_query_params(after=next_cursor, limit=limit)
+            response.headers["X-Next-Cursor"] = next_cursor
+            response.headers["Link"] = f'<{next_url}>; rel="next"'
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in get_inspections: {str(e)}")
         import traceback
@@ -915,92 +2441,243 @@ async def get_due_inspections():
             "user_id": demo_user["id"],
             "due_date": {"$lte": due_date_threshold}
         }
-        return await _get_mongo_inspections(query)
+        inspections, _ = await _get_mongo_inspections(query)
+        return inspections
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+@app.get("/api/inspections/summary")
+async def get_inspections_summary():
+    """Counts over all of the user's inspections, for dashboards that only load the first page."""
+    try:
+        # Bypass authentication for demo - use demo user
+        demo_user = {
+            "id": "demo-user",
+            "email": "demo@example.com"
+        }
+        query = {"user_id": demo_user["id"]}
+        now = datetime.utcnow()
+        month_start = datetime(now.year, now.month, 1)
+        total = await inspections_collection.count_documents(query)
+        this_month = await inspections_collection.count_documents({**query, "inspection_date": {"$gte": month_start}})
+        locations = await inspections_collection.aggregate([
+            {"$match": query},
+            {"$group": {"_id": "$location"}},
+            {"$count": "count"}
+        ]).to_list(length=1)
+        return {
+            "total": total,
+            "this_month": this_month,
+            "locations": locations[0]["count"] if locations else 0
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@app.get("/api/inspections/near")
+async def get_inspections_near(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(200, gt=0),
+    limit: int = Query(INSPECTIONS_PAGE_SIZE, ge=1, le=INSPECTIONS_MAX_PAGE_SIZE),
+    fields: Optional[str] = None
+):
+    """Inspections within `radius` metres of a point, nearest first, with `distance_m`.
+
+    Uses the 2dsphere index on location_point (see create_database_indexes.py).
+    """
+    try:
+        # Bypass authentication for demo - use demo user
+        demo_user = {
+            "id": "demo-user",
+            "email": "demo@example.com"
+        }
+        if radius > NEAR_MAX_RADIUS_M:
+            raise HTTPException(status_code=400, detail=f"radius may be at most {NEAR_MAX_RADIUS_M:g} metres")
+
+        query = {
+            "user_id": demo_user["id"],
+            "location_point": {"$nearSphere": {
+                "$geometry": {"type": "Point", "coordinates": [lng, lat]},
+                "$maxDistance": radius
+            }}
+        }
+        projection = inspection_projection(fields)
+        if fields:
+            projection["location_point"] = 1
+        inspections = await inspections_collection.find(query, projection).limit(limit).to_list(length=None)
+
+        for item in inspections:
+            point_lng, point_lat = item["location_point"]["coordinates"]
+            item["distance_m"] = round(geo.haversine_m(lat, lng, point_lat, point_lng), 1)
+            format_inspection_item(item)
+        return inspections
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in get_inspections_near: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@app.get("/api/inspections/bbox")
+async def get_inspections_in_bbox(
+    request: Request,
+    response: Response,
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lng: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lng: float = Query(..., ge=-180, le=180),
+    limit: int = Query(INSPECTIONS_PAGE_SIZE, ge=1, le=INSPECTIONS_MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """Inspections inside a map viewport, newest first, paginated like GET /api/inspections.
+
+    A box crossing the antimeridian is given with min_lng > max_lng. Box edges are
+    great-circle arcs, so very large viewports are approximate near their top and bottom.
+    """
+    try:
+        # Bypass authentication for demo - use demo user
+        demo_user = {
+            "id": "demo-user",
+            "email": "demo@example.com"
+        }
+        if min_lat >= max_lat:
+            raise HTTPException(status_code=400, detail="min_lat must be less than max_lat")
+        if min_lng == max_lng:
+            raise HTTPException(status_code=400, detail="min_lng and max_lng must differ")
+
+        # GeoJSON polygons must stay under a hemisphere, so split wide boxes into strips
+        if min_lng > max_lng:
+            spans = [(min_lng, 180.0), (-180.0, max_lng)]
+        else:
+            spans = [(min_lng, max_lng)]
+        boxes = []
+        for west, east in spans:
+            edges = [west + (east - west) * step / 4 for step in range(5)] if east - west >= 180 else [west, east]
+            boxes.extend(zip(edges, edges[1:]))
+        polygons = [
+            {"location_point": {"$geoWithin": {"$geometry": {"type": "Polygon", "coordinates": [[
+                [west, min_lat], [east, min_lat], [east, max_lat], [west, max_lat], [west, min_lat]
+            ]]}}}}
+            for west, east in boxes
+        ]
+        query = {"user_id": demo_user["id"], **(polygons[0] if len(polygons) == 1 else {"$or": polygons})}
+
+        result, next_cursor = await _get_mongo_inspections(query, limit=limit, after=after, fields=fields)
+        if next_cursor:
+            next_url = request.url.include_query_params(after=next_cursor, limit=limit)
+            response.headers["X-Next-Cursor"] = next_cursor
+            response.headers["Link"] = f'<{next_url}>; rel="next"'
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in get_inspections_in_bbox: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+def format_site(site: dict) -> dict:
+    """JSON-friendly site document for the sites endpoints (in place)."""
+    site.pop("_id", None)
+    for field in ("name_key", "service_company_keys", "equipment_keys", "location_samples"):
+        site.pop(field, None)
+    site["pending_notifications"] = len(site.pop("pending_inspection_ids", None) or [])
+    if site.get("location"):
+        lng, lat = site["location"]["coordinates"]
+        site["gps_data"] = {"latitude": lat, "longitude": lng}
+    for date_field in ("created_at", "last_inspection_at", "digest_due_at"):
+        if isinstance(site.get(date_field), datetime):
+            site[date_field] = site[date_field].isoformat()
+    return site
+
+@app.get("/api/sites")
+async def get_sites(limit: int = Query(INSPECTIONS_PAGE_SIZE, ge=1, le=INSPECTIONS_MAX_PAGE_SIZE)):
+    """Site clusters (one lead per building/customer), most recently inspected first."""
+    try:
+        # Bypass authentication for demo - use demo user
+        demo_user = {
+            "id": "demo-user",
+            "email": "demo@example.com"
+        }
+        sites = await sites_collection.find({"user_id": demo_user["id"]}).sort(
+            [("last_inspection_at", -1)]
+        ).limit(limit).to_list(length=None)
+        return [format_site(site) for site in sites]
+    except Exception as e:
+        print(f"Error in get_sites: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@app.get("/api/sites/{site_id}")
+async def get_site(site_id: str, fields: Optional[str] = None):
+    """A site cluster with its inspections, newest first."""
+    try:
+        # Bypass authentication for demo - use demo user
+        demo_user = {
+            "id": "demo-user",
+            "email": "demo@example.com"
+        }
+        site = await sites_collection.find_one({"id": site_id, "user_id": demo_user["id"]})
+        if not site:
+            raise HTTPException(status_code=404, detail="Site not found")
+        inspections, _ = await _get_mongo_inspections(
+            {"user_id": demo_user["id"], "site_id": site_id}, fields=fields
+        )
+        return {**format_site(site), "inspections": inspections}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in get_site: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
 
 @app.get("/api/places/nearby")
 async def get_nearby_places(lat: float, lng: float, radius: int = 1000):
     """
-    Get nearby businesses using Google Places API based on GPS coordinates.
+    Get nearby businesses based on GPS coordinates.
+    Sites we have already inspected (source "inspections") come first, followed by
+    Google Places results (source "google", or "stub" without an API key), which are cached per geohash cell and radius
+    (see places_client.py). Known sites are still returned when Google is unreachable.
     """
     try:
-        if not GOOGLE_PLACES_API_KEY:
-            # Return mock data if no API key is configured
-            print("⚠️ No Google Places API key configured, returning mock data")
-            return {
-                "success": True,
-                "places": [
-                    {
-                        "name": "ABC Fire Safety Services",
-                        "address": "123 Safety St, Business District",
-                        "rating": 4.5,
-                        "place_id": "mock_place_1",
-                        "types": ["fire_safety", "business"]
-                    },
-                    {
-                        "name": "Professional Fire Protection",
-                        "address": "456 Protection Ave, Industrial Area", 
-                        "rating": 4.2,
-                        "place_id": "mock_place_2",
-                        "types": ["fire_safety", "business"]
-                    },
-                    {
-                        "name": "Metro Business Center",
-                        "address": "789 Commerce Blvd, Downtown",
-                        "rating": 4.0,
-                        "place_id": "mock_place_3",
-                        "types": ["business", "office_building"]
-                    }
-                ]
-            }
-        
-        # Google Places Nearby Search API
-        url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
-        params = {
-            'location': f"{lat},{lng}",
-            'radius': radius,
-            'type': 'establishment',  # General business establishments
-            'key': GOOGLE_PLACES_API_KEY
-        }
-        
-        response = requests.get(url, params=params)
-        
-        if response.status_code != 200:
-            print(f"❌ Google Places API error: {response.status_code}")
-            raise HTTPException(status_code=500, detail="Google Places API error")
-        
-        data = response.json()
-        
-        if data.get('status') != 'OK':
-            print(f"❌ Google Places API status: {data.get('status')}")
-            if data.get('status') == 'ZERO_RESULTS':
-                return {"success": True, "places": []}
-            raise HTTPException(status_code=500, detail=f"Google Places API: {data.get('status')}")
-        
-        # Process and filter results
-        places = []
-        for place in data.get('results', []):
-            if place.get('business_status') == 'OPERATIONAL':
-                places.append({
-                    "name": place.get('name', 'Unknown Business'),
-                    "address": place.get('vicinity', 'Address not available'),
-                    "rating": place.get('rating', 0),
-                    "place_id": place.get('place_id'),
-                    "types": place.get('types', [])
+        known_places = []
+        if SITE_INDEX_ENABLED:
+            for site in site_index.nearby(lat, lng, radius):
+                known_places.append({
+                    "name": site["name"],
+                    "address": site["address"] or "Previously inspected site",
+                    "rating": None,
+                    "place_id": f"site:{site['id']}",
+                    "types": ["inspected_site"],
+                    "source": "inspections",
+                    "distance_m": site["distance_m"],
+                    "inspection_count": site["inspection_count"],
+                    "last_inspected_at": site["last_inspected_at"]
                 })
-        
-        # Sort by rating (highest first) and limit to top 10
-        places.sort(key=lambda x: x['rating'], reverse=True)
+        if known_places and SITE_INDEX_MODE == "replace":
+            print(f"✅ Found {len(known_places)} known sites nearby")
+            return {"success": True, "places": known_places}
+
+        try:
+            google_places = await places_client.nearby(lat, lng, radius)
+        except PlacesError:
+            if not known_places:
+                raise
+            print(f"⚠️ Places provider unavailable, returning {len(known_places)} known sites")
+            return {"success": True, "places": known_places}
+
+        known_names = {normalize_business_name(place["name"]) for place in known_places}
+        places = known_places + [
+            {**place, "source": places_client.provider.name}
+            for place in google_places
+            if normalize_business_name(place["name"]) not in known_names
+        ]
         places = places[:10]
-        
-        print(f"✅ Found {len(places)} nearby businesses")
+
+        print(f"✅ Found {len(places)} nearby businesses ({len(known_places)} known sites)")
         return {"success": True, "places": places}
-        
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Network error calling Google Places API: {str(e)}")
-        raise HTTPException(status_code=500, detail="Network error accessing Google Places API")
+
+    except PlacesError as e:
+        raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         print(f"❌ Error in get_nearby_places: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1009,6 +2686,30 @@ async def get_nearby_places(lat: float, lng: float, radius: int = 1000):
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Operational counters for the analysis pipeline."""
+    return {
+        "analysis_cache": analysis_cache.stats(),
+        "layer_cache": layer_cache.stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "llm_retries": llm_retry_policy.stats(),
+        "model_routing": model_router.stats(),
+        "tag_gate": {"enabled": TAG_GATE_ENABLED, **tag_gate_stats},
+        "tag_date_parser": {"enabled": TAG_DATE_PARSER_ENABLED, **tag_date_stats},
+        "ocr": {
+            "engine": "tesseract" if ocr_engine.use_local_ocr() else "llm",
+            **ocr_stats,
+            "local_avg_ms": ocr_stats["local_total_ms"] // ocr_stats["local_runs"] if ocr_stats["local_runs"] else 0
+        },
+        "webhooks": await webhook_outbox.stats(),
+        "places": places_client.stats(),
+        "site_index": {"enabled": SITE_INDEX_ENABLED, "mode": SITE_INDEX_MODE, **site_index.stats()},
+        "site_clusters": {"enabled": SITE_CLUSTERING_ENABLED, "webhook_mode": SITE_WEBHOOK_MODE, **site_clusterer.stats()},
+        "near_duplicates": near_duplicate_finder.stats(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
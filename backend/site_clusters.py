@@ -0,0 +1,203 @@
+"""Incremental clustering of inspections into sites (one building / customer).
+
+Each analyzed inspection is assigned to a site in the `sites` collection, or
+starts a new one. Matching runs in this order:
+
+1. equipment: an equipment number (AE/HE/EE/FE) already seen at a site of the user
+   that does not carry a different business name
+2. nearby: candidates from a 2dsphere `$nearSphere` query within `max_distance_m`,
+   nearest first. A candidate matches on the same normalized business name, or,
+   when either side has no name, on the same service company or a distance
+   within `gps_only_distance_m`. Two different names never merge.
+3. name: without GPS, a site of the user with the same normalized business name
+
+Sites keep a running-mean location, the equipment numbers and service companies
+seen there, and the inspections waiting for the next per-site digest
+notification. Assignment is serialized per process so that two photos of a new
+building taken together do not start two sites.
+"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+import geo
+from site_index import normalize_business_name
+
+CANDIDATE_LIMIT = 20
+
+
+def _known(value) -> bool:
+    return isinstance(value, str) and value.strip() != "" and value.strip().lower() not in ("unknown", "n/a", "null")
+
+
+def equipment_keys(analysis: Dict[str, Any]) -> List[str]:
+    """Normalized "field:NUMBER" keys for the equipment numbers read from a tag."""
+    numbers = analysis.get("equipment_numbers") or {}
+    if not isinstance(numbers, dict):
+        return []
+    return sorted(
+        f"{field}:{''.join(str(value).upper().split())}"
+        for field, value in numbers.items()
+        if _known(value)
+    )
+
+
+def service_company_name(analysis: Dict[str, Any]) -> Optional[str]:
+    company = analysis.get("service_company") or {}
+    name = company.get("name") if isinstance(company, dict) else None
+    return name.strip() if _known(name) else None
+
+
+class SiteClusterer:
+    """Assigns inspections to site clusters stored in Mongo."""
+
+    def __init__(self, collection, max_distance_m: float = 150, gps_only_distance_m: float = 40):
+        self.collection = collection
+        self.max_distance_m = max_distance_m
+        self.gps_only_distance_m = gps_only_distance_m
+        self._lock = asyncio.Lock()
+        self.created = 0
+        self.matched = {"equipment": 0, "nearby": 0, "name": 0}
+        self.unassigned = 0
+        self.digests_claimed = 0
+
+    async def _match(self, user_id: str, point, name_key: str, company_key: str, keys: List[str]):
+        """Returns (site, rule) for the best matching site, or (None, None)."""
+        if keys:
+            site = await self.collection.find_one({"user_id": user_id, "equipment_keys": {"$in": keys}})
+            # Short equipment numbers can repeat across customers; a different name wins
+            if site and not (name_key and site.get("name_key") and site["name_key"] != name_key):
+                return site, "equipment"
+
+        if point:
+            cursor = self.collection.find({
+                "user_id": user_id,
+                "location": {"$nearSphere": {"$geometry": point, "$maxDistance": self.max_distance_m}}
+            }).limit(CANDIDATE_LIMIT)
+            async for site in cursor:
+                site_name = site.get("name_key")
+                if name_key and site_name:
+                    if name_key == site_name:
+                        return site, "nearby"
+                    continue
+                if company_key and company_key in site.get("service_company_keys", []):
+                    return site, "nearby"
+                if site.get("location") and self._distance_m(point, site["location"]) <= self.gps_only_distance_m:
+                    return site, "nearby"
+            return None, None
+
+        if name_key:
+            site = await self.collection.find_one(
+                {"user_id": user_id, "name_key": name_key}, sort=[("last_inspection_at", -1)]
+            )
+            if site:
+                return site, "name"
+        return None, None
+
+    @staticmethod
+    def _distance_m(point_a, point_b) -> float:
+        lng_a, lat_a = point_a["coordinates"]
+        lng_b, lat_b = point_b["coordinates"]
+        return geo.haversine_m(lat_a, lng_a, lat_b, lng_b)
+
+    async def assign(self, inspection: Dict[str, Any], analysis: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Adds an inspection to its site (creating it if needed).
+
+        Returns {"site", "created", "rule"}, or None when the inspection has no GPS, business
+        name or equipment number to cluster on.
+        """
+        user_id = inspection["user_id"]
+        point = inspection.get("location_point")
+        name = (inspection.get("business_name") or "").strip()
+        name_key = normalize_business_name(name)
+        company = service_company_name(analysis)
+        company_key = normalize_business_name(company) if company else ""
+        keys = equipment_keys(analysis)
+        if not point and not name_key and not keys:
+            self.unassigned += 1
+            return None
+
+        now = datetime.utcnow()
+        async with self._lock:
+            site, rule = await self._match(user_id, point, name_key, company_key, keys)
+            if site is None:
+                site = {
+                    "id": str(uuid.uuid4()),
+                    "user_id": user_id,
+                    "name": name or None,
+                    "name_key": name_key or None,
+                    "location_samples": 1 if point else 0,
+                    "equipment_keys": keys,
+                    "service_companies": [company] if company else [],
+                    "service_company_keys": [company_key] if company_key else [],
+                    "inspection_count": 1,
+                    "first_inspection_id": inspection["id"],
+                    "created_at": now,
+                    "last_inspection_at": now
+                }
+                if point:
+                    site["location"] = point
+                await self.collection.insert_one(site)
+                site.pop("_id", None)
+                self.created += 1
+                return {"site": site, "created": True, "rule": "new"}
+
+            update: Dict[str, Any] = {
+                "$inc": {"inspection_count": 1},
+                "$set": {"last_inspection_at": now},
+                "$addToSet": {"equipment_keys": {"$each": keys}}
+            }
+            if company:
+                update["$addToSet"]["service_companies"] = company
+                update["$addToSet"]["service_company_keys"] = company_key
+            if name_key and not site.get("name_key"):
+                update["$set"].update({"name": name, "name_key": name_key})
+            if point:
+                # Running mean of the GPS fixes seen at the site
+                samples = site.get("location_samples", 0)
+                if site.get("location") and samples:
+                    lng, lat = site["location"]["coordinates"]
+                    new_lng, new_lat = point["coordinates"]
+                    lng += (new_lng - lng) / (samples + 1)
+                    lat += (new_lat - lat) / (samples + 1)
+                    update["$set"]["location"] = {"type": "Point", "coordinates": [lng, lat]}
+                else:
+                    update["$set"]["location"] = point
+                update["$inc"]["location_samples"] = 1
+            site = await self.collection.find_one_and_update(
+                {"id": site["id"]}, update, projection={"_id": 0}, return_document=ReturnDocument.AFTER
+            )
+            self.matched[rule] += 1
+            return {"site": site, "created": False, "rule": rule}
+
+    async def queue_digest(self, site_id: str, inspection_id: str, delay: timedelta):
+        """Adds an inspection to the site's next digest, due `delay` after the first pending one."""
+        await self.collection.update_one(
+            {"id": site_id},
+            {"$push": {"pending_inspection_ids": inspection_id}, "$min": {"digest_due_at": datetime.utcnow() + delay}}
+        )
+
+    async def claim_due_digest(self) -> Optional[Dict[str, Any]]:
+        """Atomically takes one site whose digest is due; returns it with its pending inspection ids."""
+        site = await self.collection.find_one_and_update(
+            {"digest_due_at": {"$lte": datetime.utcnow()}},
+            {"$set": {"pending_inspection_ids": []}, "$unset": {"digest_due_at": ""}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE
+        )
+        if site:
+            self.digests_claimed += 1
+        return site
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sites_created": self.created,
+            "matched": self.matched,
+            "unassigned": self.unassigned,
+            "digests_claimed": self.digests_claimed,
+            "max_distance_m": self.max_distance_m,
+            "gps_only_distance_m": self.gps_only_distance_m
+        }
@@ -0,0 +1,144 @@
+"""In-process spatial index of sites we have already inspected.
+
+Every inspection that carries `gps_data` and a `business_name` contributes to a
+known site: inspections of the same (normalized) business within
+`merge_distance_m` of an existing site are folded into it, moving its position
+to the running mean. Sites are bucketed by geohash at every precision from
+MIN_PRECISION to `precision`, so a radius query only looks at the nine cells
+around the point at the precision matching the radius and then filters by
+great-circle distance, without a database or network round trip.
+"""
+import re
+import uuid
+from typing import Any, Dict, List, Optional, Set
+
+import geo
+
+MIN_PRECISION = 3
+LEGAL_SUFFIXES = {"inc", "incorporated", "llc", "ltd", "limited", "co", "corp", "corporation", "company", "the"}
+
+
+def normalize_business_name(name: Optional[str]) -> str:
+    """Lowercase, punctuation-free business name without legal suffixes ("The ABC Co." -> "abc")."""
+    words = re.sub(r"[^a-z0-9&]+", " ", (name or "").lower().replace("'", "")).split()
+    kept = [word for word in words if word not in LEGAL_SUFFIXES]
+    return " ".join(kept or words)
+
+
+class SiteIndex:
+    """Geohash-bucketed index of known sites built from inspection records."""
+
+    def __init__(self, precision: int = 7, merge_distance_m: float = 150):
+        self.precision = max(MIN_PRECISION, precision)
+        self.merge_distance_m = merge_distance_m
+        self.sites: Dict[str, Dict[str, Any]] = {}
+        self._buckets: Dict[str, Set[str]] = {}
+        self.queries = 0
+
+    def _cells(self, site: Dict[str, Any]) -> List[str]:
+        geohash = geo.encode(site["lat"], site["lng"], self.precision)
+        return [geohash[:length] for length in range(MIN_PRECISION, self.precision + 1)]
+
+    def _bucket(self, site_id: str):
+        for cell in self._cells(self.sites[site_id]):
+            self._buckets.setdefault(cell, set()).add(site_id)
+
+    def _unbucket(self, site_id: str):
+        for cell in self._cells(self.sites[site_id]):
+            bucket = self._buckets.get(cell)
+            if bucket is not None:
+                bucket.discard(site_id)
+                if not bucket:
+                    del self._buckets[cell]
+
+    def _candidates(self, lat: float, lng: float, radius_m: float) -> Set[str]:
+        precision = max(MIN_PRECISION, min(self.precision, geo.precision_for_radius(radius_m, lat)))
+        site_ids = set()
+        for cell in geo.neighbors(geo.encode(lat, lng, precision)):
+            site_ids |= self._buckets.get(cell, set())
+        return site_ids
+
+    def _match(self, key: str, lat: float, lng: float) -> Optional[str]:
+        for site_id in self._candidates(lat, lng, self.merge_distance_m):
+            site = self.sites[site_id]
+            if site["key"] == key and geo.haversine_m(lat, lng, site["lat"], site["lng"]) <= self.merge_distance_m:
+                return site_id
+        return None
+
+    def add(self, inspection: Dict[str, Any]) -> Optional[str]:
+        """Adds an inspection to its site; returns the site id, or None without usable GPS/name."""
+        key = normalize_business_name(inspection.get("business_name"))
+        try:
+            lat, lng = geo.parse_point(inspection.get("gps_data"))
+        except (KeyError, TypeError, ValueError):
+            return None
+        if not key:
+            return None
+
+        site_id = self._match(key, lat, lng)
+        if site_id is None:
+            site_id = str(uuid.uuid4())
+            self.sites[site_id] = {
+                "id": site_id,
+                "key": key,
+                "name": inspection["business_name"],
+                "address": inspection.get("location"),
+                "lat": lat,
+                "lng": lng,
+                "inspection_count": 1,
+                "last_inspected_at": inspection.get("created_at")
+            }
+            self._bucket(site_id)
+            return site_id
+
+        site = self.sites[site_id]
+        self._unbucket(site_id)
+        count = site["inspection_count"] + 1
+        site["lat"] += (lat - site["lat"]) / count
+        site["lng"] += (lng - site["lng"]) / count
+        site["inspection_count"] = count
+        created_at = inspection.get("created_at")
+        if created_at and (site["last_inspected_at"] is None or created_at > site["last_inspected_at"]):
+            site["last_inspected_at"] = created_at
+            site["name"] = inspection["business_name"]
+            site["address"] = inspection.get("location") or site["address"]
+        self._bucket(site_id)
+        return site_id
+
+    def remove(self, inspection: Dict[str, Any]):
+        """Takes a deleted inspection out of its site, dropping the site with its last inspection."""
+        key = normalize_business_name(inspection.get("business_name"))
+        try:
+            lat, lng = geo.parse_point(inspection.get("gps_data"))
+        except (KeyError, TypeError, ValueError):
+            return
+        site_id = self._match(key, lat, lng) if key else None
+        if site_id is None:
+            return
+        site = self.sites[site_id]
+        if site["inspection_count"] <= 1:
+            self._unbucket(site_id)
+            del self.sites[site_id]
+        else:
+            site["inspection_count"] -= 1
+
+    def nearby(self, lat: float, lng: float, radius_m: float, limit: int = 10) -> List[Dict[str, Any]]:
+        """Known sites within `radius_m`, nearest first, with `distance_m`."""
+        self.queries += 1
+        results = []
+        for site_id in self._candidates(lat, lng, radius_m):
+            site = self.sites[site_id]
+            distance = geo.haversine_m(lat, lng, site["lat"], site["lng"])
+            if distance <= radius_m:
+                results.append({**site, "distance_m": round(distance, 1)})
+        results.sort(key=lambda x: x["distance_m"])
+        return results[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sites": len(self.sites),
+            "buckets": len(self._buckets),
+            "precision": self.precision,
+            "merge_distance_m": self.merge_distance_m,
+            "queries": self.queries
+        }
@@ -0,0 +1,156 @@
+"""Rule-based extraction of the inspection date from OCR text.
+
+Printed or stamped tags usually carry the date in a handful of layouts
+("03/15/2024", "MAR 2024", "15 MARCH 2024", "03/24", "2024-03-15"). When the
+OCR layer already returned such text, the three date layers do not need a
+model call. `parse_tag_date` only answers when it is confident: every date it
+finds must agree and must validate as a real, non-future date; otherwise it
+returns None and the caller falls back to the model layers.
+
+Tags also carry weights, model numbers and phone numbers that look like dates
+("5/20 LB", "Model 2.5.20", "555-12-2024"). Matches next to such labels or
+inside a longer run of digits are ignored, and dates with a two-digit year
+(including the short "03/24" form) only count after a date word such as
+"INSP", "DATE", "SERVICED" or a month name.
+"""
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+PARSER_VERSION = "2"
+MIN_YEAR = 1990
+TWO_DIGIT_YEAR_WINDOW = 10
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12
+}
+MONTH_NAME = r"(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sept?(?:ember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?"
+YEAR4 = r"((?:19|20)\d{2})"
+YEAR = r"((?:19|20)?\d{2})"
+
+# (pattern, groups) where groups names the meaning of each capture group in order
+PATTERNS: List[Tuple[re.Pattern, Tuple[str, ...]]] = [
+    (re.compile(r"\b" + YEAR4 + r"[-/.](\d{1,2})[-/.](\d{1,2})\b"), ("year", "month", "day")),
+    (re.compile(r"\b(\d{1,2})[-/.](\d{1,2})[-/.]" + YEAR + r"\b"), ("month", "day", "year")),
+    (re.compile(r"\b" + MONTH_NAME + r"\s+(\d{1,2})(?:st|nd|rd|th)?,?\s+'?" + YEAR + r"\b"), ("month_name", "day", "year")),
+    (re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)?\s+" + MONTH_NAME + r",?\s+'?" + YEAR + r"\b"), ("day", "month_name", "year")),
+    (re.compile(r"\b" + MONTH_NAME + r"[\s,/-]+'?" + YEAR + r"\b"), ("month_name", "year")),
+    (re.compile(r"\b(\d{1,2})[-/.]" + YEAR4 + r"\b"), ("month", "year")),
+    (re.compile(r"\b(\d{1,2})/(\d{2})\b(?![-/.]\d)"), ("month", "year")),
+]
+
+PUNCH_WORDS = re.compile(r"punch\w*|holes?")
+PUNCH_WINDOW = 40
+GRID_MONTHS = 3
+MONTH_WORD = re.compile(r"\b" + MONTH_NAME + r"\b")
+YEAR_WORD = re.compile(r"\b" + YEAR4 + r"\b")
+
+DATE_WORDS = re.compile(r"\b(?:insp\w*|dated?|serviced|svc|recharged?|month)\b|" + MONTH_WORD.pattern)
+DATE_WORD_WINDOW = 30
+# Labels whose numbers are not dates: "5/20 LB", "Model 2.5.20", "Phone 555-12-2024", "Tag # 12/18"
+NON_DATE_BEFORE = re.compile(r"(?:\b(?:lbs?|kg|model|mod|phone|ph|tel|fax|serial|s/n)\b|#)\W{0,3}$")
+NON_DATE_AFTER = re.compile(r"^\s*(?:lbs?|kg)\b")
+DIGIT_RUN_BEFORE = re.compile(r"\d[-/.]?$")
+DIGIT_RUN_AFTER = re.compile(r"^[-/.]?\d")
+
+
+def _year(value: str) -> int:
+    year = int(value)
+    return year + 2000 if year < 100 else year
+
+
+def _candidate(groups: Tuple[str, ...], values: Tuple[str, ...]) -> Optional[Tuple[int, int, Optional[int]]]:
+    fields = dict(zip(groups, values))
+    try:
+        year = _year(fields["year"])
+        month = MONTHS[fields["month_name"][:3]] if "month_name" in fields else int(fields["month"])
+        day = int(fields["day"]) if "day" in fields else None
+    except (KeyError, ValueError):
+        return None
+
+    now = datetime.utcnow()
+    if not MIN_YEAR <= year <= now.year or not 1 <= month <= 12:
+        return None
+    # Two-digit years are easily confused with other numbers (e.g. "5/10 LB"); keep them recent
+    if len(fields["year"]) == 2 and year < now.year - TWO_DIGIT_YEAR_WINDOW:
+        return None
+    try:
+        parsed = datetime(year, month, day or 1)
+    except ValueError:
+        return None
+    if parsed > now:
+        return None
+    return year, month, day
+
+
+def _in_date_context(text: str, match: re.Match, groups: Tuple[str, ...]) -> bool:
+    """Rejects date-shaped numbers that belong to a label, a longer number or lack a date word."""
+    before = text[max(0, match.start() - DATE_WORD_WINDOW):match.start()]
+    after = text[match.end():]
+    if NON_DATE_BEFORE.search(before) or NON_DATE_AFTER.search(after):
+        return False
+    if DIGIT_RUN_BEFORE.search(before) or DIGIT_RUN_AFTER.search(after):
+        return False
+    year = match.group(groups.index("year") + 1)
+    if len(year) == 2 and "month_name" not in groups:
+        return bool(DATE_WORDS.search(before))
+    return True
+
+
+def _punched_candidate(text: str) -> Optional[Tuple[int, int, Optional[int]]]:
+    """Punched-grid descriptions: exactly one month name and one year right after "punched"/"hole"."""
+    for marker in PUNCH_WORDS.finditer(text):
+        window = text[marker.end():marker.end() + PUNCH_WINDOW]
+        months = {MONTHS[m.group(1)[:3]] for m in MONTH_WORD.finditer(window)}
+        years = {int(m.group(1)) for m in YEAR_WORD.finditer(window)}
+        if len(months) == 1 and len(years) == 1:
+            return _candidate(("month", "year"), (str(months.pop()), str(years.pop())))
+    return None
+
+
+def parse_tag_date(raw_text: str) -> Optional[Dict[str, str]]:
+    """Returns {"year", "month", "day"?, "pattern"} as strings, or None when not confident.
+
+    "day" is omitted when only a month and year were found (e.g. "MAR 2024", "03/24").
+    """
+    text = (raw_text or "").lower()
+    if not text or text == "unknown":
+        return None
+
+    # Punched holes mark the current inspection; printed grids list every month and year
+    punched = _punched_candidate(text)
+    if punched:
+        return {"year": str(punched[0]), "month": str(punched[1]), "pattern": "punched"}
+
+    # A printed month grid without a readable punch is ambiguous
+    if len({m.group(1)[:3] for m in MONTH_WORD.finditer(text)}) >= GRID_MONTHS:
+        return None
+
+    candidates = []
+    consumed = []
+    for pattern, groups in PATTERNS:
+        for match in pattern.finditer(text):
+            # Skip matches inside a longer date that an earlier pattern already captured
+            if any(start <= match.start() < end for start, end in consumed):
+                continue
+            if not _in_date_context(text, match, groups):
+                continue
+            candidate = _candidate(groups, match.groups())
+            if candidate:
+                candidates.append((candidate, groups))
+                consumed.append(match.span())
+    if not candidates:
+        return None
+
+    # Every date on the tag must agree, otherwise let the model pick the right one
+    full = {c for c, _ in candidates if c[2] is not None}
+    partial = {c[:2] for c, _ in candidates}
+    if len(partial) != 1 or len(full) > 1:
+        return None
+
+    year, month, day = full.pop() if full else (*partial.pop(), None)
+    result = {"year": str(year), "month": str(month), "pattern": "+".join(sorted({"/".join(g) for _, g in candidates}))}
+    if day is not None:
+        result["day"] = str(day)
+    return result
@@ -0,0 +1,12 @@
+"""Shared pytest setup: backend modules are imported by bare name, like server.py does."""
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# server.py reads its configuration at import time; tests never reach these services
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "fire_inspection_test")
+os.environ.setdefault("OPENROUTER_API_KEY", "test-key")
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
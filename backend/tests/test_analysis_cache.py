@@ -0,0 +1,103 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from analysis_cache import AnalysisCache, LRUCache
+
+
+class FakeCacheCollection:
+    """The two calls AnalysisCache makes on its Mongo collection."""
+
+    def __init__(self):
+        self.docs = {}
+        self.lookups = 0
+
+    async def find_one(self, query, projection=None):
+        self.lookups += 1
+        doc = self.docs.get(query["key"])
+        if doc is None or doc["expires_at"] <= query["expires_at"]["$gt"]:
+            return None
+        return {field: doc[field] for field in ("analysis", "engine", "model_calls", "expires_at")}
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs[query["key"]] = dict(update["$set"])
+
+
+ANALYSIS = {"raw_text_analysis": "ANNUAL INSP", "condition": "Good"}
+
+
+def test_key_covers_image_model_prompt_version_and_engine():
+    key = AnalysisCache.make_key("digest-1", "model-a", "v1", "layered")
+    assert key == AnalysisCache.make_key("digest-1", "model-a", "v1", "layered")
+    assert key != AnalysisCache.make_key("digest-2", "model-a", "v1", "layered")
+    assert key != AnalysisCache.make_key("digest-1", "model-b", "v1", "layered")
+    assert key != AnalysisCache.make_key("digest-1", "model-a", "v2", "layered")
+    assert key != AnalysisCache.make_key("digest-1", "model-a", "v1", "fused")
+
+
+def test_memory_hit_returns_a_copy_and_counts_saved_calls():
+    cache = AnalysisCache(FakeCacheCollection())
+
+    async def run():
+        await cache.set("k", ANALYSIS, "layered", 9)
+        first = await cache.get("k")
+        first["analysis"]["condition"] = "Poor"
+        return await cache.get("k")
+
+    entry = asyncio.run(run())
+    assert entry == {"analysis": ANALYSIS, "engine": "layered", "model_calls": 9}
+    assert cache.memory_hits == 2
+    assert cache.model_calls_saved == 18
+
+
+def test_mongo_hit_fills_memory():
+    collection = FakeCacheCollection()
+    writer, reader = AnalysisCache(collection), AnalysisCache(collection)
+
+    async def run():
+        await writer.set("k", ANALYSIS, "fused", 1)
+        await reader.get("k")
+        await reader.get("k")
+
+    asyncio.run(run())
+    assert (reader.mongo_hits, reader.memory_hits) == (1, 1)
+    assert collection.lookups == 1
+
+
+def test_memory_entries_expire_with_the_ttl():
+    collection = FakeCacheCollection()
+    cache = AnalysisCache(collection, ttl_days=30)
+
+    async def run():
+        await cache.set("k", ANALYSIS, "layered", 9)
+        # Age both copies past the TTL
+        expired = datetime.utcnow() - timedelta(seconds=1)
+        cache.memory.set("k", (expired, cache.memory.get("k")[1]))
+        collection.docs["k"]["expires_at"] = expired
+        return await cache.get("k")
+
+    assert asyncio.run(run()) is None
+    assert cache.memory_hits == 0
+    assert cache.misses == 1
+    assert len(cache.memory) == 0
+
+
+def test_disabled_cache_never_stores():
+    collection = FakeCacheCollection()
+    cache = AnalysisCache(collection, enabled=False)
+
+    async def run():
+        await cache.set("k", ANALYSIS, "layered", 9)
+        return await cache.get("k")
+
+    assert asyncio.run(run()) is None
+    assert collection.docs == {}
+
+
+def test_lru_evicts_least_recently_used():
+    lru = LRUCache(2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert (lru.get("a"), lru.get("c")) == (1, 3)
@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import itertools
+import os
+from datetime import datetime
+
+import gridfs
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from blob_store import BlobTooLarge, GridFSBlobStore, LocalBlobStore, detect_content_type
+
+PNG = b"\x89PNG\r\n\x1a\n" + os.urandom(2000)
+
+
+async def chunked(data, size=512):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def read_all(store, digest):
+    return b"".join([chunk async for chunk in store.iter_chunks(digest)])
+
+
+def test_detect_content_type():
+    assert detect_content_type(PNG) == "image/png"
+    assert detect_content_type(b"GIF89a") == "image/gif"
+    assert detect_content_type(b"RIFF\x00\x00\x00\x00WEBPVP8") == "image/webp"
+    assert detect_content_type(b"\xff\xd8\xff") == "image/jpeg"
+
+
+def test_local_put_get_and_iter_chunks_round_trip(tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+
+    async def run():
+        ref = await store.put(PNG)
+        return ref, await store.get(ref["sha256"]), await read_all(store, ref["sha256"])
+
+    ref, data, streamed = asyncio.run(run())
+    assert ref == {"sha256": hashlib.sha256(PNG).hexdigest(), "size": len(PNG), "content_type": "image/png"}
+    assert data == PNG
+    assert streamed == PNG
+
+
+def test_local_put_stream_matches_put_and_dedupes(tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+
+    async def run():
+        streamed = await store.put_stream(chunked(PNG))
+        stored = await store.put(PNG)
+        again = await store.put_stream(chunked(PNG, 100))
+        return streamed, stored, again
+
+    streamed, stored, again = asyncio.run(run())
+    assert streamed == stored == again
+    shard = tmp_path / stored["sha256"][:2]
+    assert os.listdir(shard) == [stored["sha256"]]
+    assert os.listdir(tmp_path / "tmp") == []
+
+
+def test_local_concurrent_puts_of_one_image_store_it_once(tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+
+    async def run():
+        return await asyncio.gather(*(store.put(PNG) for _ in range(8)))
+
+    refs = asyncio.run(run())
+    assert len({ref["sha256"] for ref in refs}) == 1
+    assert os.listdir(tmp_path / refs[0]["sha256"][:2]) == [refs[0]["sha256"]]
+
+
+def test_local_put_stream_too_large_removes_the_temp_file(tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+
+    with pytest.raises(BlobTooLarge):
+        asyncio.run(store.put_stream(chunked(PNG), max_bytes=1000))
+    assert os.listdir(tmp_path / "tmp") == []
+    assert sorted(os.listdir(tmp_path)) == ["tmp"]
+
+
+def test_local_get_missing_digest_returns_none(tmp_path):
+    assert asyncio.run(LocalBlobStore(str(tmp_path)).get("0" * 64)) is None
+
+
+class FakeGridOut:
+    def __init__(self, data):
+        self.data = data
+
+    async def read(self, size=-1):
+        chunk, self.data = (self.data, b"") if size < 0 else (self.data[:size], self.data[size:])
+        return chunk
+
+
+class FakeBucket:
+    """The GridFS bucket calls GridFSBlobStore.put makes, over a mongomock files collection."""
+
+    def __init__(self, files):
+        self.files = files
+        self.contents = {}
+        self._ids = itertools.count()
+
+    async def upload_from_stream(self, filename, data, metadata=None):
+        await asyncio.sleep(0)  # let a concurrent put pass its existence check too
+        file_id = next(self._ids)
+        self.contents[file_id] = data
+        await self.files.insert_one({
+            "_id": file_id, "filename": filename, "uploadDate": datetime.utcnow(), "metadata": metadata
+        })
+        await asyncio.sleep(0)
+
+    async def delete(self, file_id):
+        if file_id not in self.contents:
+            raise gridfs.errors.NoFile(file_id)
+        del self.contents[file_id]
+        await self.files.delete_one({"_id": file_id})
+
+    async def open_download_stream_by_name(self, filename, revision=-1):
+        copies = await self.files.find({"filename": filename}).sort([("uploadDate", 1), ("_id", 1)]).to_list(None)
+        if not copies:
+            raise gridfs.errors.NoFile(filename)
+        return FakeGridOut(self.contents[copies[revision]["_id"]])
+
+
+def gridfs_store():
+    store = GridFSBlobStore.__new__(GridFSBlobStore)
+    store.files = AsyncMongoMockClient()["blob_test"]["images.files"]
+    store.bucket = FakeBucket(store.files)
+    return store
+
+
+def test_gridfs_concurrent_puts_keep_one_copy():
+    store = gridfs_store()
+
+    async def run():
+        refs = await asyncio.gather(store.put(PNG), store.put(PNG), store.put(PNG))
+        copies = await store.files.count_documents({"filename": refs[0]["sha256"]})
+        return refs, copies, await store.get(refs[0]["sha256"])
+
+    refs, copies, data = asyncio.run(run())
+    assert len({ref["sha256"] for ref in refs}) == 1
+    assert copies == 1
+    assert data == PNG
+
+
+def test_gridfs_get_missing_digest_returns_none():
+    assert asyncio.run(gridfs_store().get("0" * 64)) is None
@@ -0,0 +1,89 @@
+import asyncio
+import base64
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+VALID = {
+    "raw_text": "ANNUAL INSP ABC FIRE CO 03/15/2024",
+    "year": "2024",
+    "month": "03",
+    "day": "15",
+    "extinguisher_type": "ABC",
+    "condition": "Good",
+    "service_company": {"name": "ABC Fire", "address": "unknown", "phone": "unknown", "website": "unknown"},
+    "equipment_numbers": "unknown",
+    "service_details": {"service_type": "Annual", "additional_services": []}
+}
+
+
+def test_validate_fused_result_normalizes_fields():
+    fields = server.validate_fused_result(json.dumps(VALID))
+    assert fields["year"] == "2024"
+    assert fields["month"] == "3"
+    assert fields["condition"] == "Good"
+    assert json.loads(fields["company_info"])["name"] == "ABC Fire"
+    assert fields["equipment_numbers"] == "unknown"
+    assert fields["raw_text"] == VALID["raw_text"]
+
+
+def test_validate_fused_result_accepts_markdown_block():
+    assert server.validate_fused_result(f"```json\n{json.dumps(VALID)}\n```") is not None
+
+
+@pytest.mark.parametrize("change", [
+    {"month": "13"},
+    {"day": "first"},
+    {"condition": "Excellent"},
+    {"raw_text": "  "},
+    {"service_company": "ABC Fire"},
+])
+def test_validate_fused_result_rejects_invalid_values(change):
+    assert server.validate_fused_result(json.dumps({**VALID, **change})) is None
+
+
+def test_validate_fused_result_rejects_missing_keys_and_non_json():
+    incomplete = {key: value for key, value in VALID.items() if key != "service_details"}
+    assert server.validate_fused_result(json.dumps(incomplete)) is None
+    assert server.validate_fused_result("The tag shows an annual inspection") is None
+    assert server.validate_fused_result("unknown") is None
+
+
+def test_analyze_fused_requests_json_schema(monkeypatch):
+    requests = []
+
+    async def fake_acompletion(**kwargs):
+        requests.append(kwargs)
+        message = SimpleNamespace(content=json.dumps(VALID), reasoning_content=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(server.litellm, "acompletion", fake_acompletion)
+    data_url = "data:image/jpeg;base64," + base64.b64encode(os.urandom(32)).decode()
+    text = asyncio.run(server.analyze_fused(data_url))
+
+    assert server.validate_fused_result(text) is not None
+    response_format = requests[0]["response_format"]
+    assert response_format["type"] == "json_schema"
+    schema = response_format["json_schema"]["schema"]
+    assert set(schema["required"]) == set(VALID)
+
+
+def test_unknown_engine_is_rejected_by_pipeline():
+    with pytest.raises(ValueError):
+        asyncio.run(server.run_analysis_pipeline("data:image/jpeg;base64,", "turbo"))
+
+
+def test_unknown_engine_returns_400():
+    client = TestClient(server.app)
+    response = client.post("/api/inspections", json={
+        "location": "Lobby",
+        "image_base64": base64.b64encode(b"\xff\xd8\xff").decode(),
+        "analysis_engine": "turbo"
+    })
+    assert response.status_code == 400
+    assert "turbo" in response.json()["detail"]
@@ -0,0 +1,230 @@
+import asyncio
+import base64
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from blob_store import LocalBlobStore
+
+
+@pytest.fixture
+def db(monkeypatch):
+    database = AsyncMongoMockClient()["jobs_test"]
+    monkeypatch.setattr(server, "inspections_collection", database["inspections"])
+    monkeypatch.setattr(server, "inspection_batches_collection", database["inspection_batches"])
+    return database
+
+
+@pytest.fixture
+def notifications(monkeypatch):
+    sent = []
+
+    async def fake_send_batch_notification(batch):
+        sent.append(batch["id"])
+
+    monkeypatch.setattr(server, "send_batch_notification", fake_send_batch_notification)
+    return sent
+
+
+def insert_batch(db, inspection_ids):
+    return db["inspection_batches"].insert_one({
+        "id": "batch-1", "inspection_ids": inspection_ids, "total": len(inspection_ids),
+        "remaining": len(inspection_ids), "status": "processing", "created_at": datetime.utcnow()
+    })
+
+
+def test_batch_completes_when_items_are_missing_or_already_done(db, notifications):
+    async def run():
+        await insert_batch(db, ["deleted", "done"])
+        await db["inspections"].insert_one({"id": "done", "batch_id": "batch-1", "status": "analyzed"})
+        await server.process_inspection_job("deleted", "batch-1")
+        await server.process_inspection_job("done", "batch-1")
+        return await db["inspection_batches"].find_one({"id": "batch-1"})
+
+    batch = asyncio.run(run())
+    assert batch["status"] == "complete"
+    assert batch["remaining"] == 0
+    assert notifications == ["batch-1"]
+
+
+def test_batch_item_is_counted_once(db, notifications):
+    async def run():
+        await insert_batch(db, ["a", "b"])
+        await db["inspections"].insert_one({"id": "a", "batch_id": "batch-1", "status": "analyzed"})
+        # A re-queued job runs a second time
+        await server.process_inspection_job("a", "batch-1")
+        await server.process_inspection_job("a")
+        return await db["inspection_batches"].find_one({"id": "batch-1"})
+
+    batch = asyncio.run(run())
+    assert batch["remaining"] == 1
+    assert batch["status"] == "processing"
+    assert notifications == []
+
+
+def test_failed_job_still_counts_down_its_batch(db, notifications, monkeypatch):
+    async def no_image(inspection):
+        return None
+
+    monkeypatch.setattr(server, "load_inspection_image", no_image)
+
+    async def run():
+        await insert_batch(db, ["a"])
+        await db["inspections"].insert_one({
+            "id": "a", "batch_id": "batch-1", "status": "queued", "user_id": "demo-user", "location": "Lobby"
+        })
+        await server.process_inspection_job("a", "batch-1")
+        return (
+            await db["inspections"].find_one({"id": "a"}),
+            await db["inspection_batches"].find_one({"id": "batch-1"})
+        )
+
+    inspection, batch = asyncio.run(run())
+    assert inspection["status"] == "failed"
+    assert batch["status"] == "complete"
+    assert notifications == ["batch-1"]
+
+
+@pytest.mark.parametrize("steps", [0, 1, 9])
+def test_finished_job_reports_full_progress_for_the_path_taken(db, monkeypatch, steps):
+    async def image(inspection):
+        return b"image"
+
+    async def analyze(inspection, image_bytes, engine=None, on_layer=None):
+        # 0: cache hit or near-duplicate, 1: tag gate after OCR, 9: full layered run
+        for layer in ["raw_text", "year", "month", "day", "extinguisher_type", "condition",
+                      "company_info", "equipment_numbers", "service_details"][:steps]:
+            await on_layer(layer, "unknown")
+        return {"raw_text_analysis": "Not fire equipment"}, {"analysis_engine": "layered"}
+
+    async def nothing(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(server, "load_inspection_image", image)
+    monkeypatch.setattr(server, "analyze_or_reuse", analyze)
+    monkeypatch.setattr(server, "cluster_inspection", nothing)
+    monkeypatch.setattr(server, "notify_new_inspection", nothing)
+
+    async def run():
+        await db["inspections"].insert_one({
+            "id": "a", "status": "queued", "user_id": "demo-user", "location": "Lobby",
+            "image": {"sha256": "abc"}
+        })
+        await server.process_inspection_job("a")
+        return await db["inspections"].find_one({"id": "a"})
+
+    job = asyncio.run(run())["job"]
+    assert job["stage"] == "complete"
+    assert job["completed_steps"] == job["total_steps"] == max(1, steps)
+
+
+
+# Captured before the batch_api fixture replaces it with a recorder
+run_inspection_batch = server.run_inspection_batch
+
+
+@pytest.fixture
+def batch_api(db, monkeypatch, tmp_path):
+    """Batch endpoint over a local blob store; the background run is recorded, not scheduled."""
+    started = []
+
+    async def record_batch(batch_id, inspection_ids):
+        started.append((batch_id, inspection_ids))
+
+    async def analyze(inspection, image_bytes, engine=None, on_layer=None):
+        if image_bytes == b"unreadable":
+            raise ValueError("model call failed")
+        return {"raw_text_analysis": "ANNUAL INSP 03/2024", "condition": "Good"}, {"analysis_engine": "layered"}
+
+    async def nothing(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(server, "blob_store", LocalBlobStore(str(tmp_path)))
+    monkeypatch.setattr(server, "run_inspection_batch", record_batch)
+    monkeypatch.setattr(server, "analyze_or_reuse", analyze)
+    monkeypatch.setattr(server, "cluster_inspection", nothing)
+    monkeypatch.setattr(server, "batch_semaphore", asyncio.Semaphore(2))
+    return TestClient(server.app), started
+
+
+def submit_batch(client, images):
+    return client.post("/api/inspections/batch", json={
+        "location": "Lobby",
+        "business_name": "ABC Diner",
+        "images_base64": [base64.b64encode(image).decode("ascii") for image in images]
+    })
+
+
+def batch_statuses(client, batch):
+    status = client.get(batch["status_url"]).json()
+    return status, [item["status"] for item in status["items"]]
+
+
+def test_batch_endpoint_counts_items_down_and_notifies_once(batch_api, notifications):
+    client, started = batch_api
+    response = submit_batch(client, [b"tag-1", b"tag-2", b"tag-3"])
+    assert response.status_code == 202
+    batch = response.json()
+    ids = [item["inspection_id"] for item in batch["items"]]
+    assert [item["status"] for item in batch["items"]] == ["queued"] * 3
+    assert started == [(batch["batch_id"], ids)]
+
+    asyncio.run(server.process_inspection_job(ids[0], batch["batch_id"]))
+    status, items = batch_statuses(client, batch)
+    assert (status["status"], status["completed"], status["total"]) == ("processing", 1, 3)
+    assert items == ["analyzed", "queued", "queued"]
+    assert notifications == []
+
+    # The batch runner goes over every item again; the first one is not counted twice
+    asyncio.run(run_inspection_batch(batch["batch_id"], ids))
+    status, items = batch_statuses(client, batch)
+    assert (status["status"], status["completed"]) == ("complete", 3)
+    assert items == ["analyzed"] * 3
+    assert notifications == [batch["batch_id"]]
+
+
+def test_batch_with_a_failed_item_still_completes(batch_api, notifications):
+    client, _ = batch_api
+    batch = submit_batch(client, [b"tag-1", b"unreadable"]).json()
+    ids = [item["inspection_id"] for item in batch["items"]]
+
+    asyncio.run(run_inspection_batch(batch["batch_id"], ids))
+    status, items = batch_statuses(client, batch)
+    assert (status["status"], status["completed"]) == ("complete", 2)
+    assert items == ["analyzed", "failed"]
+    assert status["items"][1]["error"] == "model call failed"
+    assert notifications == [batch["batch_id"]]
+
+
+def test_batch_notification_summarizes_analyzed_and_failed_items(batch_api, monkeypatch):
+    client, _ = batch_api
+    queued = []
+
+    async def enqueue(payload, event_type=None, image_sha256=None):
+        queued.append((event_type, payload))
+
+    monkeypatch.setattr(server, "N8N_WEBHOOK_URL", "https://n8n.example/webhook")
+    monkeypatch.setattr(server.webhook_outbox, "enqueue", enqueue)
+    batch = submit_batch(client, [b"tag-1", b"unreadable", b"tag-3"]).json()
+    ids = [item["inspection_id"] for item in batch["items"]]
+
+    asyncio.run(run_inspection_batch(batch["batch_id"], ids))
+    assert len(queued) == 1
+    event_type, payload = queued[0]
+    assert event_type == "batch_submitted"
+    assert payload["batch_id"] == batch["batch_id"]
+    assert payload["summary"]["total"] == 3
+    assert payload["summary"]["analyzed"] == 2
+    assert payload["summary"]["failed"] == 1
+    assert [item["inspection_id"] for item in payload["items"]] == ids
+
+
+@pytest.mark.parametrize("count", [0, server.BATCH_MAX_ITEMS + 1])
+def test_batch_endpoint_rejects_empty_or_oversized_batches(batch_api, count):
+    client, started = batch_api
+    response = submit_batch(client, [b"tag"] * count)
+    assert response.status_code == 400
+    assert started == []
@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 3, 1, 12, 30)
+    item_id = ObjectId()
+    query = server.decode_inspection_cursor(server.encode_inspection_cursor({"created_at": created_at, "_id": item_id}))
+    assert query["$or"][0] == {"created_at": {"$lt": created_at}}
+    assert query["$or"][1] == {"created_at": created_at, "_id": {"$lt": item_id}}
+
+
+def test_cursor_without_created_at_pages_by_id():
+    item_id = ObjectId()
+    query = server.decode_inspection_cursor(server.encode_inspection_cursor({"created_at": None, "_id": item_id}))
+    assert query == {"created_at": None, "_id": {"$lt": item_id}}
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "e30=", "eyJjIjogbnVsbCwgImkiOiAieCJ9"])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        server.decode_inspection_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_pages_cover_every_inspection_once(monkeypatch):
+    collection = AsyncMongoMockClient()["list_test"]["inspections"]
+    monkeypatch.setattr(server, "inspections_collection", collection)
+    start = datetime(2025, 1, 1)
+
+    async def run():
+        # Two records share a timestamp so the _id tie-break is exercised
+        await collection.insert_many([
+            {"id": f"i{n}", "user_id": "demo-user", "created_at": start + timedelta(minutes=n // 2)}
+            for n in range(7)
+        ])
+        seen, after = [], None
+        while True:
+            page, after = await server._get_mongo_inspections({"user_id": "demo-user"}, limit=3, after=after)
+            seen.extend(item["id"] for item in page)
+            if not after:
+                return seen
+
+    seen = asyncio.run(run())
+    assert sorted(seen) == [f"i{n}" for n in range(7)]
+    assert len(seen) == 7
+
+
+def test_projection_keeps_cursor_fields():
+    projection = server.inspection_projection("location, gps_data.latitude")
+    assert projection["location"] == 1
+    assert projection["gps_data.latitude"] == 1
+    assert {"id", "created_at", "_id", "image"} <= set(projection)
+    assert server.inspection_projection(None) == {"image_base64": 0}
+
+
+@pytest.mark.parametrize("fields, expected", [
+    ("image.sha256", {"image"}),
+    ("gps_data,gps_data.latitude", {"gps_data"}),
+    ("job.stage,id", {"job.stage"}),
+])
+def test_projection_never_holds_a_field_and_its_subpath(fields, expected):
+    projection = server.inspection_projection(fields)
+    assert set(projection) == expected | {"id", "created_at", "_id", "image"}
+    for path in projection:
+        assert not any(path.startswith(f"{other}.") for other in projection)
+
+
+def test_list_with_image_subfield_returns_the_image_ref(monkeypatch):
+    collection = AsyncMongoMockClient()["list_test"]["inspections"]
+    monkeypatch.setattr(server, "inspections_collection", collection)
+
+    async def run():
+        await collection.insert_one({
+            "id": "i1", "user_id": "demo-user", "created_at": datetime(2025, 1, 1),
+            "image": {"sha256": "abc", "size": 3}, "location": "Lobby"
+        })
+        page, _ = await server._get_mongo_inspections({"user_id": "demo-user"}, fields="image.sha256")
+        return page
+
+    (item,) = asyncio.run(run())
+    assert item["image"]["sha256"] == "abc"
+    assert "location" not in item
+
+
+@pytest.mark.parametrize("fields", ["$where", "location,password", "gemini_response.$", "location..x"])
+def test_unknown_fields_are_a_400(fields):
+    with pytest.raises(HTTPException) as error:
+        server.inspection_projection(fields)
+    assert error.value.status_code == 400
+
+
+def test_list_route_rejects_invalid_fields():
+    response = TestClient(server.app).get("/api/inspections", params={"fields": "location,$expr"})
+    assert response.status_code == 400
+
+
+def test_summary_counts_every_inspection_not_just_the_first_page(monkeypatch):
+    collection = AsyncMongoMockClient()["list_test"]["inspections"]
+    monkeypatch.setattr(server, "inspections_collection", collection)
+    now = datetime.utcnow()
+    last_year = now.replace(year=now.year - 1, day=1)
+
+    async def seed():
+        await collection.insert_many(
+            [{"id": f"new{n}", "user_id": "demo-user", "location": f"Floor {n % 3}", "inspection_date": now}
+             for n in range(server.INSPECTIONS_PAGE_SIZE + 5)]
+            + [{"id": "old", "user_id": "demo-user", "location": "Basement", "inspection_date": last_year},
+               {"id": "other", "user_id": "someone-else", "location": "Roof", "inspection_date": now}]
+        )
+
+    asyncio.run(seed())
+    response = TestClient(server.app).get("/api/inspections/summary")
+    assert response.status_code == 200
+    assert response.json() == {
+        "total": server.INSPECTIONS_PAGE_SIZE + 6,
+        "this_month": server.INSPECTIONS_PAGE_SIZE + 5,
+        "locations": 4
+    }
@@ -0,0 +1,96 @@
+import asyncio
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import server
+from blob_store import LocalBlobStore
+
+REQUEST = {"location": "Lobby", "image_base64": base64.b64encode(b"tag").decode("ascii")}
+RESULT = {"success": True, "inspection_id": "i1", "analysis": {"raw_text_analysis": "ANNUAL INSP"}}
+
+
+@pytest.fixture(autouse=True)
+def blob_store(monkeypatch, tmp_path):
+    monkeypatch.setattr(server, "blob_store", LocalBlobStore(str(tmp_path)))
+
+
+def parse_events(body):
+    """Splits an event-stream body into (event, data) pairs, checking the framing of each message."""
+    assert body.endswith("\n\n")
+    events = []
+    for message in body[:-2].split("\n\n"):
+        event_line, data_line = message.split("\n")
+        assert event_line.startswith("event: ") and data_line.startswith("data: ")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+
+def test_layers_stream_as_events_before_the_result(monkeypatch):
+    async def submit(user, request, image, image_source, async_mode, on_layer=None):
+        assert async_mode is False
+        await on_layer("raw_text", "ANNUAL INSP")
+        await on_layer("year", "2024")
+        return RESULT
+
+    monkeypatch.setattr(server, "submit_inspection", submit)
+    response = TestClient(server.app).post("/api/inspections/stream", json=REQUEST)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+
+    events = parse_events(response.text)
+    assert [event for event, _ in events] == ["accepted", "layer", "layer", "result"]
+    assert events[0][1] == {"status": "processing"}
+    assert [(data["layer"], data["value"]) for _, data in events[1:3]] == [("raw_text", "ANNUAL INSP"), ("year", "2024")]
+    assert all(data["elapsed_ms"] >= 0 for _, data in events[1:3])
+    assert events[3][1] == RESULT
+
+
+@pytest.mark.parametrize("error, expected", [
+    (HTTPException(status_code=500, detail="Database error: down"), {"status_code": 500, "detail": "Database error: down"}),
+    (RuntimeError("model timeout"), {"status_code": 500, "detail": "model timeout"}),
+])
+def test_failures_end_the_stream_with_an_error_event(monkeypatch, error, expected):
+    async def submit(user, request, image, image_source, async_mode, on_layer=None):
+        await on_layer("raw_text", "ANNUAL INSP")
+        raise error
+
+    monkeypatch.setattr(server, "submit_inspection", submit)
+    response = TestClient(server.app).post("/api/inspections/stream", json=REQUEST)
+    events = parse_events(response.text)
+    assert [event for event, _ in events] == ["accepted", "layer", "error"]
+    assert events[-1][1] == expected
+
+
+def test_inspection_is_saved_after_the_client_disconnects(monkeypatch):
+    release = asyncio.Event()
+    saved = []
+
+    async def submit(user, request, image, image_source, async_mode, on_layer=None):
+        await release.wait()
+        await on_layer("raw_text", "ANNUAL INSP")
+        saved.append(image["sha256"])
+        return RESULT
+
+    monkeypatch.setattr(server, "submit_inspection", submit)
+
+    async def run():
+        earlier = set(server.background_tasks)
+        response = await server.stream_inspection(server.InspectionRequest(**REQUEST))
+        (task,) = server.background_tasks - earlier
+        stream = response.body_iterator
+        first = await stream.__anext__()
+        # The client goes away after the first event; the server closes the stream
+        await stream.aclose()
+        release.set()
+        await task
+        return first, task
+
+    first, task = asyncio.run(run())
+    assert task not in server.background_tasks
+    assert parse_events(first) == [("accepted", {"status": "processing"})]
+    assert len(saved) == 1
@@ -0,0 +1,110 @@
+import asyncio
+import io
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+from PIL import Image, ImageDraw
+
+import image_processing
+import server
+from blob_store import LocalBlobStore
+
+ANALYSIS = {"raw_text_analysis": "ANNUAL INSP 03/2024", "condition": "Good"}
+
+
+class WriteOnlyBlobStore(LocalBlobStore):
+    """Fails the test if an upload is read back from the blob store."""
+
+    async def get(self, digest):
+        raise AssertionError("upload was read back from the blob store")
+
+    async def iter_chunks(self, digest):
+        raise AssertionError("upload was read back from the blob store")
+        yield
+
+
+def photo(width=3000, height=2000):
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([width // 8, height // 8, width // 2, height // 2], fill="yellow", outline="black", width=20)
+    draw.ellipse([width // 2, height // 2, width - 100, height - 100], fill="red")
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=95)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    database = AsyncMongoMockClient()["upload_test"]
+    monkeypatch.setattr(server, "inspections_collection", database["inspections"])
+    monkeypatch.setattr(server, "blob_store", WriteOnlyBlobStore(str(tmp_path)))
+    monkeypatch.setattr(server.analysis_cache, "enabled", False)
+    monkeypatch.setattr(server.near_duplicate_finder, "enabled", True)
+    seen = []
+
+    async def fake_pipeline(data_url, engine=None, on_layer=None):
+        seen.append(data_url)
+        return dict(ANALYSIS), "layered"
+
+    async def no_duplicate(inspection):
+        return None
+
+    async def nothing(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(server, "run_analysis_pipeline", fake_pipeline)
+    monkeypatch.setattr(server.near_duplicate_finder, "find", no_duplicate)
+    monkeypatch.setattr(server, "cluster_inspection", nothing)
+    monkeypatch.setattr(server, "notify_new_inspection", nothing)
+    test_client = TestClient(server.app)
+    test_client.database = database
+    test_client.seen = seen
+    return test_client
+
+
+def test_file_and_bytes_sources_give_the_same_results():
+    data = photo(800, 600)
+    with tempfile.TemporaryFile() as f:
+        f.write(data)
+        assert image_processing.dhash(f) == image_processing.dhash(data)
+        from_file, file_stats = image_processing.normalize_image(f)
+    from_bytes, bytes_stats = image_processing.normalize_image(data)
+    assert from_file == from_bytes
+    assert file_stats["original_bytes"] == bytes_stats["original_bytes"] == len(data)
+
+
+def test_large_jpeg_is_decoded_at_a_reduced_scale(monkeypatch):
+    monkeypatch.setattr(image_processing, "IMAGE_MAX_DIMENSION", 400)
+    opened = []
+    original_open = image_processing._open
+
+    def tracking_open(source):
+        image = original_open(source)
+        opened.append(image)
+        return image
+
+    monkeypatch.setattr(image_processing, "_open", tracking_open)
+    _, stats = image_processing.normalize_image(photo())
+    assert stats["original_size"] == [3000, 2000]
+    assert stats["normalized_size"] == [400, 267]
+    # Decoded at 1/2 scale (>= 2x the target), not at full resolution
+    assert opened[0].size == (1500, 1000)
+
+
+@pytest.mark.parametrize("async_mode", [False, True])
+def test_upload_is_analyzed_and_hashed_from_the_spool(client, async_mode, monkeypatch):
+    monkeypatch.setattr(server, "inspection_job_queue", asyncio.Queue())
+    data = photo()
+    response = client.post(
+        "/api/inspections/upload" + ("?async=true" if async_mode else ""),
+        files={"image": ("tag.jpg", data, "image/jpeg")},
+        data={"location": "Lobby"}
+    )
+    assert response.status_code == (202 if async_mode else 200)
+    inspection = asyncio.run(client.database["inspections"].find_one({"id": response.json()["inspection_id"]}))
+    assert inspection["phash"] == format(image_processing.dhash(data), "016x")
+    if not async_mode:
+        assert len(client.seen) == 1
+        assert response.json()["image_processing"]["normalized"] is True
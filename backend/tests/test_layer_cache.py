@@ -0,0 +1,82 @@
+import asyncio
+import base64
+import hashlib
+import io
+import os
+from types import SimpleNamespace
+
+from PIL import Image
+
+import server
+
+
+def completion_returning(contents, calls):
+    async def fake_acompletion(**kwargs):
+        calls.append(kwargs)
+        message = SimpleNamespace(content=contents.pop(0), reasoning_content=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+    return fake_acompletion
+
+
+def random_data_url():
+    return "data:image/jpeg;base64," + base64.b64encode(os.urandom(64)).decode()
+
+
+def test_image_digest_uses_the_digest_set_for_the_run():
+    data_url = random_data_url()
+    assert server.image_digest(data_url) == hashlib.sha256(data_url.encode("utf-8")).hexdigest()
+
+    token = server.current_image.set((data_url, "precomputed"))
+    try:
+        assert server.image_digest(data_url) == "precomputed"
+        # A different data URL is hashed, not given the run's digest
+        assert server.image_digest(random_data_url()) != "precomputed"
+    finally:
+        server.current_image.reset(token)
+
+
+def test_layer_answers_are_memoized(monkeypatch):
+    calls = []
+    monkeypatch.setattr(server.litellm, "acompletion", completion_returning(["2024"], calls))
+    data_url = random_data_url()
+
+    async def run():
+        first = await server.analyze_image_layer("year?", data_url, layer="year")
+        second = await server.analyze_image_layer("year?", data_url, layer="year")
+        return first, second
+
+    assert asyncio.run(run()) == ("2024", "2024")
+    assert len(calls) == 1
+
+
+def test_empty_layer_answers_are_not_cached(monkeypatch):
+    calls = []
+    monkeypatch.setattr(server.litellm, "acompletion", completion_returning(["", "2024"], calls))
+    data_url = random_data_url()
+
+    async def run():
+        first = await server.analyze_image_layer("year?", data_url, layer="year")
+        second = await server.analyze_image_layer("year?", data_url, layer="year")
+        return first, second
+
+    assert asyncio.run(run()) == ("", "2024")
+    assert len(calls) == 2
+
+
+def test_pipeline_layers_share_one_image_digest(monkeypatch):
+    seen = []
+
+    async def fake_pipeline(data_url, engine=None, on_layer=None):
+        seen.append(server.image_digest(data_url))
+        return {"raw_text_analysis": "unknown"}, "layered"
+
+    monkeypatch.setattr(server.analysis_cache, "enabled", False)
+    monkeypatch.setattr(server, "run_analysis_pipeline", fake_pipeline)
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), "red").save(buffer, "JPEG")
+
+    asyncio.run(server.run_cached_analysis(buffer.getvalue()))
+
+    model_image, _ = server.image_processing.normalize_image(buffer.getvalue())
+    assert seen == [hashlib.sha256(model_image).hexdigest()]
+    assert server.current_image.get() is None
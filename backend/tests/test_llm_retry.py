@@ -0,0 +1,192 @@
+import asyncio
+import base64
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import server
+from llm_retry import RetryPolicy, is_retryable
+from llm_scheduler import LLMScheduler
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class RateLimitError(Exception):
+    pass
+
+
+def test_is_retryable_classifies_transient_and_permanent_errors():
+    assert is_retryable(asyncio.TimeoutError())
+    assert is_retryable(ConnectionError())
+    assert is_retryable(ProviderError(429))
+    assert is_retryable(ProviderError(503))
+    assert is_retryable(RateLimitError())
+    assert not is_retryable(ProviderError(401))
+    assert not is_retryable(ProviderError(400))
+    assert not is_retryable(ValueError("bad prompt"))
+
+
+def fast_policy(**kwargs):
+    policy = RetryPolicy(**kwargs)
+    policy.backoff = lambda attempt: 0.01
+    return policy
+
+
+def test_transient_errors_are_retried_until_success():
+    policy = fast_policy(max_retries=3)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ProviderError(503)
+        return "ok"
+
+    assert asyncio.run(policy.run("year", call)) == "ok"
+    assert len(calls) == 3
+    assert policy.counters["retries"] == 2
+    assert policy.counters["failures"] == 0
+
+
+def test_permanent_errors_fail_without_retry():
+    policy = fast_policy(max_retries=3)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        raise ProviderError(401)
+
+    with pytest.raises(ProviderError):
+        asyncio.run(policy.run("year", call))
+    assert len(calls) == 1
+    assert policy.counters["failures"] == 1
+
+
+def test_deadline_bounds_all_attempts():
+    policy = fast_policy(max_retries=10, layer_timeout=0.1)
+
+    async def call():
+        await asyncio.sleep(1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(policy.run("year", call))
+    assert policy.counters["deadline_exceeded"] == 1
+
+
+def test_slot_is_released_during_backoff():
+    scheduler = LLMScheduler(max_in_flight=1)
+    policy = RetryPolicy(max_retries=1, scheduler=scheduler)
+    policy.backoff = lambda attempt: 0.2
+    calls = []
+
+    async def call():
+        calls.append(scheduler.in_flight)
+        if len(calls) == 1:
+            raise ProviderError(429)
+        return "ok"
+
+    async def run():
+        retried = asyncio.create_task(policy.run("year", call, model="m"))
+        await asyncio.sleep(0.05)  # first attempt failed, now backing off
+        assert scheduler.in_flight == 0
+        async with scheduler.slot("m"):
+            other_got_slot = True
+        return await retried, other_got_slot
+
+    assert asyncio.run(run()) == ("ok", True)
+    assert calls == [1, 1]
+    assert scheduler.in_flight == 0
+
+
+def test_each_attempt_takes_a_rate_limit_token():
+    scheduler = LLMScheduler(max_in_flight=4, model_rates={"m": 60}, burst=2)
+    policy = fast_policy(max_retries=3, scheduler=scheduler)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        raise ProviderError(503)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        with pytest.raises(asyncio.TimeoutError):
+            await policy.run("year", call, model="m")
+        return loop.time() - start
+
+    policy.layer_timeout = 0.3
+    elapsed = asyncio.run(run())
+    # Two tokens in the burst; the third attempt would wait ~1s for a refill, past the deadline
+    assert len(calls) == 2
+    assert elapsed < 0.6
+    assert policy.counters["deadline_exceeded"] == 1
+    assert scheduler.stats()["queue_depth"] == 0
+
+
+def test_queue_wait_does_not_use_up_the_layer_deadline():
+    scheduler = LLMScheduler(max_in_flight=1)
+    policy = RetryPolicy(layer_timeout=0.15, scheduler=scheduler)
+
+    async def call():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def run():
+        async def busy():
+            async with scheduler.slot("m"):
+                await asyncio.sleep(0.2)
+
+        holder = asyncio.create_task(busy())
+        await asyncio.sleep(0)
+        result = await policy.run("year", call, model="m")
+        await holder
+        return result
+
+    assert asyncio.run(run()) == "ok"
+    assert policy.counters["deadline_exceeded"] == 0
+
+
+def test_hedge_holds_its_own_slot():
+    scheduler = LLMScheduler(max_in_flight=2)
+    policy = RetryPolicy(hedge_enabled=True, hedge_default_delay=0.05, scheduler=scheduler)
+    peak = 0
+    calls = []
+
+    async def call():
+        nonlocal peak
+        calls.append(1)
+        peak = max(peak, scheduler.in_flight)
+        if len(calls) == 1:
+            await asyncio.sleep(1)
+            return "slow"
+        return "hedge"
+
+    assert asyncio.run(policy.run("year", call, model="m")) == "hedge"
+    assert peak == 2
+    assert policy.counters["hedges_fired"] == 1
+    assert policy.counters["hedge_wins"] == 1
+    assert scheduler.in_flight == 0
+
+
+def test_layer_call_uses_full_llm_timeout_and_releases_slot(monkeypatch):
+    requests = []
+
+    async def fake_acompletion(**kwargs):
+        requests.append(kwargs)
+        message = SimpleNamespace(content="2024", reasoning_content=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(server.litellm, "acompletion", fake_acompletion)
+    monkeypatch.setenv("LLM_TIMEOUT", "240")
+    monkeypatch.setattr(server.llm_retry_policy, "layer_timeout", 30.0)
+    data_url = "data:image/jpeg;base64," + base64.b64encode(os.urandom(32)).decode()
+
+    assert asyncio.run(server.analyze_image_layer("Year?", data_url)) == "2024"
+    assert requests[0]["timeout"] == 240
+    assert server.llm_retry_policy.scheduler is server.llm_scheduler
+    assert server.llm_scheduler.in_flight == 0
@@ -0,0 +1,122 @@
+import asyncio
+
+from llm_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, LLMScheduler
+
+
+async def hold(scheduler, model, priority, order, label, release: asyncio.Event):
+    async with scheduler.slot(model, priority):
+        order.append(label)
+        await release.wait()
+
+
+def test_interactive_waiters_go_before_background_and_fifo_within_a_class():
+    scheduler = LLMScheduler(max_in_flight=1)
+    order = []
+
+    async def run():
+        gate = asyncio.Event()
+        first = asyncio.create_task(hold(scheduler, "m", PRIORITY_INTERACTIVE, order, "first", gate))
+        await asyncio.sleep(0)
+        done = asyncio.Event()
+        done.set()
+        waiters = [
+            asyncio.create_task(hold(scheduler, "m", PRIORITY_BACKGROUND, order, "bg-1", done)),
+            asyncio.create_task(hold(scheduler, "m", PRIORITY_BACKGROUND, order, "bg-2", done)),
+            asyncio.create_task(hold(scheduler, "m", PRIORITY_INTERACTIVE, order, "int-1", done)),
+            asyncio.create_task(hold(scheduler, "m", PRIORITY_INTERACTIVE, order, "int-2", done)),
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.stats()["queue_depth"] == 4
+        gate.set()
+        await asyncio.gather(first, *waiters)
+
+    asyncio.run(run())
+    assert order == ["first", "int-1", "int-2", "bg-1", "bg-2"]
+    assert scheduler.in_flight == 0
+
+
+def test_in_flight_never_exceeds_the_cap():
+    scheduler = LLMScheduler(max_in_flight=3)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        async with scheduler.slot("m"):
+            peak = max(peak, scheduler.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*(call() for _ in range(10)))
+
+    asyncio.run(run())
+    assert peak == 3
+    assert scheduler.in_flight == 0
+
+
+def test_rate_limit_allows_a_burst_then_spaces_calls():
+    # 600/min = one token every 0.1s after the burst of 2
+    scheduler = LLMScheduler(max_in_flight=10, model_rates={"slow": 600}, burst=2)
+    granted = []
+
+    async def call():
+        async with scheduler.slot("slow"):
+            granted.append(asyncio.get_running_loop().time())
+
+    async def run():
+        start = asyncio.get_running_loop().time()
+        await asyncio.gather(*(call() for _ in range(4)))
+        return [t - start for t in granted]
+
+    offsets = asyncio.run(run())
+    assert offsets[0] < 0.05 and offsets[1] < 0.05
+    assert 0.08 <= offsets[2] < 0.3
+    assert 0.18 <= offsets[3] < 0.4
+    assert scheduler.stats()["rate_limited"] >= 2
+
+
+def test_rate_limited_model_does_not_block_other_models():
+    scheduler = LLMScheduler(max_in_flight=10, model_rates={"slow": 60}, burst=1)
+    order = []
+
+    async def call(model, label):
+        async with scheduler.slot(model):
+            order.append(label)
+
+    async def run():
+        await call("slow", "slow-1")
+        # The slow bucket is now empty for ~1s; its next waiter sits at the head of the queue
+        slow = asyncio.create_task(call("slow", "slow-2"))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(call("fast", "fast-1"), timeout=0.2)
+        await asyncio.wait_for(call("fast", "fast-2"), timeout=0.2)
+        assert not slow.done()
+        slow.cancel()
+        await asyncio.gather(slow, return_exceptions=True)
+
+    asyncio.run(run())
+    assert order == ["slow-1", "fast-1", "fast-2"]
+    assert scheduler.in_flight == 0
+    assert scheduler.stats()["queue_depth"] == 0
+
+
+def test_cancelled_waiter_is_skipped():
+    scheduler = LLMScheduler(max_in_flight=1)
+    order = []
+
+    async def run():
+        gate = asyncio.Event()
+        first = asyncio.create_task(hold(scheduler, "m", PRIORITY_INTERACTIVE, order, "first", gate))
+        await asyncio.sleep(0)
+        done = asyncio.Event()
+        done.set()
+        cancelled = asyncio.create_task(hold(scheduler, "m", PRIORITY_INTERACTIVE, order, "cancelled", done))
+        later = asyncio.create_task(hold(scheduler, "m", PRIORITY_BACKGROUND, order, "later", done))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        gate.set()
+        await asyncio.gather(first, later)
+
+    asyncio.run(run())
+    assert order == ["first", "later"]
+    assert scheduler.in_flight == 0
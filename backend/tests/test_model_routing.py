@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+import server
+from model_routing import FAST_TIER_LAYERS, ModelRouter
+
+PRO = "pro-model"
+FAST = "fast-model"
+
+
+def test_disabled_router_sends_every_layer_to_the_default_model():
+    router = ModelRouter(PRO, FAST, routes={"year": [FAST]}, enabled=False)
+    assert router.tiers("year") == [PRO]
+    assert router.tiers(None) == [PRO]
+    assert router.settings_key() == "single"
+
+
+def test_enabled_router_tries_the_fast_model_first_for_field_layers():
+    router = ModelRouter(PRO, FAST, enabled=True)
+    for layer in FAST_TIER_LAYERS:
+        assert router.tiers(layer) == [FAST, PRO]
+    assert router.tiers("raw_text") == [PRO]
+
+
+def test_explicit_routes_override_the_defaults_and_change_the_settings_key():
+    default = ModelRouter(PRO, FAST, enabled=True)
+    custom = ModelRouter(PRO, FAST, routes={"day": ["tiny", FAST, PRO], "raw_text": [FAST]}, enabled=True)
+    assert custom.tiers("day") == ["tiny", FAST, PRO]
+    assert custom.tiers("raw_text") == [FAST]
+    assert custom.tiers("month") == [FAST, PRO]
+    assert default.settings_key() != custom.settings_key()
+    assert default.settings_key() == ModelRouter(PRO, FAST, enabled=True).settings_key()
+
+
+@pytest.mark.parametrize("layer, value, valid", [
+    ("year", "2024", True),
+    ("year", "1800", False),
+    ("year", "unknown", False),
+    ("month", "12", True),
+    ("month", "13", False),
+    ("day", " 31 ", True),
+    ("day", "0", False),
+    ("condition", "Good", True),
+    ("condition", "Excellent", False),
+    ("extinguisher_type", "ABC dry chemical", True),
+    ("extinguisher_type", "the tag mentions several different agents", False),
+    ("company_info", '{"name": "ABC Fire"}', True),
+    ("company_info", "unknown", True),
+    ("company_info", "ABC Fire, 555-0100", False),
+    ("service_details", '{"service_type": "Annual"', False),
+    ("raw_text", "anything", True),
+])
+def test_layer_validators(layer, value, valid):
+    assert ModelRouter(PRO).validate(layer, value) is valid
+
+
+def test_record_tracks_tier_answers_escalations_and_latency():
+    router = ModelRouter(PRO, FAST, enabled=True)
+    router.record("year", 0, FAST, 0.1, accepted=False)
+    router.record("year", 1, PRO, 0.5, accepted=True)
+    router.record("year", 0, FAST, 0.3, accepted=True)
+
+    year = router.stats()["layers"]["year"]
+    assert year["answered_by_tier"] == {"0": 1, "1": 1}
+    assert year["escalations"] == 1
+    assert year["tiers"]["0"] == {"model": FAST, "calls": 2, "avg_ms": 200}
+    assert year["tiers"]["1"] == {"model": PRO, "calls": 1, "avg_ms": 500}
+
+
+def run_routed(monkeypatch, answers):
+    calls = []
+
+    async def fake_layer(prompt, data_url, layer=None, model_id=None, context=None):
+        calls.append(model_id)
+        return answers[model_id]
+
+    monkeypatch.setattr(server, "analyze_image_layer", fake_layer)
+    monkeypatch.setattr(server, "model_router", ModelRouter(PRO, FAST, enabled=True))
+    value = asyncio.run(server.analyze_routed_layer("Month?", "data:image/jpeg;base64,", "month"))
+    return value, calls
+
+
+def test_routed_layer_keeps_a_valid_fast_answer(monkeypatch):
+    value, calls = run_routed(monkeypatch, {FAST: "3", PRO: "4"})
+    assert value == "3"
+    assert calls == [FAST]
+    assert server.model_router.stats()["layers"]["month"]["answered_by_tier"] == {"0": 1}
+
+
+def test_routed_layer_escalates_an_invalid_fast_answer(monkeypatch):
+    value, calls = run_routed(monkeypatch, {FAST: "March-ish", PRO: "3"})
+    assert value == "3"
+    assert calls == [FAST, PRO]
+    assert server.model_router.stats()["layers"]["month"]["escalations"] == 1
+
+
+def test_last_tier_answer_is_returned_even_if_invalid(monkeypatch):
+    value, calls = run_routed(monkeypatch, {FAST: "unknown", PRO: "unknown"})
+    assert value == "unknown"
+    assert calls == [FAST, PRO]
@@ -0,0 +1,139 @@
+import asyncio
+import io
+import json
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from PIL import Image, ImageDraw
+
+from image_processing import dhash
+from near_duplicates import MAX_HAMMING, NearDuplicateFinder, hamming, phash_chunks
+
+LAT, LNG = 40.7128, -74.0060
+HASH = 0x0123456789ABCDEF
+ANALYSIS = {"raw_text_analysis": "ANNUAL INSP 03/2024", "condition": "Good"}
+
+
+def test_phash_chunks_are_position_tagged_bytes():
+    assert phash_chunks(HASH) == ["0:01", "1:23", "2:45", "3:67", "4:89", "5:ab", "6:cd", "7:ef"]
+    assert phash_chunks(0xFF) == ["0:00", "1:00", "2:00", "3:00", "4:00", "5:00", "6:00", "7:ff"]
+
+
+def test_hamming_counts_differing_bits():
+    assert hamming(HASH, HASH) == 0
+    assert hamming(0b1011, 0b0010) == 2
+    assert hamming(0, (1 << 64) - 1) == 64
+
+
+def test_hashes_within_max_hamming_share_a_chunk():
+    rng = random.Random(7)
+    for _ in range(500):
+        value = rng.getrandbits(64)
+        flipped = value
+        for bit in rng.sample(range(64), MAX_HAMMING):
+            flipped ^= 1 << bit
+        assert set(phash_chunks(value)) & set(phash_chunks(flipped))
+
+
+def jpeg(image, quality=90):
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def test_recompressed_photo_has_a_close_dhash():
+    image = Image.new("RGB", (640, 480), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([80, 60, 560, 420], fill="yellow", outline="black", width=8)
+    draw.ellipse([200, 150, 320, 270], fill="red")
+    draw.rectangle([380, 300, 520, 380], fill="blue")
+    original = dhash(jpeg(image))
+    recompressed = dhash(jpeg(image.resize((600, 450)), quality=60))
+    assert original is not None and recompressed is not None
+    assert hamming(original, recompressed) <= 4
+    assert dhash(b"not an image") is None
+
+
+@pytest.fixture
+def collection():
+    return AsyncMongoMockClient()["near_duplicates_test"]["inspections"]
+
+
+def stored(inspection_id, value, minutes_ago=1, user_id="user-1", lat=LAT, name=None, analysis=ANALYSIS):
+    return {
+        "id": inspection_id,
+        "user_id": user_id,
+        "status": "analyzed",
+        "created_at": datetime.utcnow() - timedelta(minutes=minutes_ago),
+        "location_point": {"type": "Point", "coordinates": [LNG, lat]},
+        "business_name": name,
+        "gemini_response": json.dumps(analysis),
+        "analysis_engine": "layered",
+        "prompt_versions": {},
+        **NearDuplicateFinder.fields(value)
+    }
+
+
+def new_inspection(value, name=None):
+    return {
+        "id": "new",
+        "user_id": "user-1",
+        "location_point": {"type": "Point", "coordinates": [LNG, LAT]},
+        "business_name": name,
+        **NearDuplicateFinder.fields(value)
+    }
+
+
+def find(collection, docs, inspection, **kwargs):
+    finder = NearDuplicateFinder(collection, **kwargs)
+
+    async def run():
+        if docs:
+            await collection.insert_many(docs)
+        return await finder.find(inspection)
+
+    return asyncio.run(run()), finder
+
+
+def test_closest_recent_duplicate_wins(collection):
+    docs = [stored("three-bits", HASH ^ 0b111), stored("one-bit", HASH ^ 0b1000)]
+    result, finder = find(collection, docs, new_inspection(HASH))
+    duplicate, distance = result
+    assert duplicate["id"] == "one-bit"
+    assert distance == 1
+    assert duplicate["analysis"] == ANALYSIS
+    assert finder.stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("doc", [
+    stored("too-different", HASH ^ 0b11111),
+    stored("other-user", HASH, user_id="user-2"),
+    stored("too-old", HASH, minutes_ago=30),
+    stored("far-away", HASH, lat=LAT + 0.01),
+    stored("other-business", HASH, name="XYZ Bakery"),
+    stored("failed-analysis", HASH, analysis={"raw_text_analysis": "unknown"}),
+])
+def test_candidates_that_are_not_the_same_photo_are_skipped(collection, doc):
+    result, finder = find(collection, [doc], new_inspection(HASH, name="ABC Diner"))
+    assert result is None
+    assert finder.stats()["lookups"] == 1
+
+
+def test_same_business_name_in_another_spelling_matches(collection):
+    result, _ = find(collection, [stored("same", HASH, name="The ABC Diner")], new_inspection(HASH, name="abc diner inc"))
+    assert result[0]["id"] == "same"
+
+
+def test_disabled_or_unhashed_inspections_are_not_looked_up(collection):
+    result, finder = find(collection, [stored("same", HASH)], new_inspection(HASH), enabled=False)
+    assert result is None
+    result, finder = find(collection, [], {"id": "new", "user_id": "user-1"})
+    assert result is None
+    assert finder.stats()["lookups"] == 0
+    assert NearDuplicateFinder.fields(None) == {}
+
+
+def test_max_hamming_is_capped_at_the_chunk_guarantee(collection):
+    assert NearDuplicateFinder(collection, max_hamming=20).max_hamming == MAX_HAMMING
@@ -0,0 +1,162 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import geo
+from places_client import (
+    GooglePlacesProvider, PlacesClient, PlacesError, StubPlacesProvider, create_places_provider
+)
+
+# ~111 m per 0.001 degree of latitude
+LAT, LNG = 40.7128, -74.0060
+
+
+def place(name, rating, business_status="OPERATIONAL"):
+    return {"name": name, "vicinity": "1 Main St", "rating": rating, "place_id": name,
+            "types": ["establishment"], "business_status": business_status}
+
+
+class FakeGoogle:
+    """Records every Nearby Search request and answers with `responses` in turn (the last one repeats)."""
+
+    def __init__(self, *responses, delay=0.0):
+        self.responses = list(responses) or [httpx.Response(200, json={"status": "OK", "results": [place("A", 4)]})]
+        self.delay = delay
+        self.requests = []
+
+    async def __call__(self, request):
+        self.requests.append(dict(request.url.params))
+        await asyncio.sleep(self.delay)
+        return self.responses[min(len(self.requests), len(self.responses)) - 1]
+
+
+def make_client(google, **kwargs):
+    provider = GooglePlacesProvider("test-key")
+    provider.client = httpx.AsyncClient(transport=httpx.MockTransport(google))
+    return PlacesClient(provider, **kwargs)
+
+
+def test_results_are_sorted_filtered_and_cached_per_cell():
+    google = FakeGoogle(httpx.Response(200, json={"status": "OK", "results": [
+        place("Low", 3.1), place("Closed", 5, business_status="CLOSED_PERMANENTLY"), place("High", 4.8)
+    ]}))
+    client = make_client(google)
+
+    async def run():
+        first = await client.nearby(LAT, LNG, 500)
+        # A few metres away, inside the same precision-8 cell
+        second = await client.nearby(LAT + 0.00001, LNG + 0.00001, 500)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert [p["name"] for p in first] == ["High", "Low"]
+    assert second == first
+    assert len(google.requests) == 1
+    assert client.stats()["hits"] == 1
+
+
+def test_the_provider_searches_around_the_callers_point():
+    google = FakeGoogle()
+    client = make_client(google)
+    asyncio.run(client.nearby(LAT, LNG, 500))
+    assert google.requests[0]["location"] == f"{LAT},{LNG}"
+    assert google.requests[0]["radius"] == "500"
+
+
+def test_expired_entries_are_fetched_again():
+    google = FakeGoogle()
+    client = make_client(google)
+
+    async def run():
+        await client.nearby(LAT, LNG, 500)
+        key = f"{geo.encode(LAT, LNG, client.precision)}:500"
+        _, places = client.cache.get(key)
+        client.cache.set(key, (time.monotonic() - 1, places))
+        await client.nearby(LAT, LNG, 500)
+
+    asyncio.run(run())
+    assert len(google.requests) == 2
+    assert client.stats()["expired"] == 1
+
+
+def test_least_recently_used_cell_is_evicted():
+    google = FakeGoogle()
+    client = make_client(google, max_entries=2)
+
+    async def run():
+        for lat in (LAT, LAT + 0.01, LAT):
+            await client.nearby(lat, LNG, 500)
+        # Evicts LAT + 0.01, the least recently used cell, not LAT
+        await client.nearby(LAT + 0.02, LNG, 500)
+        await client.nearby(LAT, LNG, 500)
+        await client.nearby(LAT + 0.01, LNG, 500)
+
+    asyncio.run(run())
+    assert len(google.requests) == 4
+    assert client.stats()["entries"] == 2
+
+
+def test_concurrent_identical_lookups_share_one_request():
+    google = FakeGoogle(delay=0.05)
+    client = make_client(google)
+
+    async def run():
+        return await asyncio.gather(*(client.nearby(LAT, LNG, 500) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(google.requests) == 1
+    assert all(result == results[0] for result in results)
+    assert client.stats()["coalesced"] == 4
+    assert client.stats()["in_flight"] == 0
+
+
+@pytest.mark.parametrize("response", [
+    httpx.Response(500),
+    httpx.Response(200, json={"status": "OVER_QUERY_LIMIT"}),
+])
+def test_errors_reach_every_waiter_and_are_not_cached(response):
+    google = FakeGoogle(response, httpx.Response(200, json={"status": "OK", "results": [place("A", 4)]}), delay=0.05)
+    client = make_client(google)
+
+    async def run():
+        failures = await asyncio.gather(*(client.nearby(LAT, LNG, 500) for _ in range(3)), return_exceptions=True)
+        return failures, await client.nearby(LAT, LNG, 500)
+
+    failures, retried = asyncio.run(run())
+    assert all(isinstance(failure, PlacesError) for failure in failures)
+    assert [p["name"] for p in retried] == ["A"]
+    assert len(google.requests) == 2
+    assert client.stats()["provider_errors"] == 1
+
+
+def test_network_errors_become_places_errors():
+    def unreachable(request):
+        raise httpx.ConnectError("connection refused")
+
+    provider = GooglePlacesProvider("test-key")
+    provider.client = httpx.AsyncClient(transport=httpx.MockTransport(unreachable))
+    with pytest.raises(PlacesError, match="Network error"):
+        asyncio.run(PlacesClient(provider).nearby(LAT, LNG, 500))
+
+
+def test_zero_results_is_an_empty_cached_answer():
+    google = FakeGoogle(httpx.Response(200, json={"status": "ZERO_RESULTS", "results": []}))
+    client = make_client(google)
+
+    async def run():
+        return await client.nearby(LAT, LNG, 500), await client.nearby(LAT, LNG, 500)
+
+    assert asyncio.run(run()) == ([], [])
+    assert len(google.requests) == 1
+    assert client.stats()["provider_errors"] == 0
+
+
+@pytest.mark.parametrize("provider, api_key", [("google", None), ("google", ""), ("stub", "test-key")])
+def test_stub_provider_is_used_without_an_api_key_or_when_selected(provider, api_key):
+    places_provider = create_places_provider(provider, api_key)
+    assert isinstance(places_provider, StubPlacesProvider)
+    places = asyncio.run(PlacesClient(places_provider).nearby(LAT, LNG, 500))
+    assert places[0]["name"] == "ABC Fire Safety Services"
+    assert isinstance(create_places_provider("google", "test-key"), GooglePlacesProvider)
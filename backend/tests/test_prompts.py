@@ -0,0 +1,49 @@
+import pytest
+
+import prompts
+
+FIELD_LAYERS = [
+    "year", "month", "day", "extinguisher_type", "condition", "company_info", "equipment_numbers", "service_details"
+]
+
+
+@pytest.mark.parametrize("layer", FIELD_LAYERS)
+def test_v2_field_prompts_only_move_the_ocr_text(layer):
+    v1, v2 = prompts._REGISTRY[layer]["1"], prompts._REGISTRY[layer]["2"]
+    assert v1.template.replace("this text: '{raw_text}'", "the OCR text above") == v2.template
+    assert not v1.shared_context and v2.shared_context
+    assert "ANNUAL INSP 2024" in v1.render("ANNUAL INSP 2024")
+    assert v2.render("ANNUAL INSP 2024") == v2.template.format()
+
+
+def test_newest_version_is_active_by_default(monkeypatch):
+    monkeypatch.setattr(prompts, "ACTIVE_VERSIONS", {})
+    assert prompts.get("year").id == "year@2"
+    assert prompts.get("system").id == "system@1"
+
+
+def test_versions_compare_as_numbers(monkeypatch):
+    monkeypatch.setattr(prompts, "_REGISTRY", {})
+    for version in ["1", "2", "10"]:
+        prompts.register("year", version, f"Year prompt {version}")
+    monkeypatch.setattr(prompts, "ACTIVE_VERSIONS", {})
+    assert prompts.get("year").version == "10"
+
+
+def test_active_versions_select_a_layer_version(monkeypatch):
+    monkeypatch.setattr(prompts, "ACTIVE_VERSIONS", {})
+    default_hash = prompts.registry_hash()
+    monkeypatch.setattr(prompts, "ACTIVE_VERSIONS", {"year": "1", "month": "9"})
+    assert prompts.get("year").id == "year@1"
+    # An unknown version falls back to the newest one
+    assert prompts.get("month").id == "month@2"
+    manifest = prompts.manifest()
+    assert manifest["year@1"] == prompts._REGISTRY["year"]["1"].hash
+    assert "year@2" not in manifest and "month@2" in manifest
+    assert prompts.registry_hash() != default_hash
+
+
+def test_hash_follows_the_template_text():
+    first = prompts.PromptTemplate("year", "1", "What year?")
+    assert first.hash == prompts.PromptTemplate("year", "3", "What year?").hash
+    assert first.hash != prompts.PromptTemplate("year", "1", "What year is it?").hash
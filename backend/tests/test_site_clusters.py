@@ -0,0 +1,200 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import geo
+from site_clusters import SiteClusterer, equipment_keys, service_company_name
+
+# ~111 m per 0.001 degree of latitude
+LAT, LNG = 40.7128, -74.0060
+
+
+class NearCursor:
+    """Async cursor over the documents a `$nearSphere` query returns, nearest first."""
+
+    def __init__(self, load, count=None):
+        self.load = load
+        self.count = count
+        self.docs = None
+
+    def limit(self, count):
+        return NearCursor(self.load, count)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.docs is None:
+            docs = await self.load()
+            self.docs = iter(docs[:self.count] if self.count else docs)
+        try:
+            return next(self.docs)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class GeoCollection:
+    """mongomock collection plus the `$nearSphere` query it does not implement."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def find(self, query, *args, **kwargs):
+        near = query.get("location", {}).get("$nearSphere")
+        if near is None:
+            return self.collection.find(query, *args, **kwargs)
+        lng, lat = near["$geometry"]["coordinates"]
+        rest = {key: value for key, value in query.items() if key != "location"}
+
+        async def load():
+            docs = await self.collection.find({**rest, "location": {"$exists": True}}).to_list(None)
+            within = []
+            for doc in docs:
+                site_lng, site_lat = doc["location"]["coordinates"]
+                distance = geo.haversine_m(lat, lng, site_lat, site_lng)
+                if distance <= near["$maxDistance"]:
+                    within.append((distance, doc))
+            return [doc for _, doc in sorted(within, key=lambda item: item[0])]
+
+        return NearCursor(load)
+
+
+@pytest.fixture
+def clusterer():
+    collection = GeoCollection(AsyncMongoMockClient()["sites_test"]["sites"])
+    return SiteClusterer(collection, max_distance_m=150, gps_only_distance_m=40)
+
+
+_ids = iter(range(1000))
+
+
+def inspection(name=None, lat=None, lng=None, user_id="user-1"):
+    point = {"type": "Point", "coordinates": [lng, lat]} if lat is not None else None
+    return {"id": f"insp-{next(_ids)}", "user_id": user_id, "business_name": name, "location_point": point}
+
+
+def analysis(company=None, **numbers):
+    return {
+        "service_company": {"name": company} if company else "unknown",
+        "equipment_numbers": numbers or "unknown"
+    }
+
+
+def assign(clusterer, *args):
+    return asyncio.run(clusterer.assign(*args))
+
+
+def test_equipment_keys_normalize_known_numbers():
+    assert equipment_keys(analysis(fe_number="fe 123", ae_number="unknown", he_number="")) == ["fe_number:FE123"]
+    assert equipment_keys({"equipment_numbers": "unknown"}) == []
+
+
+def test_service_company_name_ignores_unknown_values():
+    assert service_company_name(analysis("ABC Fire ")) == "ABC Fire"
+    assert service_company_name(analysis("N/A")) is None
+    assert service_company_name({"service_company": "ABC Fire"}) is None
+
+
+def test_same_business_nearby_joins_the_site(clusterer):
+    first = assign(clusterer, inspection("ABC Diner", LAT, LNG), analysis())
+    second = assign(clusterer, inspection("The ABC Diner Inc.", LAT + 0.001, LNG), analysis())
+    assert first["created"] and not second["created"]
+    assert second["rule"] == "nearby"
+    assert second["site"]["id"] == first["site"]["id"]
+    assert second["site"]["inspection_count"] == 2
+    assert second["site"]["location"]["coordinates"][1] == pytest.approx(LAT + 0.0005)
+
+
+def test_different_names_never_merge(clusterer):
+    first = assign(clusterer, inspection("ABC Diner", LAT, LNG), analysis("Fire Co"))
+    second = assign(clusterer, inspection("XYZ Bakery", LAT + 0.0001, LNG), analysis("Fire Co"))
+    assert second["created"]
+    assert second["site"]["id"] != first["site"]["id"]
+
+
+def test_unnamed_photo_joins_by_service_company_or_short_distance(clusterer):
+    site = assign(clusterer, inspection("ABC Diner", LAT, LNG), analysis("Metro Fire"))["site"]
+    by_company = assign(clusterer, inspection(None, LAT + 0.001, LNG), analysis("metro fire"))
+    close = assign(clusterer, inspection(None, LAT + 0.0002, LNG), analysis())
+    assert by_company["rule"] == "nearby" and by_company["site"]["id"] == site["id"]
+    assert close["rule"] == "nearby" and close["site"]["id"] == site["id"]
+
+
+def test_unnamed_photo_without_company_beyond_gps_only_distance_starts_a_site(clusterer):
+    site = assign(clusterer, inspection("ABC Diner", LAT, LNG), analysis("Metro Fire"))["site"]
+    result = assign(clusterer, inspection(None, LAT + 0.001, LNG), analysis())
+    assert result["created"]
+    assert result["site"]["id"] != site["id"]
+
+
+def test_known_equipment_number_matches_without_gps(clusterer):
+    site = assign(clusterer, inspection("ABC Diner", LAT, LNG), analysis(fe_number="FE-1001"))["site"]
+    result = assign(clusterer, inspection(None), analysis(fe_number="fe-1001"))
+    assert result["rule"] == "equipment"
+    assert result["site"]["id"] == site["id"]
+
+
+def test_equipment_number_at_a_differently_named_site_does_not_match(clusterer):
+    assign(clusterer, inspection("ABC Diner", LAT, LNG), analysis(fe_number="12"))
+    result = assign(clusterer, inspection("XYZ Bakery", LAT + 0.05, LNG), analysis(fe_number="12"))
+    assert result["created"]
+
+
+def test_name_matches_without_gps(clusterer):
+    site = assign(clusterer, inspection("ABC Diner", LAT, LNG), analysis())["site"]
+    result = assign(clusterer, inspection("abc diner llc"), analysis())
+    assert result["rule"] == "name"
+    assert result["site"]["id"] == site["id"]
+
+
+def test_sites_are_per_user(clusterer):
+    assign(clusterer, inspection("ABC Diner", LAT, LNG), analysis())
+    result = assign(clusterer, inspection("ABC Diner", LAT, LNG, user_id="user-2"), analysis())
+    assert result["created"]
+
+
+def test_nothing_to_cluster_on_leaves_the_inspection_unassigned(clusterer):
+    assert assign(clusterer, inspection(None), analysis()) is None
+    assert clusterer.stats()["unassigned"] == 1
+
+
+def test_concurrent_first_photos_of_a_new_site_create_one_site(clusterer):
+    async def run():
+        return await asyncio.gather(*(
+            clusterer.assign(inspection("ABC Diner", LAT + i * 0.0001, LNG), analysis()) for i in range(5)
+        ))
+
+    results = asyncio.run(run())
+    assert len({result["site"]["id"] for result in results}) == 1
+    assert sum(result["created"] for result in results) == 1
+
+
+def test_digest_collects_pending_inspections_until_claimed(clusterer):
+    site = assign(clusterer, inspection("ABC Diner", LAT, LNG), analysis())["site"]
+
+    async def run():
+        await clusterer.queue_digest(site["id"], "insp-a", timedelta(0))
+        await clusterer.queue_digest(site["id"], "insp-b", timedelta(minutes=15))
+        claimed = await clusterer.claim_due_digest()
+        again = await clusterer.claim_due_digest()
+        return claimed, again
+
+    claimed, again = asyncio.run(run())
+    assert claimed["pending_inspection_ids"] == ["insp-a", "insp-b"]
+    assert again is None
+    assert clusterer.stats()["digests_claimed"] == 1
+
+
+def test_digest_is_not_claimed_before_it_is_due(clusterer):
+    site = assign(clusterer, inspection("ABC Diner", LAT, LNG), analysis())["site"]
+
+    async def run():
+        await clusterer.queue_digest(site["id"], "insp-a", timedelta(minutes=15))
+        return await clusterer.claim_due_digest()
+
+    assert asyncio.run(run()) is None
@@ -0,0 +1,101 @@
+from datetime import datetime
+
+import pytest
+
+import geo
+from site_index import SiteIndex, normalize_business_name
+
+# ~111 m per 0.001 degree of latitude
+LAT, LNG = 40.7128, -74.0060
+
+
+def inspection(name, lat=LAT, lng=LNG, created_at=None, location=None):
+    return {
+        "business_name": name,
+        "gps_data": {"latitude": lat, "longitude": lng},
+        "created_at": created_at,
+        "location": location
+    }
+
+
+@pytest.mark.parametrize("name, key", [
+    ("The ABC Co.", "abc"),
+    ("ABC Company, Inc.", "abc"),
+    ("Joe's Diner LLC", "joes diner"),
+    ("The Company", "the company"),
+    (None, ""),
+])
+def test_normalize_business_name(name, key):
+    assert normalize_business_name(name) == key
+
+
+def test_same_business_nearby_merges_into_one_site_at_the_mean_position():
+    index = SiteIndex(merge_distance_m=150)
+    first = index.add(inspection("ABC Diner", LAT, LNG))
+    second = index.add(inspection("abc diner inc", LAT + 0.0008, LNG))
+    assert first == second
+    site = index.sites[first]
+    assert site["inspection_count"] == 2
+    assert site["lat"] == pytest.approx(LAT + 0.0004)
+
+
+def test_other_business_or_distant_branch_gets_its_own_site():
+    index = SiteIndex(merge_distance_m=150)
+    diner = index.add(inspection("ABC Diner"))
+    bakery = index.add(inspection("XYZ Bakery", LAT + 0.0001, LNG))
+    branch = index.add(inspection("ABC Diner", LAT + 0.01, LNG))
+    assert len({diner, bakery, branch}) == 3
+
+
+def test_merge_works_across_geohash_cell_edges():
+    index = SiteIndex(precision=7, merge_distance_m=150)
+    min_lat, min_lng, max_lat, max_lng = geo.decode_bounds(geo.encode(LAT, LNG, 7))
+    west = index.add(inspection("ABC Diner", LAT, min_lng + 0.00005))
+    east = index.add(inspection("ABC Diner", LAT, min_lng - 0.00005))
+    assert geo.encode(LAT, min_lng + 0.00005, 7) != geo.encode(LAT, min_lng - 0.00005, 7)
+    assert west == east
+
+
+def test_inspections_without_name_or_valid_gps_are_ignored():
+    index = SiteIndex()
+    assert index.add(inspection("")) is None
+    assert index.add({"business_name": "ABC Diner", "gps_data": None}) is None
+    assert index.add(inspection("ABC Diner", 0, 0)) is None
+    assert index.sites == {}
+
+
+def test_latest_inspection_names_the_site():
+    index = SiteIndex()
+    site_id = index.add(inspection("ABC Diner", created_at=datetime(2024, 1, 1), location="1 Main St"))
+    index.add(inspection("ABC Diner Inc.", created_at=datetime(2024, 6, 1)))
+    index.add(inspection("The ABC Diner", created_at=datetime(2023, 1, 1), location="Old address"))
+    site = index.sites[site_id]
+    assert site["name"] == "ABC Diner Inc."
+    assert site["address"] == "1 Main St"
+    assert site["last_inspected_at"] == datetime(2024, 6, 1)
+
+
+def test_nearby_filters_by_radius_and_sorts_by_distance():
+    index = SiteIndex()
+    index.add(inspection("Far Cafe", LAT + 0.004, LNG))
+    index.add(inspection("Near Cafe", LAT + 0.001, LNG))
+    index.add(inspection("Other Town Cafe", LAT + 0.5, LNG))
+
+    results = index.nearby(LAT, LNG, 1000)
+    assert [site["name"] for site in results] == ["Near Cafe", "Far Cafe"]
+    assert results[0]["distance_m"] == pytest.approx(111, abs=2)
+    assert [site["name"] for site in index.nearby(LAT, LNG, 200)] == ["Near Cafe"]
+    assert len(index.nearby(LAT, LNG, 1000, limit=1)) == 1
+    assert index.stats()["queries"] == 3
+
+
+def test_remove_decrements_and_drops_the_last_inspection():
+    index = SiteIndex()
+    index.add(inspection("ABC Diner"))
+    index.add(inspection("ABC Diner", LAT + 0.0002, LNG))
+    index.remove(inspection("ABC Diner"))
+    assert [site["inspection_count"] for site in index.sites.values()] == [1]
+    index.remove(inspection("ABC Diner", LAT + 0.0002, LNG))
+    assert index.sites == {}
+    assert index.nearby(LAT, LNG, 1000) == []
+    assert index.stats()["buckets"] == 0
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+import pytest
+
+from tag_dates import parse_tag_date
+
+
+@pytest.mark.parametrize("raw_text, expected", [
+    ("ANNUAL INSP 03/15/2024", {"year": "2024", "month": "3", "day": "15"}),
+    ("2024-03-15", {"year": "2024", "month": "3", "day": "15"}),
+    ("15 MARCH 2024", {"year": "2024", "month": "3", "day": "15"}),
+    ("MAR 2024", {"year": "2024", "month": "3"}),
+    ("MAR '24", {"year": "2024", "month": "3"}),
+    ("INSP 03/24", {"year": "2024", "month": "3"}),
+    ("SERVICED 3/15/24", {"year": "2024", "month": "3", "day": "15"}),
+    ("Date: 12/22", {"year": "2022", "month": "12"}),
+    ("ABC Fire 555-1234  INSP 03/2024", {"year": "2024", "month": "3"}),
+    ("INSP 03/24   5/20 LB ABC", {"year": "2024", "month": "3"}),
+    ("Punched: MAR 2023", {"year": "2023", "month": "3"}),
+])
+def test_printed_dates_are_parsed(raw_text, expected):
+    parsed = parse_tag_date(raw_text)
+    assert parsed is not None
+    assert {key: parsed.get(key) for key in ("year", "month", "day") if key in parsed} == expected
+
+
+@pytest.mark.parametrize("raw_text", [
+    "5/20 LB ABC",
+    "Model 2.5.20",
+    "Phone 555-12-2024",
+    "Tag # 12/18",
+    "03/24",
+    "Market St 12/18",
+    "Capacity 10 KG 3/15/24",
+    "Serial 12.3.2024.7",
+])
+def test_numbers_that_only_look_like_dates_fall_through_to_the_model(raw_text):
+    assert parse_tag_date(raw_text) is None
+
+
+def test_conflicting_and_future_dates_fall_through_to_the_model():
+    assert parse_tag_date("INSP 03/15/2024  INSP 04/10/2023") is None
+    assert parse_tag_date(f"INSP 01/01/{datetime.utcnow().year + 1}") is None
+    assert parse_tag_date("JAN FEB MAR APR MAY JUN 2024") is None
+    assert parse_tag_date("unknown") is None
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+import server
+
+
+@pytest.mark.parametrize("raw_text", [
+    "No visible text on the fire extinguisher tag, only punched holes",
+    "The image shows a fire extinguisher tag with no text readable",
+    "ANNUAL INSP  ABC FIRE PROTECTION  03/2024",
+    "Punched: MAR 2023",
+    "2024",
+    "No text",
+    "Blurry image",
+    "unknown",
+    "",
+    # Tags that only show who serviced them, or that OCR could not make sense of
+    "KOORSEN 317-555-1234 AE 12345",
+    "ACME PROTECTION CO (555) 123-4567",
+    "l1I| ~~ 0O8 ,. rn",
+])
+def test_tags_and_unreadable_text_pass_the_gate(raw_text):
+    assert server.looks_like_inspection_tag(raw_text)
+
+
+def test_tag_keywords_match_whole_words():
+    assert not server.TAG_KEYWORD_PATTERN.search("this is a vintage poster of a stage")
+    assert server.TAG_KEYWORD_PATTERN.search("inspected and punched, see tags")
+
+
+@pytest.mark.parametrize("raw_text", [
+    "This is not a fire extinguisher tag, it is an exit sign",
+    "Not fire equipment",
+    "No inspection tag visible; shows a parking permit",
+    "Safety notice",
+    "Equipment label: Model X200",
+    # "tag" inside "vintage" and "stage" is not tag vocabulary
+    "Equipment label on a vintage stage light",
+])
+def test_text_describing_something_else_is_gated(raw_text):
+    assert not server.looks_like_inspection_tag(raw_text)
+
+
+def test_layered_analysis_runs_field_layers_for_a_tag_with_unreadable_text(monkeypatch):
+    field_calls = []
+
+    async def fake_ocr(data_url):
+        return "No visible text on the fire extinguisher tag, only punched holes"
+
+    async def fake_routed(prompt, data_url, layer, context=None):
+        field_calls.append(layer)
+        return "unknown"
+
+    monkeypatch.setattr(server, "extract_raw_text", fake_ocr)
+    monkeypatch.setattr(server, "analyze_routed_layer", fake_routed)
+    monkeypatch.setattr(server, "TAG_GATE_ENABLED", True)
+    asyncio.run(server.run_layered_analysis("data:image/jpeg;base64,"))
+    assert len(field_calls) == 8
+
+
+def test_layered_analysis_skips_field_layers_for_a_non_tag(monkeypatch):
+    field_calls = []
+
+    async def fake_ocr(data_url):
+        return "Not fire equipment"
+
+    async def fake_routed(prompt, data_url, layer, context=None):
+        field_calls.append(layer)
+        return "unknown"
+
+    monkeypatch.setattr(server, "extract_raw_text", fake_ocr)
+    monkeypatch.setattr(server, "analyze_routed_layer", fake_routed)
+    monkeypatch.setattr(server, "TAG_GATE_ENABLED", True)
+    result = asyncio.run(server.run_layered_analysis("data:image/jpeg;base64,"))
+    assert field_calls == []
+    assert result["tag_detected"] is False
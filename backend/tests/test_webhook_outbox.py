@@ -0,0 +1,188 @@
+import asyncio
+import base64
+import json
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from blob_store import LocalBlobStore
+from webhook_outbox import WebhookOutbox
+
+PAYLOAD = {"inspection_id": "i1", "email_summary": {"image_included": True}}
+
+
+class FailingBlobStore:
+    async def get(self, digest):
+        raise RuntimeError("blob store unavailable")
+
+
+def make_outbox(blob_store, handler=None):
+    collection = AsyncMongoMockClient()["outbox_test"]["webhook_outbox"]
+    outbox = WebhookOutbox(collection, "https://n8n.example/webhook", blob_store=blob_store)
+    outbox.client = httpx.AsyncClient(transport=httpx.MockTransport(handler or (lambda request: httpx.Response(200))))
+    return outbox
+
+
+async def deliver_due(outbox):
+    events = await outbox._claim()
+    if events:
+        await outbox._deliver(events)
+    return events
+
+
+def test_large_images_are_not_stored_in_the_outbox(tmp_path):
+    blob_store = LocalBlobStore(str(tmp_path))
+    outbox = make_outbox(blob_store)
+
+    async def run():
+        image = await blob_store.put(b"\xff\xd8\xff" + b"\0" * (20 * 1024 * 1024))
+        event_id = await outbox.enqueue(dict(PAYLOAD), image_sha256=image["sha256"])
+        return image, await outbox.collection.find_one({"id": event_id})
+
+    image, event = asyncio.run(run())
+    assert event["image_sha256"] == image["sha256"]
+    assert "image_base64" not in event["payload"]
+    assert len(json.dumps(event["payload"])) < 1024
+
+
+def test_image_is_inlined_at_delivery(tmp_path):
+    blob_store = LocalBlobStore(str(tmp_path))
+    posted = []
+
+    def handler(request):
+        posted.append(json.loads(request.content))
+        return httpx.Response(200)
+
+    outbox = make_outbox(blob_store, handler)
+
+    async def run():
+        image = await blob_store.put(b"\xff\xd8\xffimage")
+        event_id = await outbox.enqueue(dict(PAYLOAD), image_sha256=image["sha256"])
+        await deliver_due(outbox)
+        return await outbox.collection.find_one({"id": event_id})
+
+    event = asyncio.run(run())
+    assert base64.b64decode(posted[0]["image_base64"]) == b"\xff\xd8\xffimage"
+    assert event["status"] == "delivered"
+
+
+def test_missing_image_is_delivered_without_it(tmp_path):
+    posted = []
+
+    def handler(request):
+        posted.append(json.loads(request.content))
+        return httpx.Response(200)
+
+    outbox = make_outbox(LocalBlobStore(str(tmp_path)), handler)
+
+    async def run():
+        await outbox.enqueue(json.loads(json.dumps(PAYLOAD)), image_sha256="0" * 64)
+        await deliver_due(outbox)
+
+    asyncio.run(run())
+    assert "image_base64" not in posted[0]
+    assert posted[0]["email_summary"]["image_included"] is False
+    assert outbox.missing_images == 1
+
+
+def test_unexpected_errors_reschedule_the_event():
+    outbox = make_outbox(FailingBlobStore())
+
+    async def run():
+        event_id = await outbox.enqueue(dict(PAYLOAD), image_sha256="a" * 64)
+        await deliver_due(outbox)
+        return await outbox.collection.find_one({"id": event_id})
+
+    event = asyncio.run(run())
+    assert event["status"] == "pending"
+    assert event["attempts"] == 1
+    assert "RuntimeError" in event["last_error"]
+
+
+def test_expired_lease_is_claimed_again(tmp_path):
+    outbox = make_outbox(LocalBlobStore(str(tmp_path)))
+
+    async def run():
+        event_id = await outbox.enqueue(dict(PAYLOAD))
+        # Claimed by a delivery that never settled
+        assert len(await outbox._claim()) == 1
+        assert await outbox._claim() == []
+        await outbox.collection.update_one(
+            {"id": event_id}, {"$set": {"claimed_at": datetime.utcnow() - outbox.lease - timedelta(seconds=1)}}
+        )
+        await deliver_due(outbox)
+        return await outbox.collection.find_one({"id": event_id})
+
+    event = asyncio.run(run())
+    assert event["status"] == "delivered"
+    assert outbox.leases_expired == 1
+
+
+@pytest.mark.parametrize("status_code", [500, 429])
+def test_http_errors_back_off_until_dead(tmp_path, status_code):
+    outbox = make_outbox(LocalBlobStore(str(tmp_path)), lambda request: httpx.Response(status_code))
+    outbox.max_attempts = 2
+    outbox.backoff = lambda attempts: 0
+
+    async def run():
+        event_id = await outbox.enqueue(dict(PAYLOAD))
+        await deliver_due(outbox)
+        await deliver_due(outbox)
+        return await outbox.collection.find_one({"id": event_id})
+
+    event = asyncio.run(run())
+    assert event["status"] == "dead"
+    assert event["attempts"] == 2
+
+
+def test_stats_measure_the_posted_body_with_its_image(tmp_path):
+    blob_store = LocalBlobStore(str(tmp_path))
+    posted_sizes = []
+
+    def handler(request):
+        posted_sizes.append(len(request.content))
+        return httpx.Response(200)
+
+    outbox = make_outbox(blob_store, handler)
+
+    async def run():
+        image = await blob_store.put(b"\xff\xd8\xff" + b"\1" * 30000)
+        await outbox.enqueue(dict(PAYLOAD), image_sha256=image["sha256"])
+        await deliver_due(outbox)
+        return await outbox.stats()
+
+    stats = asyncio.run(run())
+    assert stats["payload_bytes_total"] == posted_sizes[0] > 40000
+    assert stats["payload_bytes_avg"] == stats["payload_bytes_max"] == posted_sizes[0]
+
+
+def test_events_with_images_are_never_batched(tmp_path):
+    blob_store = LocalBlobStore(str(tmp_path))
+    posted = []
+
+    def handler(request):
+        posted.append(json.loads(request.content))
+        return httpx.Response(200)
+
+    outbox = make_outbox(blob_store, handler)
+    outbox.batch_size = 10
+
+    async def run():
+        image = await blob_store.put(b"\xff\xd8\xffimage")
+        await outbox.enqueue({"inspection_id": "plain-1"})
+        await outbox.enqueue({"inspection_id": "photo-1"}, image_sha256=image["sha256"])
+        await outbox.enqueue({"inspection_id": "photo-2"}, image_sha256=image["sha256"])
+        await outbox.enqueue({"inspection_id": "plain-2"})
+        while await deliver_due(outbox):
+            pass
+
+    asyncio.run(run())
+    posts = [
+        sorted(event["inspection_id"] for event in body["events"]) if body.get("batch") else [body["inspection_id"]]
+        for body in posted
+    ]
+    assert sorted(posts) == [["photo-1"], ["photo-2"], ["plain-1", "plain-2"]]
+    assert all("image_base64" in body for body in posted if not body.get("batch") and "photo" in body["inspection_id"])
+    assert outbox.batches_sent == 1
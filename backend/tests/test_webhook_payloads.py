@@ -0,0 +1,80 @@
+import asyncio
+import time
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import server
+
+ANALYSIS = {
+    "condition": "Good",
+    "extinguisher_type": "ABC",
+    "requires_attention": False,
+    "equipment_numbers": {"fe_number": "12"},
+    "service_company": {"name": "ABC Fire"}
+}
+IMAGE = {"sha256": "f" * 64, "size": 2048, "content_type": "image/jpeg"}
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    events = []
+
+    async def fake_enqueue(payload, event_type="new_tag_submitted", image_sha256=None):
+        events.append({"payload": payload, "image_sha256": image_sha256})
+        return "event-id"
+
+    monkeypatch.setattr(server, "N8N_WEBHOOK_URL", "https://n8n.example/webhook")
+    monkeypatch.setattr(server.webhook_outbox, "enqueue", fake_enqueue)
+    return events
+
+
+def notify():
+    request = server.InspectionMetadata(location="Lobby", business_name="ABC Corp")
+    asyncio.run(server.send_new_tag_notification("insp-1", {"id": "demo-user"}, request, ANALYSIS, IMAGE))
+
+
+def test_compact_requires_a_public_base_url():
+    assert server.resolve_webhook_format("compact", "") == "full"
+    assert server.resolve_webhook_format("compact", "https://scanner.example") == "compact"
+    assert server.resolve_webhook_format("full", "") == "full"
+
+
+def test_full_payload_attaches_the_image_at_delivery(queued, monkeypatch):
+    monkeypatch.setattr(server, "WEBHOOK_FORMAT", "full")
+    notify()
+    event = queued[0]
+    assert event["image_sha256"] == IMAGE["sha256"]
+    assert "image_base64" not in event["payload"]
+    assert event["payload"]["email_summary"]["condition"] == "Good"
+
+
+def test_compact_payload_links_a_signed_absolute_url(queued, monkeypatch):
+    monkeypatch.setattr(server, "WEBHOOK_FORMAT", "compact")
+    monkeypatch.setattr(server, "PUBLIC_BASE_URL", "https://scanner.example")
+    notify()
+    event = queued[0]
+    payload = event["payload"]
+    assert event["image_sha256"] is None
+    assert payload["payload_format"] == "compact"
+    assert payload["email_summary"]["image_included"] is False
+    # Fields duplicated from "analysis" are dropped from the summary only
+    assert "condition" not in payload["email_summary"]
+    assert payload["analysis"]["condition"] == "Good"
+
+    url = urlparse(payload["image_url"])
+    assert f"{url.scheme}://{url.netloc}" == "https://scanner.example"
+    assert url.path == "/api/inspections/insp-1/image"
+    query = parse_qs(url.query)
+    assert server.verify_image_signature("insp-1", int(query["expires"][0]), query["signature"][0])
+
+
+def test_image_signatures_reject_tampering_and_expiry():
+    url, expires = server.signed_image_url("insp-1")
+    signature = parse_qs(urlparse(url).query)["signature"][0]
+    assert server.verify_image_signature("insp-1", expires, signature)
+    assert not server.verify_image_signature("insp-2", expires, signature)
+    assert not server.verify_image_signature("insp-1", expires + 1, signature)
+
+    past = int(time.time()) - 10
+    assert not server.verify_image_signature("insp-1", past, server.image_url_signature("insp-1", past))
@@ -0,0 +1,248 @@
+"""Durable outbox for outbound N8N webhook notifications.
+
+The request path only inserts the payload into the `webhook_outbox` collection.
+A background worker claims due events, posts them with a pooled async HTTP
+client, and retries failures with jittered exponential backoff until
+`max_attempts`, after which the event is parked in the `dead` state. When more
+than one event is due at once they can be coalesced into a single batched post
+(`batch_size` > 1). Events that carry an image are always posted on their own,
+so a batch never inlines several photos into one request.
+
+Images are not stored in the outbox: an event only records the blob store
+digest (`image_sha256`) and the image is inlined as `image_base64` when the
+event is posted, so a large photo cannot push the document past the 16 MB BSON
+limit. An event claimed for delivery is handed back to the worker if it is not
+settled within `lease_seconds`. Payload size stats measure the body as posted,
+image included.
+"""
+import asyncio
+import base64
+import json
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import httpx
+from pymongo import ReturnDocument
+
+
+class WebhookOutbox:
+    """Outbox-backed webhook delivery with retries and a dead-letter state."""
+
+    def __init__(
+        self,
+        collection,
+        url: Optional[str],
+        max_attempts: int = 8,
+        base_delay: float = 2.0,
+        max_delay: float = 600.0,
+        batch_size: int = 1,
+        poll_interval: float = 5.0,
+        timeout: float = 15.0,
+        blob_store=None,
+        lease_seconds: Optional[float] = None
+    ):
+        self.collection = collection
+        self.blob_store = blob_store
+        self.url = url
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.lease = timedelta(seconds=lease_seconds if lease_seconds is not None else max(60.0, 4 * timeout))
+        self.client: Optional[httpx.AsyncClient] = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.enqueued = 0
+        self.delivered = 0
+        self.failed_attempts = 0
+        self.batches_sent = 0
+        self.events_posted = 0
+        self.payload_bytes_total = 0
+        self.payload_bytes_max = 0
+        self.missing_images = 0
+        self.leases_expired = 0
+
+    async def enqueue(
+        self, payload: Dict[str, Any], event_type: str = "new_tag_submitted", image_sha256: Optional[str] = None
+    ) -> str:
+        """Persists a payload for delivery and wakes the worker.
+
+        With `image_sha256`, the blob is read back and sent as `image_base64` at delivery.
+        """
+        event_id = str(uuid.uuid4())
+        now = datetime.utcnow()
+        event = {
+            "id": event_id,
+            "event_type": event_type,
+            "payload": payload,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now
+        }
+        if image_sha256:
+            event["image_sha256"] = image_sha256
+        await self.collection.insert_one(event)
+        self.enqueued += 1
+        self._wake.set()
+        return event_id
+
+    async def start(self):
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5)
+        )
+        # Events claimed by a worker that died mid-delivery go back to pending
+        await self.collection.update_many(
+            {"status": "delivering"},
+            {"$set": {"status": "pending", "next_attempt_at": datetime.utcnow()}}
+        )
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        if self.client:
+            await self.client.aclose()
+
+    def backoff(self, attempts: int) -> float:
+        """Full-jitter exponential backoff in seconds for the given attempt count."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempts)))
+
+    async def _claim(self) -> List[Dict[str, Any]]:
+        events = []
+        for _ in range(self.batch_size):
+            now = datetime.utcnow()
+            query = {"$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now}},
+                # Claimed but never settled (e.g. the update after a post failed)
+                {"status": "delivering", "claimed_at": {"$lte": now - self.lease}}
+            ]}
+            if events:
+                # Only image-free events join a batch
+                query["image_sha256"] = {"$exists": False}
+            event = await self.collection.find_one_and_update(
+                query,
+                {"$set": {"status": "delivering", "claimed_at": now}},
+                sort=[("next_attempt_at", 1)],
+                return_document=ReturnDocument.BEFORE
+            )
+            if not event:
+                break
+            if event["status"] == "delivering":
+                self.leases_expired += 1
+                print(f"⏰ Webhook event {event['id']} lease expired, retrying delivery")
+            events.append(event)
+            if event.get("image_sha256"):
+                break
+        return events
+
+    async def _run(self):
+        while True:
+            try:
+                # Clear before claiming so an enqueue during the claim is not missed
+                self._wake.clear()
+                events = await self._claim()
+                if not events:
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._deliver(events)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Webhook outbox worker error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _payload(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """The event payload with its image (if any) inlined from the blob store."""
+        payload = event["payload"]
+        if not event.get("image_sha256") or self.blob_store is None:
+            return payload
+        data = await self.blob_store.get(event["image_sha256"])
+        if data is None:
+            self.missing_images += 1
+            print(f"⚠️ Image {event['image_sha256'][:12]}... for webhook event {event['id']} is gone, sending without it")
+            if isinstance(payload.get("email_summary"), dict):
+                payload["email_summary"]["image_included"] = False
+            return payload
+        return {**payload, "image_base64": base64.b64encode(data).decode("ascii")}
+
+    async def _body(self, events: List[Dict[str, Any]]) -> Dict[str, Any]:
+        payloads = [await self._payload(event) for event in events]
+        if len(payloads) == 1:
+            return payloads[0]
+        return {
+            "batch": True,
+            "count": len(payloads),
+            "events": payloads
+        }
+
+    async def _deliver(self, events: List[Dict[str, Any]]):
+        ids = [event["id"] for event in events]
+        error = None
+        try:
+            content = json.dumps(await self._body(events), default=str).encode("utf-8")
+            self.events_posted += len(events)
+            self.payload_bytes_total += len(content)
+            self.payload_bytes_max = max(self.payload_bytes_max, len(content))
+            response = await self.client.post(
+                self.url, content=content, headers={"Content-Type": "application/json"}
+            )
+        except Exception as e:
+            # Not only network errors: a failing blob read or unserializable payload is retried
+            # the same way instead of leaving the events claimed
+            error = f"{type(e).__name__}: {e}"
+        else:
+            if 200 <= response.status_code < 300:
+                await self.collection.update_many(
+                    {"id": {"$in": ids}},
+                    {"$set": {"status": "delivered", "delivered_at": datetime.utcnow()}, "$inc": {"attempts": 1}}
+                )
+                self.delivered += len(events)
+                if len(events) > 1:
+                    self.batches_sent += 1
+                print(f"✅ Delivered {len(events)} webhook event(s) to N8N")
+                return
+            error = f"HTTP {response.status_code}: {response.text[:200]}"
+
+        print(f"⚠️ Webhook delivery failed ({error})")
+        self.failed_attempts += len(events)
+        for event in events:
+            attempts = event.get("attempts", 0) + 1
+            if attempts >= self.max_attempts:
+                update = {"status": "dead", "attempts": attempts, "last_error": error, "dead_at": datetime.utcnow()}
+                print(f"☠️ Webhook event {event['id']} moved to dead-letter after {attempts} attempts")
+            else:
+                update = {
+                    "status": "pending",
+                    "attempts": attempts,
+                    "last_error": error,
+                    "next_attempt_at": datetime.utcnow() + timedelta(seconds=self.backoff(attempts))
+                }
+            await self.collection.update_one({"id": event["id"]}, {"$set": update})
+
+    async def stats(self) -> Dict[str, Any]:
+        pending = await self.collection.count_documents({"status": {"$in": ["pending", "delivering"]}})
+        dead = await self.collection.count_documents({"status": "dead"})
+        return {
+            "configured": bool(self.url),
+            "pending": pending,
+            "dead_letter": dead,
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "failed_attempts": self.failed_attempts,
+            "batches_sent": self.batches_sent,
+            # Bytes actually posted (images inlined), per event and for the largest single post
+            "payload_bytes_total": self.payload_bytes_total,
+            "payload_bytes_avg": self.payload_bytes_total // self.events_posted if self.events_posted else 0,
+            "payload_bytes_max": self.payload_bytes_max,
+            "missing_images": self.missing_images,
+            "leases_expired": self.leases_expired
+        }
@@ -5,11 +5,43 @@ Fixes the slow query issues identified in MongoDB logs.
 """
 
 import os
-from pymongo import MongoClient, ASCENDING
+from pymongo import MongoClient, ASCENDING, DESCENDING, GEOSPHERE, UpdateOne
 from dotenv import load_dotenv
 
 load_dotenv()
 
+def gps_to_point(gps_data):
+    """GeoJSON Point for a stored gps_data dict (same rules as geo.geojson_point in the backend)."""
+    try:
+        lat = float(gps_data["latitude"])
+        lng = float(gps_data["longitude"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not -90 <= lat <= 90 or not -180 <= lng <= 180 or (lat == 0 and lng == 0):
+        return None
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+def backfill_location_points(inspections_collection, batch_size=500):
+    """Sets location_point on inspections that have gps_data but predate the field."""
+    updates = []
+    updated = 0
+    skipped = 0
+    cursor = inspections_collection.find(
+        {"gps_data": {"$ne": None}, "location_point": {"$exists": False}}, {"_id": 1, "gps_data": 1}
+    )
+    for item in cursor:
+        point = gps_to_point(item["gps_data"])
+        if point is None:
+            skipped += 1
+            continue
+        updates.append(UpdateOne({"_id": item["_id"]}, {"$set": {"location_point": point}}))
+        if len(updates) >= batch_size:
+            updated += inspections_collection.bulk_write(updates, ordered=False).modified_count
+            updates = []
+    if updates:
+        updated += inspections_collection.bulk_write(updates, ordered=False).modified_count
+    print(f"  - backfilled {updated} inspections, skipped {skipped} with invalid GPS data")
+
 def create_indexes():
     """Create database indexes to improve query performance."""
     try:
@@ -25,6 +57,10 @@ def create_indexes():
         inspections_collection = db["inspections"]
         users_collection = db["users"]
         sessions_collection = db["sessions"]
+        analysis_cache_collection = db["analysis_cache"]
+        webhook_outbox_collection = db["webhook_outbox"]
+        inspection_batches_collection = db["inspection_batches"]
+        sites_collection = db["sites"]
         
         print("📊 Creating database indexes for performance optimization...")
         
@@ -40,6 +76,10 @@ def create_indexes():
         print("📍 Creating index: inspections.inspection_date")
         inspections_collection.create_index([("inspection_date", ASCENDING)])
         
+        # 3b. Create compound index for paginated inspection lists (keyset on created_at, _id)
+        print("📍 Creating index: inspections.user_id + created_at + _id")
+        inspections_collection.create_index([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)])
+        
         # 4. Create index on email for users collection
         print("📍 Creating index: users.email")
         users_collection.create_index([("email", ASCENDING)], unique=True)
@@ -52,11 +92,52 @@ def create_indexes():
         print("📍 Creating index: sessions.user_id")
         sessions_collection.create_index([("user_id", ASCENDING)])
         
+        # 7. Create unique lookup index and TTL eviction for the analysis cache
+        print("📍 Creating index: analysis_cache.key (unique) + expires_at (TTL)")
+        analysis_cache_collection.create_index([("key", ASCENDING)], unique=True)
+        analysis_cache_collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+        
+        # 8. Create indexes for the webhook outbox worker; delivered events expire after 7 days
+        print("📍 Creating index: webhook_outbox.status + next_attempt_at, id, delivered_at (TTL)")
+        webhook_outbox_collection.create_index([("status", ASCENDING), ("next_attempt_at", ASCENDING)])
+        webhook_outbox_collection.create_index([("id", ASCENDING)], unique=True)
+        webhook_outbox_collection.create_index([("delivered_at", ASCENDING)], expireAfterSeconds=7 * 24 * 3600)
+        
+        # 9. Create indexes for batch submissions
+        print("📍 Creating index: inspection_batches.id (unique), inspections.batch_id")
+        inspection_batches_collection.create_index([("id", ASCENDING)], unique=True)
+        inspections_collection.create_index([("batch_id", ASCENDING)], sparse=True)
+        
+        # 10. Backfill GeoJSON points and create the geospatial index for /api/inspections/near and /bbox
+        print("📍 Creating index: inspections.user_id + location_point (2dsphere)")
+        backfill_location_points(inspections_collection)
+        inspections_collection.create_index([("user_id", ASCENDING), ("location_point", GEOSPHERE)])
+        
+        # 11. Create indexes for site clustering: nearest-site lookup, name/equipment matching, due digests
+        print("📍 Creating index: sites.id (unique), user_id + location (2dsphere), name_key, equipment_keys, digest_due_at; inspections.site_id")
+        sites_collection.create_index([("id", ASCENDING)], unique=True)
+        sites_collection.create_index([("user_id", ASCENDING), ("location", GEOSPHERE)])
+        sites_collection.create_index([("user_id", ASCENDING), ("name_key", ASCENDING), ("last_inspection_at", DESCENDING)])
+        sites_collection.create_index([("user_id", ASCENDING), ("equipment_keys", ASCENDING)])
+        sites_collection.create_index([("user_id", ASCENDING), ("last_inspection_at", DESCENDING)])
+        sites_collection.create_index([("digest_due_at", ASCENDING)], sparse=True)
+        inspections_collection.create_index([("site_id", ASCENDING)], sparse=True)
+        
+        # 12. Create multi-index hashing lookup for near-duplicate photos (perceptual hash chunks)
+        print("📍 Creating index: inspections.user_id + phash_chunks + created_at")
+        inspections_collection.create_index(
+            [("user_id", ASCENDING), ("phash_chunks", ASCENDING), ("created_at", DESCENDING)]
+        )
+        
+        # 13. Create unique lookup index on the inspection id (every route and job looks inspections up by id)
+        print("📍 Creating index: inspections.id (unique)")
+        inspections_collection.create_index([("id", ASCENDING)], unique=True)
+        
         print("✅ Database indexes created successfully!")
         
         # Display index information
         print("\n📋 Current indexes:")
-        for collection_name, collection in [("inspections", inspections_collection), ("users", users_collection), ("sessions", sessions_collection)]:
+        for collection_name, collection in [("inspections", inspections_collection), ("users", users_collection), ("sessions", sessions_collection), ("analysis_cache", analysis_cache_collection), ("webhook_outbox", webhook_outbox_collection), ("inspection_batches", inspection_batches_collection), ("sites", sites_collection)]:
             indexes = list(collection.list_indexes())
             print(f"\n🗂️ {collection_name} collection:")
             for idx in indexes:
@@ -15,6 +15,10 @@ const App = () => {
   const [notes, setNotes] = useState('');
   const [inspectionResult, setInspectionResult] = useState(null);
   const [inspections, setInspections] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+  const [inspectionSummary, setInspectionSummary] = useState(null);
+  const [isExporting, setIsExporting] = useState(false);
   const [dueInspections, setDueInspections] = useState([]);
   const [isAnalyzing, setIsAnalyzing] = useState(false);
   const [editingInspection, setEditingInspection] = useState(null);
@@ -51,12 +55,19 @@ const App = () => {
 
   const backendUrl = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
 
+  // Images are served from the blob store; older records still carry inline base64
+  const inspectionImageSrc = (inspection) => (
+    inspection.image_url
+      ? `${backendUrl}${inspection.image_url}`
+      : `data:image/jpeg;base64,${inspection.image_base64}`
+  );
+
   // CSV Export Functions
-  const generateCSV = () => {
+  const generateCSV = (rows) => {
     const headers = ['Date', 'Location', 'Type', 'Condition', 'Last Inspection', 'Next Due', 'Service Company', 'Company Phone', 'Equipment Numbers', 'Service Type', 'GPS Location', 'Status', 'Notes'];
     const csvRows = [headers.join(',')];
 
-    inspections.forEach(inspection => {
+    rows.forEach(inspection => {
       let parsed = {};
       try {
         if (typeof inspection.gemini_response === 'object') {
@@ -222,24 +233,104 @@ const App = () => {
   };
 
 
-  const loadInspections = async () => {
+  // The list endpoint is paginated: one page per request, X-Next-Cursor points at the next one
+  const fetchInspectionsPage = async (cursor, limit) => {
+    const sessionToken = localStorage.getItem('session_token');
+    const params = new URLSearchParams();
+    if (cursor) {
+      params.set('after', cursor);
+    }
+    if (limit) {
+      params.set('limit', limit);
+    }
+    const query = params.toString() ? `?${params.toString()}` : '';
+    const response = await fetch(`${backendUrl}/api/inspections${query}`, {
+      headers: {
+        'session-token': sessionToken
+      }
+    });
+    if (!response.ok) {
+      return null;
+    }
+    return { items: await response.json(), cursor: response.headers.get('X-Next-Cursor') };
+  };
+
+  // Every inspection, following the cursor to the last page (for exports)
+  const fetchAllInspections = async () => {
+    const all = [];
+    let cursor = null;
+    do {
+      const page = await fetchInspectionsPage(cursor, 500);
+      if (!page) {
+        throw new Error('Failed to fetch inspections');
+      }
+      all.push(...page.items);
+      cursor = page.cursor;
+    } while (cursor);
+    return all;
+  };
+
+  // Totals for the summary cards; the list itself only holds the pages loaded so far
+  const loadInspectionSummary = async () => {
     try {
       const sessionToken = localStorage.getItem('session_token');
-      const response = await fetch(`${backendUrl}/api/inspections`, {
+      const response = await fetch(`${backendUrl}/api/inspections/summary`, {
         headers: {
           'session-token': sessionToken
         }
       });
-
       if (response.ok) {
-        const data = await response.json();
-        setInspections(data);
+        setInspectionSummary(await response.json());
+      }
+    } catch (error) {
+      console.error('Failed to load inspection summary:', error);
+    }
+  };
+
+  const loadInspections = async () => {
+    loadInspectionSummary();
+    try {
+      const page = await fetchInspectionsPage(null);
+      if (page) {
+        setInspections(page.items);
+        setNextCursor(page.cursor);
       }
     } catch (error) {
       console.error('Failed to load inspections:', error);
     }
   };
 
+  const exportInspectionsCSV = async () => {
+    setIsExporting(true);
+    try {
+      const allInspections = await fetchAllInspections();
+      downloadCSV(generateCSV(allInspections), 'fire-safety-inspections.csv');
+    } catch (error) {
+      console.error('Failed to export inspections:', error);
+      showToast('Export failed, please try again', 'error');
+    } finally {
+      setIsExporting(false);
+    }
+  };
+
+  const loadMoreInspections = async () => {
+    if (!nextCursor || isLoadingMore) {
+      return;
+    }
+    setIsLoadingMore(true);
+    try {
+      const page = await fetchInspectionsPage(nextCursor);
+      if (page) {
+        setInspections(prev => prev.concat(page.items));
+        setNextCursor(page.cursor);
+      }
+    } catch (error) {
+      console.error('Failed to load more inspections:', error);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const loadDueInspections = async () => {
     try {
       const sessionToken = localStorage.getItem('session_token');
@@ -633,7 +724,7 @@ const App = () => {
         source: 'mobile_camera'
       };
 
-      const response = await fetch(`${backendUrl}/api/inspections`, {
+      const response = await fetch(`${backendUrl}/api/inspections?async=true`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -950,6 +1041,18 @@ const App = () => {
     );
   }
 
+  const loadMoreButton = nextCursor && (
+    <div className="text-center">
+      <button
+        onClick={loadMoreInspections}
+        disabled={isLoadingMore}
+        className="px-4 py-2 bg-white/10 hover:bg-white/20 text-white rounded-lg border border-white/20 transition-colors duration-300 disabled:opacity-50"
+      >
+        {isLoadingMore ? 'Loading...' : 'Load more inspections'}
+      </button>
+    </div>
+  );
+
   return (
     <div className="min-h-screen bg-black/80 backdrop-blur-md">
       {/* Background Image */}
@@ -1849,10 +1952,10 @@ const App = () => {
                           <label className="block text-white font-semibold mb-2">Reference Image:</label>
                           <div className="flex justify-center">
                             <img 
-                              src={`data:image/jpeg;base64,${inspection.image_base64}`} 
+                              src={inspectionImageSrc(inspection)} 
                               alt="Inspection reference"
                               className="max-w-sm max-h-64 object-contain rounded-lg border border-white/20 cursor-pointer hover:opacity-80 transition-opacity duration-300"
-                              onClick={() => setModalImage(`data:image/jpeg;base64,${inspection.image_base64}`)}
+                              onClick={() => setModalImage(inspectionImageSrc(inspection))}
                               title="Click to view full size"
                             />
                           </div>
@@ -2057,10 +2160,10 @@ const App = () => {
                       <div className="grid md:grid-cols-2 gap-4">
                         <div>
                           <img 
-                            src={`data:image/jpeg;base64,${inspection.image_base64}`}
+                            src={inspectionImageSrc(inspection)}
                             alt="Inspection"
                             className="w-full h-48 object-cover rounded-lg border border-white/20 cursor-pointer hover:opacity-80 transition-opacity duration-300"
-                            onClick={() => setModalImage(`data:image/jpeg;base64,${inspection.image_base64}`)}
+                            onClick={() => setModalImage(inspectionImageSrc(inspection))}
                             title="Click to view full size"
                           />
                         </div>
@@ -2166,6 +2269,7 @@ const App = () => {
                 ))}
               </div>
             )}
+            {loadMoreButton}
           </div>
         )}
 
@@ -2176,13 +2280,11 @@ const App = () => {
               <h2 className="text-2xl font-bold text-white">📊 Inspection Data</h2>
               <div className="flex space-x-2">
                 <button
-                  onClick={() => {
-                    const csvContent = generateCSV();
-                    downloadCSV(csvContent, 'fire-safety-inspections.csv');
-                  }}
-                  className="px-4 py-2 bg-green-500 hover:bg-green-600 text-white rounded-lg transition-colors duration-300"
+                  onClick={exportInspectionsCSV}
+                  disabled={isExporting}
+                  className="px-4 py-2 bg-green-500 hover:bg-green-600 disabled:opacity-50 text-white rounded-lg transition-colors duration-300"
                 >
-                  📥 Export CSV
+                  {isExporting ? '⏳ Exporting...' : '📥 Export CSV'}
                 </button>
                 <button
                   onClick={() => window.print()}
@@ -2197,18 +2299,18 @@ const App = () => {
             <div className="grid grid-cols-1 md:grid-cols-3 gap-4">
               <div className="bg-white/8 backdrop-blur-md rounded-xl p-4 border border-white/20">
                 <h3 className="text-lg font-semibold text-white mb-2">Total Inspections</h3>
-                <p className="text-2xl font-bold text-green-400">{inspections.length}</p>
+                <p className="text-2xl font-bold text-green-400">{inspectionSummary ? inspectionSummary.total : '…'}</p>
               </div>
               <div className="bg-white/8 backdrop-blur-md rounded-xl p-4 border border-white/20">
                 <h3 className="text-lg font-semibold text-white mb-2">This Month</h3>
                 <p className="text-2xl font-bold text-blue-400">
-                  {inspections.filter(i => new Date(i.inspection_date).getMonth() === new Date().getMonth()).length}
+                  {inspectionSummary ? inspectionSummary.this_month : '…'}
                 </p>
               </div>
               <div className="bg-white/8 backdrop-blur-md rounded-xl p-4 border border-white/20">
                 <h3 className="text-lg font-semibold text-white mb-2">Locations</h3>
                 <p className="text-2xl font-bold text-white">
-                  {new Set(inspections.map(i => i.location)).size}
+                  {inspectionSummary ? inspectionSummary.locations : '…'}
                 </p>
               </div>
             </div>
@@ -2332,7 +2434,7 @@ const App = () => {
                             </td>
                             <td className="px-4 py-3 text-sm">
                               <button
-                                onClick={() => setModalImage(`data:image/jpeg;base64,${inspection.image_base64}`)}
+                                onClick={() => setModalImage(inspectionImageSrc(inspection))}
                                 className="px-2 py-1 bg-blue-500/20 text-blue-400 text-xs rounded hover:bg-blue-500/30 transition-colors duration-300 mr-2"
                               >
                                 👁️ View
@@ -2352,6 +2454,7 @@ const App = () => {
                 </div>
               )}
             </div>
+            {loadMoreButton}
           </div>
         )}
 
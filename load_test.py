@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Concurrency load test for the inspections API.
+
+Checks that database access no longer serializes requests on the event loop,
+with two measurements:
+
+1. Throughput: the same list workload is run one request at a time and then with
+   N concurrent requests. If requests serialize, N concurrent requests finish no
+   faster than one at a time (speedup ~1x).
+2. Responsiveness: /api/health is probed while the concurrent workload runs. A
+   blocked event loop makes the probes wait for the in-flight queries.
+
+By default only read-only requests are sent. --allow-writes adds creates in
+Submit & Go mode (?async=true): every create is stored in the target database
+and analyzed in the background, which calls the model and queues the N8N
+notification. Only use it against a test deployment.
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import os
+import statistics
+import time
+
+import httpx
+
+
+def synthetic_jpeg() -> bytes:
+    """A small, decodable JPEG (the server normalizes and hashes uploaded images)."""
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (320, 200), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([10, 10, 310, 190], outline="red", width=4)
+    draw.text((30, 90), "LOAD TEST - ANNUAL INSP 2024", fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=80)
+    return buffer.getvalue()
+
+
+async def timed(client: httpx.AsyncClient, method: str, url: str, **kwargs) -> float:
+    start = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    elapsed = time.perf_counter() - start
+    if response.status_code >= 400:
+        print(f"⚠️ {method} {url} -> {response.status_code}: {response.text[:200]}")
+    return elapsed
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name: str, latencies) -> None:
+    if latencies:
+        print(
+            f"  - {name}: n={len(latencies)} p50={statistics.median(latencies)*1000:.0f}ms "
+            f"p95={percentile(latencies, 95)*1000:.0f}ms max={max(latencies)*1000:.0f}ms"
+        )
+
+
+async def workload(client: httpx.AsyncClient, total: int, concurrency: int, image_base64):
+    """Runs `total` requests at `concurrency`; returns (wall_time, latencies by request kind)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {"list": [], "create": []}
+
+    async def one(i: int):
+        async with semaphore:
+            if image_base64 and i % 2 == 1:
+                payload = {"image_base64": image_base64, "location": f"Load test {i}", "notes": "load_test.py"}
+                results["create"].append(
+                    await timed(client, "POST", "/api/inspections", params={"async": "true"}, json=payload)
+                )
+            else:
+                results["list"].append(await timed(client, "GET", "/api/inspections", params={"limit": 50}))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start, results
+
+
+async def probe_health(client: httpx.AsyncClient, stop: asyncio.Event, interval: float):
+    latencies = []
+    while not stop.is_set():
+        latencies.append(await timed(client, "GET", "/api/health"))
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def run(args, image_base64) -> bool:
+    limits = httpx.Limits(max_connections=args.concurrency + 1, max_keepalive_connections=args.concurrency + 1)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits) as client:
+        idle_health = [await timed(client, "GET", "/api/health") for _ in range(10)]
+
+        serial_time, serial = await workload(client, args.requests, 1, image_base64)
+
+        stop = asyncio.Event()
+        prober = asyncio.create_task(probe_health(client, stop, args.probe_interval))
+        concurrent_time, concurrent = await workload(client, args.requests, args.concurrency, image_base64)
+        stop.set()
+        loaded_health = await prober
+
+    print(f"\n📊 {args.requests} requests per run")
+    print(f"  concurrency 1: {serial_time:.2f}s ({args.requests / serial_time:.1f} req/s)")
+    for name, latencies in serial.items():
+        report(name, latencies)
+    print(f"  concurrency {args.concurrency}: {concurrent_time:.2f}s ({args.requests / concurrent_time:.1f} req/s)")
+    for name, latencies in concurrent.items():
+        report(name, latencies)
+    print("\n🩺 /api/health")
+    report("idle", idle_health)
+    report("under load", loaded_health)
+
+    ok = True
+    speedup = serial_time / concurrent_time if concurrent_time else 0
+    print(f"\n⚙️ Throughput speedup at concurrency {args.concurrency}: {speedup:.1f}x (need ≥ {args.min_speedup}x)")
+    if speedup < args.min_speedup:
+        print("❌ Concurrent requests are no faster than serial ones; requests appear to be serialized")
+        ok = False
+
+    health_p95_ms = percentile(loaded_health, 95) * 1000 if loaded_health else 0
+    print(f"⚙️ Health p95 under load: {health_p95_ms:.0f}ms (limit {args.max_health_ms:.0f}ms)")
+    if health_p95_ms > args.max_health_ms:
+        print("❌ Health checks stall while other requests run; the event loop is being blocked")
+        ok = False
+
+    if ok:
+        print("✅ Concurrent requests overlap and the event loop stays responsive")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrency load test for the inspections API")
+    parser.add_argument("--base-url", default=os.getenv("BACKEND_URL", "http://localhost:8001"))
+    parser.add_argument("--requests", type=int, default=200, help="Requests per run (serial and concurrent)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--min-speedup", type=float, default=1.5)
+    parser.add_argument("--max-health-ms", type=float, default=250)
+    parser.add_argument("--probe-interval", type=float, default=0.05, help="Seconds between health probes")
+    parser.add_argument(
+        "--allow-writes", action="store_true",
+        help="Also send creates: stores inspections, calls the model and queues N8N notifications"
+    )
+    parser.add_argument("--image", help="Image file for creates (defaults to a generated JPEG)")
+    args = parser.parse_args()
+
+    image_base64 = None
+    if args.allow_writes:
+        if args.image:
+            with open(args.image, "rb") as f:
+                image_bytes = f.read()
+        else:
+            image_bytes = synthetic_jpeg()
+        image_base64 = base64.b64encode(image_bytes).decode("ascii")
+        print(f"⚠️ --allow-writes: creating up to {args.requests} inspections on {args.base_url}")
+    elif args.image:
+        parser.error("--image requires --allow-writes")
+
+    ok = asyncio.run(run(args, image_base64))
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()